@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark peak memory and wall time of deck building at large slide counts.
+Compares the in-memory build_deck path with the chunked build_deck_streaming path.
+
+Each measurement runs in its own subprocess so peak RSS is not shared between runs.
+
+Usage:
+    python bench_large_deck.py --slides 1000
+    python bench_large_deck.py --slides 250 500 1000 --chunk-size 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and KiB on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _make_images(image_dir: str, count: int):
+    """Create distinct noise images standing in for generated slide art."""
+    from PIL import Image
+    
+    paths = []
+    for i in range(count):
+        path = os.path.join(image_dir, f"image_{i}.png")
+        Image.effect_noise((320, 240), 40 + i % 50).convert("RGB").save(path)
+        paths.append(path)
+    return paths
+
+
+def _synthetic_slides(count: int, image_paths):
+    """Yield synthetic slides with bullets, notes and images."""
+    from models import SlideRecord
+    
+    for i in range(count):
+        yield SlideRecord(
+            title=f"Section {i}: Scaling presentation pipelines",
+            bullets=[f"Insight {i}.{j} about throughput and memory" for j in range(5)],
+            speaker_notes=f"Talk through slide {i} and connect it to the overall narrative. " * 3,
+            image_path=image_paths[i % len(image_paths)] if image_paths else None
+        )
+
+
+def run_child(mode: str, slides: int, chunk_size: int, images: int):
+    """Build a single deck and print a JSON measurement."""
+    from pipeline.slide_builder import SlideBuilder
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        image_paths = _make_images(workdir, images)
+        builder = SlideBuilder()
+        baseline_rss = _peak_rss_mb()
+        
+        start = time.perf_counter()
+        if mode == "streaming":
+            path = asyncio.run(builder.build_deck_streaming(
+                _synthetic_slides(slides, image_paths),
+                output_dir=workdir,
+                chunk_size=chunk_size
+            ))
+        else:
+            path = asyncio.run(builder.build_deck(
+                list(_synthetic_slides(slides, image_paths)),
+                output_dir=workdir
+            ))
+        elapsed = time.perf_counter() - start
+        
+        print(json.dumps({
+            "mode": mode,
+            "slides": slides,
+            "seconds": round(elapsed, 2),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "baseline_rss_mb": round(baseline_rss, 1),
+            "file_mb": round(os.path.getsize(path) / (1024 * 1024), 2)
+        }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--slides", type=int, nargs="+", default=[1000])
+    parser.add_argument("--chunk-size", type=int, default=50)
+    parser.add_argument("--images", type=int, default=50, help="Distinct images to cycle through")
+    parser.add_argument("--modes", nargs="+", default=["in-memory", "streaming"])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        run_child(args.child, args.slides[0], args.chunk_size, args.images)
+        return
+    
+    print(f"{'mode':<12}{'slides':>8}{'seconds':>10}{'peak RSS MiB':>15}{'file MiB':>10}")
+    for slide_count in args.slides:
+        for mode in args.modes:
+            result = subprocess.run(
+                [
+                    sys.executable, __file__,
+                    "--child", mode,
+                    "--slides", str(slide_count),
+                    "--chunk-size", str(args.chunk_size),
+                    "--images", str(args.images)
+                ],
+                capture_output=True,
+                text=True,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                check=True
+            )
+            row = json.loads(result.stdout.strip().splitlines()[-1])
+            print(
+                f"{row['mode']:<12}{row['slides']:>8}{row['seconds']:>10}"
+                f"{row['peak_rss_mb']:>15}{row['file_mb']:>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
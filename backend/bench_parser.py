@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark OutlineParser on large pasted documents.
+Generates nested outlines, bullet lists and numbered outlines of increasing size.
+
+Usage:
+    python bench_parser.py
+    python bench_parser.py --lines 1000 10000 100000 --repeat 5
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import time
+
+os.environ.setdefault("MAX_SLIDES", str(10 ** 9))
+
+from pipeline.outline_parser import OutlineParser
+
+
+def nested_outline(lines: int) -> str:
+    """A nested outline with numbered sections and two levels of sub-points."""
+    out = ["Quarterly Engineering Review"]
+    section = 0
+    while len(out) < lines:
+        section += 1
+        out.append(f"{section}. Workstream {section} status and risks")
+        for point in range(4):
+            out.append(f"   - Milestone {section}.{point} delivered on schedule with caveats")
+            out.append(f"      * Detail for milestone {section}.{point}: owners, dates, follow-ups")
+    return "\n".join(out[:lines])
+
+
+def bulleted_list(lines: int) -> str:
+    """A flat bullet list where each bullet becomes a slide."""
+    out = ["Product Launch Checklist"]
+    out.extend(f"* Launch task {i}: confirm readiness with the owning team" for i in range(lines - 1))
+    return "\n".join(out)
+
+
+def numbered_outline(lines: int) -> str:
+    """A multi-level numbered outline (1., 1.1, a)) as pasted from a document."""
+    out = ["Annual Report"]
+    section = 0
+    while len(out) < lines:
+        section += 1
+        out.append(f"{section}) Chapter {section} overview")
+        for sub in range(3):
+            out.append(f"    {section}.{sub + 1} Finding {sub + 1} of chapter {section}")
+            out.append(f"        {chr(97 + sub)}. Supporting evidence for finding {sub + 1}")
+    return "\n".join(out[:lines])
+
+
+DOCUMENTS = {
+    "nested": nested_outline,
+    "bulleted": bulleted_list,
+    "numbered": numbered_outline,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--lines", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    
+    outline_parser = OutlineParser()
+    print(f"{'document':<10}{'lines':>9}{'MiB':>8}{'slides':>9}{'best ms':>10}{'MiB/s':>9}")
+    for name, make in DOCUMENTS.items():
+        for line_count in args.lines:
+            text = make(line_count)
+            size_mb = len(text.encode("utf-8")) / (1024 * 1024)
+            timings = []
+            slides = None
+            for _ in range(args.repeat):
+                # Free the previous run's slides outside the timed region
+                slides = None
+                gc.collect()
+                start = time.perf_counter()
+                slides = asyncio.run(outline_parser.parse(text))
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            print(
+                f"{name:<10}{line_count:>9}{size_mb:>8.2f}{len(slides):>9}"
+                f"{best * 1000:>10.1f}{size_mb / best:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
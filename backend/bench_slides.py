@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-slide CPU and memory of the pipeline stages at large slide counts.
+Runs parse, mock content expansion, placeholder images and the API boundary
+on a synthetic outline, without LLM calls or deck building.
+
+To profile real payloads offline, replay a recorded cassette over the
+outline it was recorded with (see LLM_CASSETTE_MODE):
+
+Usage:
+    python bench_slides.py
+    python bench_slides.py --slides 10000 --repeat 5
+    LLM_CASSETTE_MODE=replay LLM_CASSETTE=deck.jsonl.gz python bench_slides.py --input deck.md
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+
+os.environ["OPENAI_API_KEY"] = ""  # Mock mode (or cassette replay): never call the API
+os.environ.setdefault("MAX_SLIDES", str(10 ** 9))
+
+from models import PreviewResponse
+from pipeline.outline_parser import OutlineParser
+from pipeline.content_generator import ContentGenerator
+from pipeline.image_generator import ImageGenerator
+
+
+def synthetic_outline(slides: int) -> str:
+    """A bullet list with one slide per bullet, after a title line."""
+    lines = ["Platform Migration Plan"]
+    lines.extend(f"* Workstream {i}: migrate services and verify rollback" for i in range(slides - 1))
+    return "\n".join(lines)
+
+
+async def run_stages(text: str) -> dict:
+    """Run each stage once and return its process CPU time in seconds."""
+    parser = OutlineParser()
+    generator = ContentGenerator()
+    images = ImageGenerator()
+    timings = {}
+    
+    start = time.process_time()
+    slides = await parser.parse(text)
+    timings["parse"] = time.process_time() - start
+    
+    start = time.process_time()
+    slides = await generator.expand_slides(slides, include_speaker_notes=True)
+    timings["expand"] = time.process_time() - start
+    
+    start = time.process_time()
+    slides = await images.generate_images(slides)
+    timings["images"] = time.process_time() - start
+    
+    start = time.process_time()
+    PreviewResponse(
+        slides=[slide.to_api() for slide in slides],
+        total_slides=len(slides)
+    ).model_dump_json()
+    timings["response"] = time.process_time() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--slides", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--input", help="Outline file to use instead of a synthetic outline")
+    args = parser.parse_args()
+    
+    if args.input:
+        with open(args.input, encoding="utf-8") as f:
+            text = f.read()
+        args.slides = len(asyncio.run(OutlineParser().parse(text)))
+    else:
+        text = synthetic_outline(args.slides)
+    best = {}
+    for _ in range(args.repeat):
+        for stage, seconds in asyncio.run(run_stages(text)).items():
+            best[stage] = min(seconds, best.get(stage, seconds))
+    
+    # Memory is measured in a separate run; tracing slows every allocation
+    tracemalloc.start()
+    asyncio.run(run_stages(text))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    print(f"{args.slides} slides, best of {args.repeat}")
+    print(f"{'stage':<10}{'ms':>10}{'us/slide':>10}")
+    for stage, seconds in best.items():
+        print(f"{stage:<10}{seconds * 1000:>10.1f}{seconds * 1e6 / args.slides:>10.1f}")
+    total = sum(best.values())
+    print(f"{'total':<10}{total * 1000:>10.1f}{total * 1e6 / args.slides:>10.1f}")
+    print(f"peak traced memory: {peak / (1024 * 1024):.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
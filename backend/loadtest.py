@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Load test the API: throughput, latency percentiles, error rate and event-loop lag.
+Sweeps closed-loop concurrency levels (or open-loop arrival rates) over a mix
+of /preview and /generate requests with varying deck sizes.
+
+Runs against the app in-process by default, in mock mode or with a simulated
+LLM (--llm-latency), or against a running server with --url. In-process, the
+event-loop lag is the server's own; over localhost it is the load generator's.
+
+Usage:
+    python loadtest.py
+    python loadtest.py --concurrency 1 4 16 64 --duration 10 --mix preview=3 generate=1
+    python loadtest.py --rates 5 10 20 --llm-latency 0.3 --slides 5 20
+    python loadtest.py --url http://localhost:8000
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+os.environ.setdefault("MAX_SLIDES", "1000")  # Deck sizes are set by --slides
+
+import httpx
+
+
+class SimulatedLLM:
+    """
+    Stands in for AsyncOpenAI with log-normally distributed latency.
+    
+    Responses are small canned completions with token usage, so budgets,
+    routing and metrics behave as they would against the real API.
+    """
+    
+    def __init__(self, median_seconds: float, sigma: float = 0.5, seed: int = 0):
+        self.median_seconds = median_seconds
+        self.sigma = sigma
+        self.random = random.Random(seed)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+    
+    async def _create(self, **kwargs):
+        delay = self.median_seconds * self.random.lognormvariate(0.0, self.sigma)
+        await asyncio.sleep(delay)
+        content = "\n".join(f"Simulated point {i} for the slide" for i in range(4))
+        message = SimpleNamespace(content=content)
+        usage = SimpleNamespace(prompt_tokens=120, completion_tokens=min(kwargs.get("max_tokens", 80), 80))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+    
+    async def close(self):
+        pass
+
+
+def outline(slides: int, request_number: int) -> str:
+    """An outline of `slides` slides, unique per request so nothing is coalesced or cached."""
+    lines = [f"Load Test Deck {request_number}"]
+    lines.extend(f"* Topic {i} of request {request_number}" for i in range(slides - 1))
+    return "\n".join(lines)
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile, or None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+class Recorder:
+    """Collects per-request outcomes and event-loop lag samples for one step."""
+    
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.loop_lag: List[float] = []
+        self.elapsed = 0.0
+    
+    def record(self, endpoint: str, seconds: float, ok: bool):
+        if ok:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+        else:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+    
+    def summary(self) -> dict:
+        latencies = [s for values in self.latencies.values() for s in values]
+        ok = len(latencies)
+        errors = sum(self.errors.values())
+        total = ok + errors
+        return {
+            "requests": total,
+            "throughput_rps": ok / self.elapsed if self.elapsed else 0.0,
+            "error_rate": errors / total if total else 0.0,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "loop_lag_p99": percentile(self.loop_lag, 99),
+            "loop_lag_max": max(self.loop_lag, default=None),
+            "by_endpoint": {
+                endpoint: {
+                    "ok": len(self.latencies.get(endpoint, [])),
+                    "errors": self.errors.get(endpoint, 0),
+                    "p95": percentile(self.latencies.get(endpoint, []), 95),
+                }
+                for endpoint in sorted(set(self.latencies) | set(self.errors))
+            },
+        }
+
+
+async def monitor_loop_lag(recorder: Recorder, interval: float = 0.01):
+    """Sample how late the event loop wakes a sleeping task."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        recorder.loop_lag.append(max(0.0, loop.time() - start - interval))
+
+
+class LoadGenerator:
+    """Issues a weighted mix of requests and records their outcomes."""
+    
+    def __init__(self, client: httpx.AsyncClient, mix: Dict[str, int], slides: List[int], seed: int = 0):
+        self.client = client
+        self.endpoints = list(mix)
+        self.weights = [mix[endpoint] for endpoint in self.endpoints]
+        self.slides = slides
+        self.random = random.Random(seed)
+        self.numbers = itertools.count()
+    
+    async def request(self, recorder: Recorder):
+        endpoint = self.random.choices(self.endpoints, self.weights)[0]
+        body = {"input_text": outline(self.random.choice(self.slides), next(self.numbers))}
+        if endpoint == "generate":
+            body["generate_images"] = False
+        
+        start = time.perf_counter()
+        try:
+            response = await self.client.post(f"/{endpoint}", json=body)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        recorder.record(endpoint, time.perf_counter() - start, ok)
+    
+    async def closed_loop(self, concurrency: int, duration: float) -> Recorder:
+        """`concurrency` workers, each sending its next request as soon as the last one finishes."""
+        recorder = Recorder()
+        deadline = time.perf_counter() + duration
+        
+        async def worker():
+            while time.perf_counter() < deadline:
+                await self.request(recorder)
+        
+        await self._measure(recorder, [worker() for _ in range(concurrency)])
+        return recorder
+    
+    async def open_loop(self, rate: float, duration: float) -> Recorder:
+        """Poisson arrivals at `rate` requests/second, regardless of how fast they complete."""
+        recorder = Recorder()
+        
+        async def arrivals():
+            tasks = []
+            deadline = time.perf_counter() + duration
+            while time.perf_counter() < deadline:
+                tasks.append(asyncio.ensure_future(self.request(recorder)))
+                await asyncio.sleep(self.random.expovariate(rate))
+            await asyncio.gather(*tasks)
+        
+        await self._measure(recorder, [arrivals()])
+        return recorder
+    
+    @staticmethod
+    async def _measure(recorder: Recorder, work):
+        monitor = asyncio.ensure_future(monitor_loop_lag(recorder))
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*work)
+        finally:
+            monitor.cancel()
+        recorder.elapsed = time.perf_counter() - start
+
+
+def _client(args) -> httpx.AsyncClient:
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    if args.url:
+        return httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits)
+    
+    if args.llm_latency is not None:
+        from pipeline.clients import set_openai_client
+        set_openai_client(SimulatedLLM(args.llm_latency))
+    else:
+        os.environ["OPENAI_API_KEY"] = ""  # Mock mode (or cassette replay)
+    import main
+    transport = httpx.ASGITransport(app=main.app)
+    return httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout)
+
+
+def _seconds(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 1000:.0f}"
+
+
+async def run(args) -> List[dict]:
+    mix = {}
+    for entry in args.mix:
+        endpoint, _, weight = entry.partition("=")
+        mix[endpoint] = int(weight or 1)
+    
+    results = []
+    async with _client(args) as client:
+        generator = LoadGenerator(client, mix, args.slides, seed=args.seed)
+        # One untimed request builds the pipeline before measuring
+        await generator.request(Recorder())
+        
+        if args.rates:
+            kind, levels, step = "rate", args.rates, generator.open_loop
+        else:
+            kind, levels, step = "concurrency", args.concurrency, generator.closed_loop
+        
+        print(f"{'load':>12}{'reqs':>7}{'rps':>8}{'err%':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'lag p99':>9}{'lag max':>9}")
+        for level in levels:
+            recorder = await step(level, args.duration)
+            summary = dict(recorder.summary(), **{kind: level})
+            results.append(summary)
+            print(
+                f"{f'{kind[0]}={level}':>12}{summary['requests']:>7}{summary['throughput_rps']:>8.1f}"
+                f"{summary['error_rate'] * 100:>7.1f}{_seconds(summary['p50']):>9}{_seconds(summary['p95']):>9}"
+                f"{_seconds(summary['p99']):>9}{_seconds(summary['loop_lag_p99']):>9}{_seconds(summary['loop_lag_max']):>9}"
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--url", help="Base URL of a running server (default: in-process)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--rates", type=float, nargs="+", help="Open-loop arrival rates (req/s) instead of concurrency")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per step")
+    parser.add_argument("--mix", nargs="+", default=["preview=3", "generate=1"], help="endpoint=weight")
+    parser.add_argument("--slides", type=int, nargs="+", default=[5, 10, 20], help="Deck sizes to pick from")
+    parser.add_argument("--llm-latency", type=float, help="Median simulated LLM latency in seconds (in-process only)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+    
+    results = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
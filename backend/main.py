@@ -4,32 +4,100 @@ Main entry point for the slide deck generation service.
 """
 
 import os
-from typing import Optional
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+import time
+import logging
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, List, Optional, Set, TypeVar
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Header, Request
+from fastapi.responses import FileResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+from dataclasses import asdict, replace
 from models import (
+    GenerateOptions,
     GenerateRequest,
+    PreviewOptions,
     PreviewRequest,
     GenerateResponse,
     PreviewResponse,
-    SlideData
+    SlideRecord,
+    UpgradeStatus
 )
-from pipeline.outline_parser import OutlineParser
-from pipeline.content_generator import ContentGenerator
-from pipeline.image_generator import ImageGenerator
-from pipeline.slide_builder import SlideBuilder
+# Only lightweight modules are imported here. Components that pull in openai,
+# httpx or python-pptx are imported and built on first use (see below), so
+# worker start-up and health checks never pay for them.
+from pipeline.outline_parser import OutlineParser, SlideLimitExceeded
+from pipeline.upload_reader import MalformedUpload, UploadReader, UploadTooLarge, UnsupportedUpload
+from pipeline.budget import RequestBudget, budget_context
+from pipeline.scheduler import work_class
+from pipeline.tenancy import tenant_context
+from pipeline.deadline import ClientDisconnected, Deadline, DeadlineExceeded, deadline_context
+from pipeline.service_level import ServiceLevel
+from pipeline.checkpoints import JobCheckpoint, checkpoint_store
+from pipeline.clients import close_clients, http_client
+from singleflight import SingleFlight, request_key
+from previews import PreviewStore
+from upgrades import UpgradeJob, UpgradeQueue
+from warmup import RequestLog, read_inputs, warm_caches
+from telemetry import (
+    CONTENT_TYPE,
+    DEGRADED_SLIDES,
+    HTTP_REQUEST_DURATION,
+    REGISTRY,
+    REQUESTS_CANCELLED,
+    REQUESTS_IN_FLIGHT,
+    close_span_exporter,
+    configure_logging,
+    request_context,
+    span
+)
+
+if TYPE_CHECKING:
+    from pipeline.content_generator import ContentGenerator
+    from pipeline.document_summarizer import DocumentSummarizer
+    from pipeline.image_generator import ImageGenerator
+    from pipeline.slide_builder import SlideBuilder
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Optionally pre-warm the pipeline and replay WARMUP_LOG at start-up.
+    
+    On shutdown, stop upgrades and the replay, close shared clients, save
+    caches and flush the buffered request log and trace spans.
+    """
+    if PREWARM_ON_STARTUP:
+        await warm_up()
+    replay = asyncio.ensure_future(_replay_request_log()) if WARMUP_LOG else None
+    yield
+    if replay is not None:
+        replay.cancel()
+        await asyncio.gather(replay, return_exceptions=True)
+    await upgrade_queue.close()
+    await close_clients()
+    if "content_generator" in _components:
+        from pipeline.semantic_cache import close_semantic_cache
+        close_semantic_cache()
+    if request_log is not None:
+        request_log.close()
+    close_span_exporter()
+
 
 app = FastAPI(
     title="Prompt2Deck API",
     description="AI-powered slide deck generation service",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS configuration
@@ -39,18 +107,184 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
-# Initialize pipeline components
-outline_parser = OutlineParser()
-content_generator = ContentGenerator()
-image_generator = ImageGenerator()
-slide_builder = SlideBuilder()
+# Lightweight components are built at import
+upload_reader = UploadReader()
+
+# Build heavy components during start-up / on the first /readyz call, rather
+# than on the first request that needs them
+PREWARM_ON_STARTUP = os.getenv("PREWARM_ON_STARTUP", "false").lower() == "true"
+PREWARM_ON_READY = os.getenv("PREWARM_ON_READY", "true").lower() == "true"
+
+_components = {}
+_components_lock = threading.RLock()
+_warm_lock = asyncio.Lock()
+_warmup_seconds: Optional[float] = None
+
+
+def _component(name: str, factory: Callable):
+    """Return a shared pipeline component, building it on first use."""
+    component = _components.get(name)
+    if component is None:
+        with _components_lock:
+            component = _components.get(name)
+            if component is None:
+                component = _components[name] = factory()
+    return component
+
+
+def get_document_summarizer() -> "DocumentSummarizer":
+    """The shared DocumentSummarizer."""
+    def build():
+        from pipeline.document_summarizer import DocumentSummarizer
+        return DocumentSummarizer()
+    return _component("document_summarizer", build)
+
+
+def get_outline_parser() -> OutlineParser:
+    """The shared OutlineParser, summarizing long documents."""
+    return _component(
+        "outline_parser",
+        lambda: OutlineParser(summarizer=get_document_summarizer())
+    )
+
+
+def get_content_generator() -> "ContentGenerator":
+    """The shared ContentGenerator."""
+    def build():
+        from pipeline.content_generator import ContentGenerator
+        return ContentGenerator()
+    return _component("content_generator", build)
+
+
+def get_image_generator() -> "ImageGenerator":
+    """The shared ImageGenerator."""
+    def build():
+        from pipeline.image_generator import ImageGenerator
+        return ImageGenerator()
+    return _component("image_generator", build)
+
+
+def get_slide_builder() -> "SlideBuilder":
+    """The shared SlideBuilder."""
+    def build():
+        from pipeline.slide_builder import SlideBuilder
+        return SlideBuilder()
+    return _component("slide_builder", build)
+
+
+def _build_components():
+    """Build every component and warm the caches the first request would fill."""
+    get_outline_parser()
+    get_content_generator()
+    get_image_generator()
+    get_slide_builder().prewarm()
+    if get_image_generator().use_dalle:
+        http_client()
+
+
+async def warm_up() -> float:
+    """
+    Build and pre-warm the pipeline once, off the event loop.
+    
+    Returns:
+        Seconds the warm-up took
+    """
+    global _warmup_seconds
+    async with _warm_lock:
+        if _warmup_seconds is None:
+            start = time.perf_counter()
+            await asyncio.to_thread(_build_components)
+            _warmup_seconds = time.perf_counter() - start
+    return _warmup_seconds
+
+# Expansions of recent previews, reused when an edited outline is previewed again (0 = off)
+PREVIEW_STORE_SIZE = int(os.getenv("PREVIEW_STORE_SIZE", "1000"))
+preview_store = PreviewStore(retained=PREVIEW_STORE_SIZE) if PREVIEW_STORE_SIZE > 0 else None
+
+# Inputs of /preview and /generate requests, for replaying after deploys (off when unset)
+REQUEST_LOG = os.getenv("REQUEST_LOG", "")
+request_log = RequestLog(REQUEST_LOG) if REQUEST_LOG else None
+
+# Request log replayed in the background at start-up to fill the caches
+WARMUP_LOG = os.getenv("WARMUP_LOG", "")
+
+
+async def _replay_request_log():
+    """Replay the top WARMUP_TOP inputs of WARMUP_LOG as low-priority batch work."""
+    try:
+        inputs = await asyncio.to_thread(read_inputs, WARMUP_LOG, top=int(os.getenv("WARMUP_TOP", "20")))
+        await warm_up()
+        image_generator = get_image_generator()
+        await warm_caches(
+            inputs,
+            get_outline_parser(),
+            get_content_generator(),
+            # Only generated images are cached
+            image_generator if image_generator.use_dalle else None,
+            rate=float(os.getenv("WARMUP_RATE", "1")),
+            time_budget=float(os.getenv("WARMUP_TIME_BUDGET_SECONDS", "300")) or None
+        )
+    except OSError as e:
+        logger.warning("Could not replay request log %s: %s", WARMUP_LOG, e)
 
 # Ensure output directory exists
 OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "output")
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Identical concurrent preview/generate requests share one execution
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+singleflight = SingleFlight()
+
+# Outlines longer than this are built in bounded-memory chunks
+LARGE_DECK_THRESHOLD = int(os.getenv("LARGE_DECK_THRESHOLD", "100"))
+
+# Default deadline for requests without an X-Request-Timeout header (0 = none)
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "0")) or None
+
+# Background jobs that regenerate slides degraded to meet an SLA
+upgrade_queue = UpgradeQueue(
+    concurrency=int(os.getenv("UPGRADE_CONCURRENCY", "2")),
+    retained=int(os.getenv("UPGRADE_JOBS_RETAINED", "1000"))
+)
+
+T = TypeVar("T")
+
+
+@app.middleware("http")
+async def telemetry_middleware(request: Request, call_next):
+    """
+    Bind a request id and time every request.
+    
+    The id is taken from the X-Request-ID header (or generated), attached to
+    all spans and log records of the request, and echoed in the response.
+    """
+    if request.url.path == "/metrics":
+        return await call_next(request)
+    
+    with request_context(request.headers.get("x-request-id")) as request_id:
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        status = 500
+        try:
+            with span("http.request", method=request.method, path=request.url.path) as current:
+                response = await call_next(request)
+                status = response.status_code
+                current.set_attribute("status", status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            route = getattr(request.scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.labels(
+                method=request.method,
+                route=route,
+                status=status
+            ).observe(time.perf_counter() - start)
+        
+        response.headers["X-Request-ID"] = request_id
+        return response
+
 
 @app.get("/")
 async def root():
@@ -62,84 +296,832 @@ async def root():
     }
 
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness probe.
+    
+    With PREWARM_ON_READY (the default), the first call builds the pipeline
+    components, loads the slide template and opens the shared clients, so
+    traffic only arrives once the worker is warm. Otherwise the worker is
+    ready immediately and components are built on first use.
+    """
+    if PREWARM_ON_READY:
+        try:
+            seconds = await warm_up()
+        except Exception as e:
+            return JSONResponse(status_code=503, content={"status": "unavailable", "detail": str(e)})
+        return {"status": "ready", "warm": True, "warmup_seconds": round(seconds, 3)}
+    
+    return {"status": "ready", "warm": _warmup_seconds is not None}
+
+
 @app.post("/preview", response_model=PreviewResponse)
-async def preview_slides(request: PreviewRequest):
+async def preview_slides(
+    request: PreviewRequest,
+    http_request: Request,
+    x_tenant_id: Optional[str] = Header(None),
+    x_request_timeout: Optional[float] = Header(None, gt=0)
+):
     """
     Generate a preview of the slide structure without creating the actual deck.
     
     Args:
         request: PreviewRequest containing the input text/outline
+        http_request: Incoming request, identifying the client for fair scheduling
+        x_tenant_id: Optional tenant id used to look up the slide limit
+        x_request_timeout: Seconds until the request's deadline (defaults to REQUEST_TIMEOUT_SECONDS)
         
     Returns:
         PreviewResponse with structured slide data
     """
+    outline_parser = get_outline_parser()
+    max_slides = outline_parser.slide_limit(x_tenant_id)
+    client = _client_id(http_request, x_tenant_id)
+    deadline = Deadline(x_request_timeout or REQUEST_TIMEOUT_SECONDS)
+    if request_log is not None:
+        request_log.record(request.input_text, x_tenant_id)
+    
+    async def run() -> PreviewResponse:
+        # Interactive previews get scheduler slots ahead of deck generation
+        with work_class("interactive", client), deadline_context(deadline), tenant_context(x_tenant_id):
+            with budget_context(RequestBudget.from_options(request)) as budget:
+                service_level = ServiceLevel.from_options(request, deadline)
+                # Parse outline into slide structure
+                slides = await outline_parser.parse(
+                    request.input_text,
+                    max_slides=max_slides,
+                    target_slides=request.target_slides
+                )
+                
+                return await _preview_from_slides(slides, request, budget, service_level)
+    
     try:
-        # Parse outline into slide structure
-        slides = await outline_parser.parse(request.input_text)
-        
-        # Expand content for each slide
-        expanded_slides = await content_generator.expand_slides(
-            slides,
-            include_speaker_notes=request.include_speaker_notes
-        )
-        
-        return PreviewResponse(
-            slides=expanded_slides,
-            total_slides=len(expanded_slides)
+        # Identical concurrent requests share one pipeline execution
+        return await _serve(
+            http_request,
+            "preview",
+            deadline,
+            _coalesce("preview", request, max_slides, run, deadline, x_tenant_id)
         )
         
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnected as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except SlideLimitExceeded as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Preview generation failed: {str(e)}")
 
 
 @app.post("/generate", response_model=GenerateResponse)
-async def generate_deck(request: GenerateRequest):
+async def generate_deck(
+    request: GenerateRequest,
+    http_request: Request,
+    x_tenant_id: Optional[str] = Header(None),
+    x_request_timeout: Optional[float] = Header(None, gt=0),
+    x_job_id: Optional[str] = Header(None, max_length=128)
+):
     """
     Generate a complete slide deck from input text/outline.
     
+    With CHECKPOINTS_ENABLED, every finished stage is checkpointed under the
+    job id, so a retry of a job whose worker died skips the work done.
+    
     Args:
         request: GenerateRequest containing the input text and options
+        http_request: Incoming request, identifying the client for fair scheduling
+        x_tenant_id: Optional tenant id used to look up the slide limit
+        x_request_timeout: Seconds until the request's deadline (defaults to REQUEST_TIMEOUT_SECONDS)
+        x_job_id: Id to checkpoint the job under, so a retry with it resumes (no checkpoints without one)
         
     Returns:
         GenerateResponse with download URL and metadata
     """
+    outline_parser = get_outline_parser()
+    max_slides = outline_parser.slide_limit(x_tenant_id)
+    client = _client_id(http_request, x_tenant_id)
+    deadline = Deadline(x_request_timeout or REQUEST_TIMEOUT_SECONDS)
+    if request_log is not None:
+        request_log.record(request.input_text, x_tenant_id)
+    
+    async def run() -> GenerateResponse:
+        with work_class("generate", client), deadline_context(deadline), tenant_context(x_tenant_id):
+            with budget_context(RequestBudget.from_options(request)) as budget:
+                service_level = ServiceLevel.from_options(request, deadline)
+                checkpoint = await _open_checkpoint(request, max_slides, x_job_id, x_tenant_id)
+                
+                # Step 1: Parse outline into slide structure
+                parsed = checkpoint.get("parse") if checkpoint is not None else None
+                if parsed is not None:
+                    slides = [SlideRecord(**slide) for slide in parsed]
+                else:
+                    slides = await outline_parser.parse(
+                        request.input_text,
+                        max_slides=max_slides,
+                        target_slides=request.target_slides
+                    )
+                    if checkpoint is not None:
+                        checkpoint.put("parse", [asdict(slide) for slide in slides])
+                
+                response = await _generate_from_slides(slides, request, budget, service_level, checkpoint)
+                if checkpoint is not None:
+                    # Answer only once the job's checkpoints are committed
+                    await checkpoint.flush()
+                return response
+    
+    try:
+        # Identical concurrent requests share one pipeline execution
+        return await _serve(
+            http_request,
+            "generate",
+            deadline,
+            _coalesce("generate", request, max_slides, run, deadline, x_tenant_id, x_job_id)
+        )
+        
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnected as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except SlideLimitExceeded as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Deck generation failed: {str(e)}")
+
+
+@app.post("/upload/preview", response_model=PreviewResponse)
+async def preview_upload(
+    request: Request,
+    options: PreviewOptions = Depends(),
+    x_tenant_id: Optional[str] = Header(None),
+    x_request_timeout: Optional[float] = Header(None, gt=0)
+):
+    """
+    Preview slides from an uploaded .txt/.md document.
+    
+    The file is sent as multipart/form-data and parsed line by line while
+    it streams in; options are passed as query parameters.
+    
+    Args:
+        request: Incoming request with the multipart body
+        options: Preview options
+        x_tenant_id: Optional tenant id used to look up the slide limit
+        x_request_timeout: Seconds until the request's deadline (defaults to REQUEST_TIMEOUT_SECONDS)
+        
+    Returns:
+        PreviewResponse with structured slide data
+    """
+    outline_parser = get_outline_parser()
+    deadline = Deadline(x_request_timeout or REQUEST_TIMEOUT_SECONDS)
     try:
-        # Step 1: Parse outline into slide structure
-        slides = await outline_parser.parse(request.input_text)
+        client = _client_id(request, x_tenant_id)
+        with work_class("interactive", client), deadline_context(deadline), tenant_context(x_tenant_id):
+            with budget_context(RequestBudget.from_options(options)) as budget:
+                service_level = ServiceLevel.from_options(options, deadline)
+                slides = await outline_parser.parse_stream(
+                    upload_reader.iter_lines(request),
+                    max_slides=outline_parser.slide_limit(x_tenant_id),
+                    target_slides=options.target_slides
+                )
+                
+                # The body has been read, so from here a disconnect can be detected
+                return await _serve(
+                    request,
+                    "upload_preview",
+                    deadline,
+                    _preview_from_slides(slides, options, budget, service_level)
+                )
         
-        # Step 2: Expand content for each slide
-        expanded_slides = await content_generator.expand_slides(
-            slides,
-            include_speaker_notes=request.include_speaker_notes
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnected as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedUpload as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except MalformedUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except SlideLimitExceeded as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Preview generation failed: {str(e)}")
+
+
+@app.post("/upload/generate", response_model=GenerateResponse)
+async def generate_upload(
+    request: Request,
+    options: GenerateOptions = Depends(),
+    x_tenant_id: Optional[str] = Header(None),
+    x_request_timeout: Optional[float] = Header(None, gt=0)
+):
+    """
+    Generate a deck from an uploaded .txt/.md document.
+    
+    The file is sent as multipart/form-data and parsed line by line while
+    it streams in; options are passed as query parameters.
+    
+    Args:
+        request: Incoming request with the multipart body
+        options: Deck generation options
+        x_tenant_id: Optional tenant id used to look up the slide limit
+        x_request_timeout: Seconds until the request's deadline (defaults to REQUEST_TIMEOUT_SECONDS)
+        
+    Returns:
+        GenerateResponse with download URL and metadata
+    """
+    outline_parser = get_outline_parser()
+    deadline = Deadline(x_request_timeout or REQUEST_TIMEOUT_SECONDS)
+    try:
+        client = _client_id(request, x_tenant_id)
+        with work_class("generate", client), deadline_context(deadline), tenant_context(x_tenant_id):
+            with budget_context(RequestBudget.from_options(options)) as budget:
+                service_level = ServiceLevel.from_options(options, deadline)
+                slides = await outline_parser.parse_stream(
+                    upload_reader.iter_lines(request),
+                    max_slides=outline_parser.slide_limit(x_tenant_id),
+                    target_slides=options.target_slides
+                )
+                
+                # The body has been read, so from here a disconnect can be detected
+                return await _serve(
+                    request,
+                    "upload_generate",
+                    deadline,
+                    _generate_from_slides(slides, options, budget, service_level)
+                )
+        
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnected as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedUpload as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except MalformedUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except SlideLimitExceeded as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Deck generation failed: {str(e)}")
+
+
+async def _open_checkpoint(
+    request: GenerateRequest,
+    max_slides: int,
+    job_id: Optional[str],
+    tenant: Optional[str]
+) -> Optional[JobCheckpoint]:
+    """
+    Start or resume the checkpoints of a generation job.
+    
+    Only jobs the client names with an X-Job-ID are checkpointed: two
+    requests with the same input are otherwise separate jobs, and the second
+    gets a deck of its own. A job id reused with another input, options or
+    tenant starts over.
+    
+    Returns:
+        The job's checkpoints, or None without a job id or CHECKPOINTS_ENABLED
+    """
+    store = checkpoint_store()
+    if store is None or not job_id:
+        return None
+    fingerprint = request_key("generate", request, max_slides=max_slides, tenant=tenant)
+    checkpoint = await asyncio.to_thread(store.open_job, job_id, fingerprint)
+    if checkpoint.resumed:
+        logger.info("Resuming job %s (checkpoints loaded in %.1fms)", checkpoint.job_id[:12], checkpoint.load_seconds * 1000)
+    return checkpoint
+
+
+def _expansion_memo(checkpoint: JobCheckpoint):
+    """Checkpointed slide expansions of a job, as the memo ContentGenerator reads and extends."""
+    return checkpoint.memo("expand", decode=lambda slide: SlideRecord(**slide), encode=asdict)
+
+
+async def _restored_deck(
+    checkpoint: JobCheckpoint,
+    slides: List[SlideRecord],
+    options: GenerateOptions,
+    budget: RequestBudget
+) -> Optional[GenerateResponse]:
+    """The complete deck an earlier attempt of the job built, if it is still on disk."""
+    output_path = checkpoint.get("build", valid=os.path.exists)
+    if output_path is None:
+        return None
+    pdf_path = None
+    if options.export_pdf:
+        pdf_path = checkpoint.get("export", valid=os.path.exists)
+        if pdf_path is None:
+            pdf_path = await get_slide_builder().export_to_pdf(
+                output_path, _checkpointed_slides(checkpoint, len(slides)), options.theme
+            )
+            if pdf_path:
+                checkpoint.put("export", pdf_path)
+    return GenerateResponse(
+        file_path=output_path,
+        pdf_path=pdf_path,
+        total_slides=len(slides),
+        message="Deck restored from an earlier attempt",
+        usage=budget.report(),
+        checkpoint=checkpoint.report()
+    )
+
+
+def _checkpoint_slides(checkpoint: JobCheckpoint, slides: List[SlideRecord], start: int = 0):
+    """Checkpoint the slides a deck is built from, so its PDF can be rendered again if it is lost."""
+    for position, slide in enumerate(slides, start):
+        checkpoint.put("slides", asdict(slide), key=str(position))
+
+
+def _checkpointed_slides(checkpoint: JobCheckpoint, count: int) -> Optional[List[SlideRecord]]:
+    """
+    The slides a restored deck was built from, or None if any is missing.
+    
+    A slide whose picture is gone is missing too: the deck still has the
+    picture, so LibreOffice converts it better than the slides render.
+    """
+    slides = []
+    for position in range(count):
+        slide = checkpoint.get(
+            "slides", str(position),
+            valid=lambda slide: not slide["image_path"] or os.path.exists(slide["image_path"])
+        )
+        if slide is None:
+            return None
+        slides.append(SlideRecord(**slide))
+    return slides
+
+
+def _client_id(request: Request, tenant: Optional[str]) -> str:
+    """Client identity for fair scheduling: the tenant, else the caller's address."""
+    if tenant:
+        return f"tenant:{tenant}"
+    return request.client.host if request.client else "anonymous"
+
+
+async def _coalesce(
+    endpoint: str,
+    request,
+    max_slides: int,
+    run: Callable,
+    deadline: Deadline,
+    tenant: Optional[str] = None,
+    job_id: Optional[str] = None
+):
+    """
+    Run a request, sharing the execution with identical requests in flight.
+    
+    The key covers the normalized input text, every option, the tenant and
+    its slide limit, so only requests that would produce the same result
+    share work, and tenants never share cached content through it. It also
+    covers the job id, since each job is checkpointed under its own. Uploads
+    are not coalesced: their input is only known once read.
+    """
+    if not SINGLEFLIGHT_ENABLED:
+        return await run()
+    key = request_key(endpoint, request, max_slides=max_slides, tenant=tenant, job_id=job_id)
+    return await singleflight.do(key, run, endpoint=endpoint, deadline=deadline)
+
+
+async def _serve(request: Request, endpoint: str, deadline: Deadline, work: Awaitable[T]) -> T:
+    """
+    Await a request's work, cancelling it at the deadline or when the client disconnects.
+    
+    Cancellation reaches every stage: pending LLM calls and image downloads
+    are abandoned, queued scheduler slots are given up and a running PDF
+    conversion is killed, so no rate limit or CPU is spent on a result
+    nobody will fetch.
+    
+    Raises:
+        DeadlineExceeded: If the deadline passed first
+        ClientDisconnected: If the client went away first
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait(
+            {task, watcher},
+            timeout=deadline.remaining(),
+            return_when=asyncio.FIRST_COMPLETED
+        )
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+            # Let cancelled stages clean up (e.g. kill subprocesses) before answering
+            await asyncio.gather(task, return_exceptions=True)
+    
+    if task in done:
+        try:
+            return task.result()
+        except DeadlineExceeded:
+            # A stage noticed the deadline before the timer fired
+            REQUESTS_CANCELLED.labels(endpoint=endpoint, reason="deadline").inc()
+            raise
+    reason = "disconnect" if watcher in done else "deadline"
+    REQUESTS_CANCELLED.labels(endpoint=endpoint, reason=reason).inc()
+    if reason == "disconnect":
+        raise ClientDisconnected("Client disconnected")
+    raise DeadlineExceeded("Request deadline exceeded")
+
+
+async def _wait_for_disconnect(request: Request):
+    """
+    Return once the client has disconnected.
+    
+    Only call this after the request body has been read: the next message
+    is then the disconnect. Request.is_disconnected() cannot be used here,
+    as it never sees the message through the HTTP middleware.
+    """
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def _preview_from_slides(
+    slides: List[SlideRecord],
+    options: PreviewOptions,
+    budget: RequestBudget,
+    service_level: Optional[ServiceLevel] = None
+) -> PreviewResponse:
+    """
+    Expand parsed slides into a preview, within the service level if one is set.
+    
+    With the handle of a previous preview, slides whose content hash it
+    already holds are carried over, and only inserted or edited slides are
+    expanded.
+    """
+    content_generator = get_content_generator()
+    expansions = None
+    reused: List[int] = []
+    if preview_store is not None:
+        expansions = preview_store.get(options.previous_preview_id)
+        keys = [content_generator.slide_key(slide, options.include_speaker_notes) for slide in slides]
+        reused = [position for position, key in enumerate(keys) if key in expansions]
+    
+    expanded_slides = await content_generator.expand_slides(
+        slides,
+        include_speaker_notes=options.include_speaker_notes,
+        soft_deadline=service_level.expand_deadline(images=False) if service_level else None,
+        expansions=expansions
+    )
+    degraded = _degraded_positions(expanded_slides, "preview")
+    
+    preview_id = None
+    if preview_store is not None:
+        # Only the slides of this outline are worth keeping for the next edit
+        preview_id = preview_store.put({key: expansions[key] for key in keys if key in expansions})
+    
+    # Slides are validated as API models only here, at the boundary
+    return PreviewResponse(
+        slides=[slide.to_api() for slide in expanded_slides],
+        total_slides=len(expanded_slides),
+        usage=budget.report(),
+        degraded_slides=degraded,
+        preview_id=preview_id,
+        reused_slides=reused
+    )
+
+
+def _degraded_positions(slides: List[SlideRecord], endpoint: str) -> List[int]:
+    """Positions of the slides that got fallback content to meet the SLA."""
+    degraded = [position for position, slide in enumerate(slides) if slide.degraded]
+    if degraded:
+        DEGRADED_SLIDES.labels(endpoint=endpoint).inc(len(degraded))
+    return degraded
+
+
+async def _generate_from_slides(
+    slides: List[SlideRecord],
+    options: GenerateOptions,
+    budget: RequestBudget,
+    service_level: Optional[ServiceLevel] = None,
+    checkpoint: Optional[JobCheckpoint] = None
+) -> GenerateResponse:
+    """
+    Run the generation pipeline on parsed slides.
+    
+    With a service level, expansion and images stop at their soft deadlines
+    and unfinished slides get fallback content, so the deck is delivered on
+    time; with upgrade_degraded, a background job then regenerates them.
+    
+    In progressive mode with DALL-E, the deck is built at once with local
+    placeholder art and a background job swaps the real images in.
+    
+    With a job checkpoint, slide expansions, images, the deck and its PDF
+    are checkpointed as they finish, and the ones an earlier attempt
+    finished are reused.
+    """
+    if checkpoint is not None:
+        restored = await _restored_deck(checkpoint, slides, options, budget)
+        if restored is not None:
+            return restored
+    
+    if options.large_deck or len(slides) > LARGE_DECK_THRESHOLD:
+        # Large decks are bulk work: they only get slots nobody interactive wants
+        with work_class("batch"):
+            return await _generate_large_deck(slides, options, budget, service_level, checkpoint)
+    
+    content_generator = get_content_generator()
+    image_generator = get_image_generator()
+    slide_builder = get_slide_builder()
+    
+    # Draft images cost nothing; only generated ones are worth waiting for
+    progressive = options.generate_images and options.progressive and image_generator.use_dalle
+    
+    # Step 2: Expand content for each slide
+    expanded_slides = await content_generator.expand_slides(
+        slides,
+        include_speaker_notes=options.include_speaker_notes,
+        soft_deadline=(
+            service_level.expand_deadline(images=options.generate_images and not progressive)
+            if service_level else None
+        ),
+        expansions=_expansion_memo(checkpoint) if checkpoint is not None else None
+    )
+    
+    # Step 3: Generate images for each slide (if enabled)
+    drafted: List[int] = []
+    if progressive:
+        # Placeholder art now, real images in a later deck version
+        drafted = await image_generator.draft_images(expanded_slides)
+        slides_with_images = expanded_slides
+    elif options.generate_images:
+        slides_with_images = await image_generator.generate_images(
+            expanded_slides,
+            soft_deadline=service_level.image_deadline() if service_level else None,
+            images=checkpoint.memo("image", valid=os.path.exists) if checkpoint is not None else None
         )
+    else:
+        slides_with_images = expanded_slides
+    
+    # Step 4: Build the slide deck
+    output_path = await slide_builder.build_deck(
+        slides_with_images,
+        output_dir=OUTPUT_DIR,
+        theme=options.theme
+    )
+    # Only complete decks are restored as a whole; drafts and degraded decks are rebuilt
+    complete = not drafted and not any(slide.degraded for slide in slides_with_images)
+    if checkpoint is not None and complete:
+        if options.export_pdf:
+            _checkpoint_slides(checkpoint, slides_with_images)
+        checkpoint.put("build", output_path)
+    
+    # Step 5: Export to PDF if requested
+    pdf_path = None
+    if options.export_pdf:
+        pdf_path = await slide_builder.export_to_pdf(output_path, slides_with_images, options.theme)
+        if checkpoint is not None and complete and pdf_path:
+            checkpoint.put("export", pdf_path)
+    
+    degraded = _degraded_positions(slides_with_images, "generate")
+    job: Optional[UpgradeJob] = None
+    if degraded and options.upgrade_degraded:
+        # A rebuild: re-expanded slides change more than their pictures
+        job = upgrade_queue.submit(
+            output_path,
+            sorted(set(degraded) | set(drafted)),
+            lambda job: _upgrade_deck(job, slides, slides_with_images, options),
+            pdf_path=pdf_path
+        )
+    elif drafted:
+        job = upgrade_queue.submit(
+            output_path,
+            drafted,
+            lambda job: _upgrade_images(job, slides_with_images, options),
+            pdf_path=pdf_path
+        )
+    
+    message = "Deck generated successfully"
+    if degraded:
+        message = f"Deck generated with fallback content on {len(degraded)} slides to meet the SLA"
+    elif drafted:
+        message = "Draft deck generated; the images will follow as a new version"
+    return GenerateResponse(
+        file_path=output_path,
+        pdf_path=pdf_path,
+        total_slides=len(slides_with_images),
+        message=message,
+        usage=budget.report(),
+        degraded_slides=degraded,
+        upgrade_job=job.job_id if job else None,
+        checkpoint=checkpoint.report() if checkpoint is not None else None
+    )
+
+
+async def _upgrade_deck(
+    job: UpgradeJob,
+    slides: List[SlideRecord],
+    delivered: List[SlideRecord],
+    options: GenerateOptions
+):
+    """
+    Regenerate the degraded slides of a delivered deck and publish a new version.
+    
+    Only the stages a slide's `degraded` list names are redone, on copies of
+    the delivered records, which are left untouched. Runs as batch work, free
+    of the original request's deadline and budget.
+    
+    Args:
+        job: The upgrade job, updated with the new version
+        slides: Parsed slides of the request
+        delivered: Slides of the delivered deck, with degraded ones marked
+        options: Options of the original request
+    """
+    content_generator = get_content_generator()
+    image_generator = get_image_generator()
+    slide_builder = get_slide_builder()
+    
+    with work_class("batch"), deadline_context(Deadline()), budget_context(RequestBudget()):
+        # The delivered records stay as they are; upgraded slides are copies
+        upgraded = list(delivered)
         
-        # Step 3: Generate images for each slide (if enabled)
-        if request.generate_images:
-            slides_with_images = await image_generator.generate_images(expanded_slides)
-        else:
-            slides_with_images = expanded_slides
+        # Re-expand slides whose content fell back
+        positions = [position for position in job.pending_slides if "content" in delivered[position].degraded]
+        if positions:
+            expanded = await content_generator.expand_slides(
+                [replace(slides[position], bullets=list(slides[position].bullets), degraded=[]) for position in positions],
+                include_speaker_notes=options.include_speaker_notes
+            )
+            for position, slide in zip(positions, expanded):
+                upgraded[position] = slide
+        
+        # Every pending slide lacks its real image: it has a placeholder
+        # ("image" degraded), draft art (progressive mode) or, when its
+        # content fell back, no image prompt until it was re-expanded above
+        if options.generate_images:
+            for position in job.pending_slides:
+                if upgraded[position] is delivered[position]:
+                    upgraded[position] = replace(delivered[position], image_path=None, degraded=[])
+            imaged = [upgraded[position] for position in job.pending_slides]
+            # Library images kept by the other slides are not repeated
+            await image_generator.generate_images(
+                imaged,
+                used_images={slide.image_path for slide in upgraded if slide.image_path}
+            )
         
-        # Step 4: Build the slide deck
         output_path = await slide_builder.build_deck(
-            slides_with_images,
+            upgraded,
             output_dir=OUTPUT_DIR,
-            theme=request.theme
+            theme=options.theme,
+            output_path=job.next_path()
         )
-        
-        # Step 5: Export to PDF if requested
         pdf_path = None
-        if request.export_pdf:
-            pdf_path = await slide_builder.export_to_pdf(output_path)
-        
-        return GenerateResponse(
-            file_path=output_path,
-            pdf_path=pdf_path,
-            total_slides=len(slides_with_images),
-            message="Deck generated successfully"
+        if options.export_pdf:
+            pdf_path = await slide_builder.export_to_pdf(output_path, upgraded, options.theme)
+    
+    job.publish(output_path, pdf_path)
+
+
+async def _upgrade_images(job: UpgradeJob, delivered: List[SlideRecord], options: GenerateOptions):
+    """
+    Generate the real images of a draft deck and publish it as a new version.
+    
+    Only the pictures of the drafted slides are replaced in a copy of the
+    deck; the slides themselves are not rebuilt.
+    
+    Args:
+        job: The upgrade job, updated with the new version
+        delivered: Slides of the draft deck
+        options: Options of the original request
+    """
+    image_generator = get_image_generator()
+    slide_builder = get_slide_builder()
+    
+    with work_class("batch"), deadline_context(Deadline()), budget_context(RequestBudget()):
+        drafts = [
+            SlideRecord(title=delivered[position].title, image_prompt=delivered[position].image_prompt)
+            for position in job.pending_slides
+        ]
+        await image_generator.generate_images(
+            drafts,
+            used_images={slide.image_path for slide in delivered if slide.image_path}
         )
         
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Deck generation failed: {str(e)}")
+        # Slides whose image failed (and fell back to a URL) keep their art
+        images = {}
+        pending = []
+        for position, slide in zip(job.pending_slides, drafts):
+            if slide.image_path and os.path.exists(slide.image_path):
+                images[position] = slide.image_path
+            else:
+                pending.append(position)
+        
+        output_path = await slide_builder.replace_images(job.file_path, images, job.next_path())
+        pdf_path = None
+        if options.export_pdf:
+            # The new version is the delivered slides with the new pictures
+            slides = [
+                replace(slide, image_path=images.get(position, slide.image_path))
+                for position, slide in enumerate(delivered)
+            ]
+            pdf_path = await slide_builder.export_to_pdf(output_path, slides, options.theme)
+    
+    job.publish(output_path, pdf_path, pending)
+
+
+async def _generate_large_deck(
+    slides: List[SlideRecord],
+    options: GenerateOptions,
+    budget: RequestBudget,
+    service_level: Optional[ServiceLevel] = None,
+    checkpoint: Optional[JobCheckpoint] = None
+) -> GenerateResponse:
+    """
+    Generate a deck chunk by chunk so memory stays flat as slide count grows.
+    
+    Each chunk is expanded, imaged and handed to the streaming builder before
+    the next one starts, so only one chunk of full slide content is alive.
+    For the same reason degraded slides are reported but never upgraded,
+    and progressive mode does not apply: the finished slides are no longer held.
+    The PDF, if asked for, is rendered alongside, a chunk of pages at a time.
+    """
+    content_generator = get_content_generator()
+    image_generator = get_image_generator()
+    slide_builder = get_slide_builder()
+    chunk_size = slide_builder.chunk_size
+    # Chunks are expanded one at a time; budget shares span the whole deck
+    budget.expect_slides(len(slides))
+    # Soft deadlines span the whole deck, like the budget
+    expand_deadline = image_deadline = None
+    if service_level is not None:
+        expand_deadline = service_level.expand_deadline(images=options.generate_images)
+        image_deadline = service_level.image_deadline()
+    degraded: List[int] = []
+    # Library images are not repeated anywhere in the deck
+    used_images: Set[str] = set()
+    expansions = images = None
+    if checkpoint is not None:
+        expansions = _expansion_memo(checkpoint)
+        images = checkpoint.memo("image", valid=os.path.exists)
+    
+    async def expanded_chunks() -> AsyncIterator[SlideRecord]:
+        for start in range(0, len(slides), chunk_size):
+            chunk = await content_generator.expand_slides(
+                slides[start:start + chunk_size],
+                include_speaker_notes=options.include_speaker_notes,
+                soft_deadline=expand_deadline,
+                expansions=expansions
+            )
+            if options.generate_images:
+                chunk = await image_generator.generate_images(
+                    chunk,
+                    soft_deadline=image_deadline,
+                    used_images=used_images,
+                    images=images
+                )
+            degraded.extend(start + position for position in _degraded_positions(chunk, "generate"))
+            if checkpoint is not None and options.export_pdf:
+                _checkpoint_slides(checkpoint, chunk, start)
+            for slide in chunk:
+                yield slide
+    
+    # Pages are rendered chunk by chunk too, as the slides are
+    pdf = slide_builder.pdf_stream(OUTPUT_DIR, options.theme) if options.export_pdf else None
+    output_path = await slide_builder.build_deck_streaming(
+        expanded_chunks(),
+        output_dir=OUTPUT_DIR,
+        theme=options.theme,
+        chunk_size=chunk_size,
+        pdf=pdf
+    )
+    if checkpoint is not None and not degraded:
+        checkpoint.put("build", output_path)
+    
+    pdf_path = None
+    if options.export_pdf:
+        pdf_path = await slide_builder.export_to_pdf(output_path, theme=options.theme, pdf=pdf)
+        if checkpoint is not None and not degraded and pdf_path:
+            checkpoint.put("export", pdf_path)
+    
+    message = "Deck generated successfully"
+    if degraded:
+        message = f"Deck generated with fallback content on {len(degraded)} slides to meet the SLA"
+    return GenerateResponse(
+        file_path=output_path,
+        pdf_path=pdf_path,
+        total_slides=len(slides),
+        message=message,
+        usage=budget.report(),
+        degraded_slides=degraded,
+        checkpoint=checkpoint.report() if checkpoint is not None else None
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    """Expose metrics in the Prometheus text format."""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
 
 
 @app.get("/download/{filename}")
@@ -149,7 +1131,7 @@ async def download_file(filename: str):
     
     Args:
         filename: Name of the file to download
-        
+    
     Returns:
         FileResponse with the requested file
     """
@@ -165,7 +1147,26 @@ async def download_file(filename: str):
     )
 
 
+@app.get("/upgrades/{job_id}", response_model=UpgradeStatus)
+async def upgrade_status(job_id: str):
+    """
+    Poll a background deck upgrade.
+    
+    Args:
+        job_id: Id returned as upgrade_job by /generate
+    
+    Returns:
+        UpgradeStatus with the latest deck version
+    """
+    job = upgrade_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Upgrade job not found")
+    return job.to_api()
+
+
 if __name__ == "__main__":
+    import uvicorn
+    
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
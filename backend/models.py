@@ -3,7 +3,8 @@ Data models for the Prompt2Deck API.
 Defines request/response schemas and internal data structures.
 """
 
-from typing import List, Optional
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -15,13 +16,99 @@ class SlideData(BaseModel):
     speaker_notes: Optional[str] = Field(None, description="Optional speaker notes")
     image_path: Optional[str] = Field(None, description="Path to generated image")
     image_prompt: Optional[str] = Field(None, description="Prompt used for image generation")
+    degraded: List[str] = Field(
+        default_factory=list, description="Stages replaced by fallback content to meet the SLA"
+    )
 
 
-class PreviewRequest(BaseModel):
+@dataclass(slots=True)
+class SlideRecord:
+    """
+    Internal slide representation passed between pipeline stages.
+    
+    Every stage builds or updates one per slide, so this is a plain slotted
+    dataclass; it is validated as SlideData only at the API boundary.
+    """
+    
+    title: str
+    bullets: List[str] = field(default_factory=list)
+    speaker_notes: Optional[str] = None
+    image_path: Optional[str] = None
+    image_prompt: Optional[str] = None
+    degraded: List[str] = field(default_factory=list)  # "content" and/or "image"
+    
+    def to_api(self) -> SlideData:
+        """Convert to the validated API model."""
+        return SlideData(
+            title=self.title,
+            bullets=self.bullets,
+            speaker_notes=self.speaker_notes,
+            image_path=self.image_path,
+            image_prompt=self.image_prompt,
+            degraded=self.degraded
+        )
+
+
+class PreviewOptions(BaseModel):
+    """Options for slide preview, shared by JSON and upload requests."""
+    
+    include_speaker_notes: bool = Field(default=True, description="Generate speaker notes")
+    target_slides: Optional[int] = Field(
+        default=None, ge=2, description="Slide count to aim for when summarizing a long document"
+    )
+    token_budget: Optional[int] = Field(
+        default=None, ge=1, description="Maximum LLM tokens to spend (defaults to REQUEST_TOKEN_BUDGET)"
+    )
+    time_budget_seconds: Optional[float] = Field(
+        default=None, gt=0, description="Wall-clock budget for LLM generation (defaults to REQUEST_TIME_BUDGET_SECONDS)"
+    )
+    sla_seconds: Optional[float] = Field(
+        default=None, gt=0,
+        description="Respond within this many seconds, filling unfinished slides with fallback content (defaults to REQUEST_SLA_SECONDS)"
+    )
+    previous_preview_id: Optional[str] = Field(
+        default=None, description="preview_id of an earlier preview: its unchanged slides are not expanded again"
+    )
+
+
+class PreviewRequest(PreviewOptions):
     """Request model for slide preview endpoint."""
     
     input_text: str = Field(..., description="Input text, topic, or outline")
-    include_speaker_notes: bool = Field(default=True, description="Generate speaker notes")
+
+
+class TaskUsage(BaseModel):
+    """Token usage of one kind of LLM call."""
+    
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class SlideUsage(BaseModel):
+    """Token usage of the LLM calls made for one slide."""
+    
+    index: int = Field(..., description="Position of the slide in the deck")
+    title: str = Field(..., description="Slide title")
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    skipped: List[str] = Field(default_factory=list, description="Stages skipped to stay within budget")
+
+
+class UsageReport(BaseModel):
+    """Token usage and budget outcome of a request."""
+    
+    prompt_tokens: int = Field(..., description="Prompt tokens across all LLM calls")
+    completion_tokens: int = Field(..., description="Completion tokens across all LLM calls")
+    total_tokens: int = Field(..., description="Prompt plus completion tokens")
+    llm_calls: int = Field(..., description="Number of LLM calls made")
+    elapsed_seconds: float = Field(..., description="Wall-clock time since the request started")
+    token_budget: Optional[int] = Field(None, description="Token budget applied, if any")
+    time_budget_seconds: Optional[float] = Field(None, description="Time budget applied, if any")
+    budget_exhausted: bool = Field(False, description="Whether a budget ran out")
+    by_task: Dict[str, TaskUsage] = Field(default_factory=dict, description="Usage per task")
+    slides: List[SlideUsage] = Field(default_factory=list, description="Usage per slide")
+    skipped: Dict[str, int] = Field(default_factory=dict, description="Stages skipped per task")
 
 
 class PreviewResponse(BaseModel):
@@ -29,16 +116,71 @@ class PreviewResponse(BaseModel):
     
     slides: List[SlideData] = Field(..., description="List of slide data")
     total_slides: int = Field(..., description="Total number of slides")
+    usage: Optional[UsageReport] = Field(None, description="Token usage and budget outcome")
+    degraded_slides: List[int] = Field(
+        default_factory=list, description="Positions of slides with fallback content (SLA mode)"
+    )
+    preview_id: Optional[str] = Field(
+        None, description="Handle to pass as previous_preview_id when previewing an edited outline"
+    )
+    reused_slides: List[int] = Field(
+        default_factory=list, description="Positions of slides carried over unchanged from the previous preview"
+    )
 
 
-class GenerateRequest(BaseModel):
-    """Request model for deck generation endpoint."""
+class ResumeReport(BaseModel):
+    """What checkpoints of earlier attempts saved a generation job."""
+    
+    job_id: str = Field(..., description="Id the job's checkpoints are kept under")
+    resumed: bool = Field(..., description="Whether an earlier attempt had checkpointed work")
+    load_seconds: float = Field(..., description="Time taken to load the checkpoints")
+    restored: Dict[str, int] = Field(
+        default_factory=dict, description="Work items taken from checkpoints, by stage"
+    )
+    computed: Dict[str, int] = Field(
+        default_factory=dict,
+        description="Work items done in this attempt, by stage (on a resumed job, an upper bound of repeated work)"
+    )
+
+
+class GenerateOptions(BaseModel):
+    """Options for deck generation, shared by JSON and upload requests."""
     
-    input_text: str = Field(..., description="Input text, topic, or outline")
     include_speaker_notes: bool = Field(default=True, description="Generate speaker notes")
     generate_images: bool = Field(default=True, description="Generate images for slides")
     export_pdf: bool = Field(default=False, description="Export to PDF in addition to PPTX")
     theme: str = Field(default="professional", description="Slide deck theme")
+    target_slides: Optional[int] = Field(
+        default=None, ge=2, description="Slide count to aim for when summarizing a long document"
+    )
+    large_deck: bool = Field(
+        default=False,
+        description="Build in bounded-memory chunks (enabled automatically for large outlines)"
+    )
+    token_budget: Optional[int] = Field(
+        default=None, ge=1, description="Maximum LLM tokens to spend (defaults to REQUEST_TOKEN_BUDGET)"
+    )
+    time_budget_seconds: Optional[float] = Field(
+        default=None, gt=0, description="Wall-clock budget for LLM generation (defaults to REQUEST_TIME_BUDGET_SECONDS)"
+    )
+    sla_seconds: Optional[float] = Field(
+        default=None, gt=0,
+        description="Respond within this many seconds, filling unfinished slides with fallback content (defaults to REQUEST_SLA_SECONDS)"
+    )
+    upgrade_degraded: bool = Field(
+        default=False,
+        description="Queue a background job that regenerates degraded slides and publishes a new deck version"
+    )
+    progressive: bool = Field(
+        default=False,
+        description="Return a draft with placeholder art at once; the real images follow as a new deck version"
+    )
+
+
+class GenerateRequest(GenerateOptions):
+    """Request model for deck generation endpoint."""
+    
+    input_text: str = Field(..., description="Input text, topic, or outline")
 
 
 class GenerateResponse(BaseModel):
@@ -48,11 +190,42 @@ class GenerateResponse(BaseModel):
     pdf_path: Optional[str] = Field(None, description="Path to generated PDF file")
     total_slides: int = Field(..., description="Total number of slides")
     message: str = Field(..., description="Status message")
+    usage: Optional[UsageReport] = Field(None, description="Token usage and budget outcome")
+    degraded_slides: List[int] = Field(
+        default_factory=list, description="Positions of slides with fallback content (SLA mode)"
+    )
+    upgrade_job: Optional[str] = Field(
+        None, description="Id of the background upgrade job, polled at /upgrades/{job_id}"
+    )
+    checkpoint: Optional[ResumeReport] = Field(
+        None, description="Checkpointing of the job: work restored from earlier attempts and done now"
+    )
 
 
-class OutlineSection(BaseModel):
-    """Internal model for parsed outline sections."""
+class UpgradeStatus(BaseModel):
+    """State of a background deck upgrade."""
+    
+    job_id: str = Field(..., description="Upgrade job id")
+    status: str = Field(..., description="queued, running, done or failed")
+    version: int = Field(..., description="Deck version; 1 is the deck first returned")
+    file_path: str = Field(..., description="Path to the latest deck version")
+    pdf_path: Optional[str] = Field(None, description="Path to the latest PDF version")
+    pending_slides: List[int] = Field(
+        default_factory=list, description="Positions of slides still awaiting an upgrade"
+    )
+    error: Optional[str] = Field(None, description="Failure reason, if the upgrade failed")
+
+
+@dataclass(slots=True)
+class OutlineSection:
+    """
+    Internal model for parsed outline sections.
+    
+    A plain slotted dataclass rather than a pydantic model: the parser builds
+    one per outline line and never exposes them through the API.
+    """
     
     title: str
-    sub_points: List[str] = Field(default_factory=list)
-    depth: int = Field(default=0, description="Nesting depth in outline")
+    sub_points: List[str] = field(default_factory=list)  # Titles of direct children
+    depth: int = 0  # Nesting depth in outline
+    children: List["OutlineSection"] = field(default_factory=list)
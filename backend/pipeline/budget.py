@@ -0,0 +1,246 @@
+"""
+Budget Module
+Token accounting and per-request token/time budgets for LLM generation.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+from models import SlideUsage, TaskUsage, UsageReport
+from telemetry import traced_completion
+
+
+# Stages a slide can do without when the budget runs low
+OPTIONAL_TASKS = frozenset({"speaker_notes", "image_prompt"})
+
+_current_budget: ContextVar[Optional["RequestBudget"]] = ContextVar("request_budget", default=None)
+
+
+@dataclass(slots=True)
+class _SlideLedger:
+    """Per-slide usage; converted to SlideUsage only for the report."""
+    
+    index: int
+    title: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    skipped: List[str] = field(default_factory=list)
+
+
+class RequestBudget:
+    """
+    Tracks LLM token usage for one request and enforces its budgets.
+    
+    Usage is recorded per call, per task and per slide. With a token budget,
+    each call's max_tokens is shrunk to the share of the remaining budget
+    left for each pending slide; when that share (or the remaining wall-clock
+    time) runs low, optional stages are skipped, and once the budget is spent
+    the remaining slides fall back to mock expansion.
+    """
+    
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        max_seconds: Optional[float] = None
+    ):
+        """
+        Initialize an empty ledger.
+        
+        Args:
+            max_tokens: Token budget for the request (None for unlimited)
+            max_seconds: Wall-clock budget for the request (None for unlimited)
+        """
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        self.started_at = time.monotonic()
+        # Smallest max_tokens a call is ever shrunk to
+        self.min_output_tokens = 32
+        # Per-slide token share below which optional stages are skipped
+        self.optional_min_share = 600
+        # Fraction of the time budget below which optional stages are skipped
+        self.optional_min_time_fraction = 0.25
+        
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.calls = 0
+        self.by_task: Dict[str, TaskUsage] = {}
+        self.slides: List[_SlideLedger] = []
+        self.skipped: Dict[str, int] = {}
+        self.expected_slides = 0
+    
+    @classmethod
+    def from_options(cls, options) -> "RequestBudget":
+        """
+        Build a budget from request options, falling back to the server defaults.
+        
+        REQUEST_TOKEN_BUDGET and REQUEST_TIME_BUDGET_SECONDS set the defaults;
+        0 (the default) means unlimited.
+        """
+        max_tokens = getattr(options, "token_budget", None)
+        if max_tokens is None:
+            max_tokens = int(os.getenv("REQUEST_TOKEN_BUDGET", "0")) or None
+        max_seconds = getattr(options, "time_budget_seconds", None)
+        if max_seconds is None:
+            max_seconds = float(os.getenv("REQUEST_TIME_BUDGET_SECONDS", "0")) or None
+        return cls(max_tokens=max_tokens, max_seconds=max_seconds)
+    
+    @property
+    def used_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+    
+    @property
+    def elapsed_seconds(self) -> float:
+        return time.monotonic() - self.started_at
+    
+    @property
+    def remaining_tokens(self) -> Optional[int]:
+        if self.max_tokens is None:
+            return None
+        return self.max_tokens - self.used_tokens
+    
+    @property
+    def remaining_seconds(self) -> Optional[float]:
+        if self.max_seconds is None:
+            return None
+        return self.max_seconds - self.elapsed_seconds
+    
+    @property
+    def exhausted(self) -> bool:
+        """Whether no further LLM calls should be made."""
+        tokens, seconds = self.remaining_tokens, self.remaining_seconds
+        return (tokens is not None and tokens <= 0) or (seconds is not None and seconds <= 0)
+    
+    def expect_slides(self, count: int):
+        """Declare that `count` more slides are about to be expanded."""
+        self.expected_slides = max(self.expected_slides, len(self.slides) + count)
+    
+    def begin_slide(self, title: str) -> int:
+        """Start accounting for a slide and return its index."""
+        self.slides.append(_SlideLedger(index=len(self.slides), title=title))
+        return len(self.slides) - 1
+    
+    def _token_share(self) -> Optional[int]:
+        """Remaining tokens per pending slide, counting the current one."""
+        remaining = self.remaining_tokens
+        if remaining is None:
+            return None
+        pending = max(1, self.expected_slides - len(self.slides) + 1)
+        return remaining // pending
+    
+    def output_limit(self, requested: int) -> int:
+        """Shrink a call's max_tokens to fit the current slide's share of the budget."""
+        share = self._token_share()
+        if share is None:
+            return requested
+        # A slide makes up to three calls, each also paying for its prompt
+        return max(self.min_output_tokens, min(requested, share // 6))
+    
+    def allows(self, task: str, slide: Optional[int] = None) -> bool:
+        """
+        Decide whether a stage should run, recording it as skipped if not.
+        
+        Args:
+            task: Task name, e.g. "bullets" or "speaker_notes"
+            slide: Index of the slide the task belongs to
+        
+        Returns:
+            False once the budget is spent, or for optional tasks when the
+            budget is running low; True otherwise
+        """
+        allowed = not self.exhausted
+        if allowed and task in OPTIONAL_TASKS:
+            share = self._token_share()
+            seconds = self.remaining_seconds
+            if share is not None and share < self.optional_min_share:
+                allowed = False
+            elif seconds is not None and seconds < self.max_seconds * self.optional_min_time_fraction:
+                allowed = False
+        
+        if not allowed:
+            self.skipped[task] = self.skipped.get(task, 0) + 1
+            if slide is not None:
+                self.slides[slide].skipped.append(task)
+        return allowed
+    
+    def record(self, task: str, usage, slide: Optional[int] = None):
+        """
+        Record the usage reported on one LLM response.
+        
+        Args:
+            task: Task name the call was made for
+            usage: response.usage from the OpenAI API (may be None)
+            slide: Index of the slide the call belongs to
+        """
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        
+        task_usage = self.by_task.setdefault(task, TaskUsage())
+        task_usage.calls += 1
+        task_usage.prompt_tokens += prompt_tokens
+        task_usage.completion_tokens += completion_tokens
+        
+        if slide is not None:
+            self.slides[slide].prompt_tokens += prompt_tokens
+            self.slides[slide].completion_tokens += completion_tokens
+    
+    def report(self) -> UsageReport:
+        """Summarize usage for the API response."""
+        return UsageReport(
+            prompt_tokens=self.prompt_tokens,
+            completion_tokens=self.completion_tokens,
+            total_tokens=self.used_tokens,
+            llm_calls=self.calls,
+            elapsed_seconds=round(self.elapsed_seconds, 3),
+            token_budget=self.max_tokens,
+            time_budget_seconds=self.max_seconds,
+            budget_exhausted=self.exhausted,
+            by_task=self.by_task,
+            slides=[SlideUsage(**asdict(slide)) for slide in self.slides],
+            skipped=self.skipped
+        )
+
+
+@contextmanager
+def budget_context(budget: RequestBudget):
+    """Make `budget` the active budget for the current request."""
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+def current_budget() -> Optional[RequestBudget]:
+    """The budget of the request being served, if any."""
+    return _current_budget.get()
+
+
+async def budgeted_completion(client, task: str, slide: Optional[int] = None, **kwargs):
+    """
+    Create a traced chat completion that is limited by and charged to the active budget.
+    
+    Args:
+        client: AsyncOpenAI client
+        task: Task label, e.g. "bullets" or "summary"
+        slide: Index of the slide the call belongs to, if any
+        **kwargs: Arguments for client.chat.completions.create
+    
+    Returns:
+        The chat completion response
+    """
+    budget = current_budget()
+    if budget is not None and "max_tokens" in kwargs:
+        kwargs["max_tokens"] = budget.output_limit(kwargs["max_tokens"])
+    
+    response = await traced_completion(client, task, **kwargs)
+    
+    if budget is not None:
+        budget.record(task, getattr(response, "usage", None), slide)
+    return response
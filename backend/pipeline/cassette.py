@@ -0,0 +1,260 @@
+"""
+Cassette Module
+Records LLM and image API traffic to a file and replays it offline.
+
+In record mode every chat.completions.create and images.generate call,
+and every image download, is captured with its latency. In replay mode the
+same calls are answered from the cassette, optionally sleeping for the
+recorded latency, so real decks can be rerun through the whole pipeline
+for profiling and regression benchmarks without network access.
+"""
+
+import os
+import json
+import gzip
+import base64
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "record", "replay")
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode when a request was never recorded."""
+    pass
+
+
+def _digest(kind: str, payload) -> str:
+    data = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{kind}\0{data}".encode("utf-8")).hexdigest()
+
+
+def _keys(kind: str, request: dict) -> List[str]:
+    """
+    Lookup keys for a request, most specific first.
+    
+    The exact key covers every argument. The loose key covers only the
+    prompt (or URL), so a replay still matches when a budget shrank
+    max_tokens or the router picked another model than when recording.
+    """
+    if kind == "chat":
+        loose = request.get("messages")
+    elif kind == "image":
+        loose = request.get("prompt")
+    else:
+        loose = request.get("url")
+    return [_digest(kind, request), _digest(f"{kind}:loose", loose)]
+
+
+class Cassette:
+    """
+    An append-only file of recorded calls, one JSON entry per line.
+    
+    Paths ending in .gz are gzip-compressed; recorded image bytes dominate
+    the size otherwise. Entries are appended as they are recorded, so a
+    crashed recording keeps everything captured up to that point.
+    """
+    
+    def __init__(self, path: str, mode: str, latency_scale: float = 1.0):
+        """
+        Open a cassette.
+        
+        Args:
+            path: Cassette file path
+            mode: "record" or "replay"
+            latency_scale: Replay sleeps for recorded latency times this (0 for none)
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[dict]] = defaultdict(list)
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+        
+        if mode == "replay":
+            self._load()
+        else:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+    
+    def _open(self, mode: str):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, mode + "t", encoding="utf-8")
+        return open(self.path, mode, encoding="utf-8")
+    
+    def _load(self):
+        with self._open("r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                for key in entry["keys"]:
+                    self._entries[key].append(entry)
+        logger.info("Loaded cassette %s", self.path)
+    
+    async def record(self, kind: str, request: dict, response: dict, seconds: float):
+        """
+        Append one call to the cassette.
+        
+        Serializing the entry (recorded images included) and writing it run
+        in a worker thread, so recording does not stall the event loop.
+        """
+        await asyncio.to_thread(self._append, kind, request, response, seconds)
+    
+    def _append(self, kind: str, request: dict, response: dict, seconds: float):
+        entry = {
+            "kind": kind,
+            "keys": _keys(kind, request),
+            "seconds": round(seconds, 6),
+            "response": response,
+        }
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            with self._open("a") as f:
+                f.write(line)
+            self.recorded += 1
+    
+    def lookup(self, kind: str, request: dict) -> dict:
+        """
+        Find the recorded entry for a request.
+        
+        Repeated identical requests get the recorded responses in order,
+        starting over once they run out.
+        
+        Raises:
+            CassetteMiss: If the request was not recorded
+        """
+        with self._lock:
+            for key in _keys(kind, request):
+                entries = self._entries.get(key)
+                if entries:
+                    entry = entries[self._cursor[key] % len(entries)]
+                    self._cursor[key] += 1
+                    self.replayed += 1
+                    return entry
+            self.misses += 1
+        raise CassetteMiss(f"No recorded {kind} call matches the request")
+    
+    async def replay(self, kind: str, request: dict) -> dict:
+        """Return the recorded response, after the scaled recorded latency."""
+        entry = self.lookup(kind, request)
+        if self.latency_scale > 0:
+            await asyncio.sleep(entry["seconds"] * self.latency_scale)
+        return entry["response"]
+
+
+def cassette_from_env() -> Optional[Cassette]:
+    """
+    Build the cassette configured by LLM_CASSETTE_MODE (off, record, replay),
+    LLM_CASSETTE (file path) and LLM_CASSETTE_LATENCY_SCALE.
+    
+    Returns:
+        Cassette, or None when the mode is off
+    """
+    mode = os.getenv("LLM_CASSETTE_MODE", "off").lower()
+    if mode not in MODES:
+        raise ValueError(f"LLM_CASSETTE_MODE must be one of {', '.join(MODES)}, got {mode!r}")
+    if mode == "off":
+        return None
+    path = os.getenv("LLM_CASSETTE", "cassettes/default.jsonl.gz")
+    scale = float(os.getenv("LLM_CASSETTE_LATENCY_SCALE", "1.0"))
+    return Cassette(path, mode, latency_scale=scale)
+
+
+# --- Client wrappers -----------------------------------------------------------
+
+class _Namespace:
+    """Attribute holder mirroring the client's client.chat.completions layout."""
+    
+    def __init__(self, **attrs):
+        self.__dict__.update(attrs)
+
+
+class CassetteOpenAI:
+    """
+    Stands in for AsyncOpenAI, recording or replaying the calls the pipeline makes.
+    
+    In record mode calls are forwarded to the wrapped client; in replay mode
+    there is no wrapped client and no API key is needed.
+    """
+    
+    def __init__(self, cassette: Cassette, client=None):
+        self.cassette = cassette
+        self.client = client
+        self.chat = _Namespace(completions=_Namespace(create=self._create_completion))
+        self.images = _Namespace(generate=self._generate_image)
+    
+    async def _create_completion(self, **kwargs):
+        if self.cassette.mode == "replay":
+            from openai.types.chat import ChatCompletion
+            return ChatCompletion.model_validate(await self.cassette.replay("chat", kwargs))
+        start = time.perf_counter()
+        response = await self.client.chat.completions.create(**kwargs)
+        await self.cassette.record(
+            "chat", kwargs, response.model_dump(mode="json"), time.perf_counter() - start
+        )
+        return response
+    
+    async def _generate_image(self, **kwargs):
+        if self.cassette.mode == "replay":
+            from openai.types import ImagesResponse
+            return ImagesResponse.model_validate(await self.cassette.replay("image", kwargs))
+        start = time.perf_counter()
+        response = await self.client.images.generate(**kwargs)
+        await self.cassette.record(
+            "image", kwargs, response.model_dump(mode="json"), time.perf_counter() - start
+        )
+        return response
+    
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+
+
+class CassetteHTTP:
+    """Stands in for httpx.AsyncClient for image downloads, recording the bytes."""
+    
+    def __init__(self, cassette: Cassette, client=None):
+        self.cassette = cassette
+        self.client = client
+    
+    async def get(self, url: str, **kwargs):
+        import httpx
+        request = {"url": str(url)}
+        if self.cassette.mode == "replay":
+            recorded = await self.cassette.replay("http", request)
+            return httpx.Response(
+                recorded["status_code"],
+                headers=recorded["headers"],
+                content=base64.b64decode(recorded["content"]),
+                request=httpx.Request("GET", url)
+            )
+        start = time.perf_counter()
+        response = await self.client.get(url, **kwargs)
+        await self.cassette.record(
+            "http",
+            request,
+            {
+                "status_code": response.status_code,
+                "headers": {"content-type": response.headers.get("content-type", "")},
+                "content": base64.b64encode(response.content).decode("ascii"),
+            },
+            time.perf_counter() - start
+        )
+        return response
+    
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
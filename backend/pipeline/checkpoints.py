@@ -0,0 +1,274 @@
+"""
+Checkpoints Module
+Durable per-stage results of generation jobs, so a retried job resumes where it stopped.
+"""
+
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Set
+from models import ResumeReport
+from telemetry import CHECKPOINT_ITEMS, CHECKPOINT_LOAD_DURATION
+
+logger = logging.getLogger(__name__)
+
+# Stages of a generation job, in pipeline order
+STAGES = ("parse", "expand", "image", "build", "export")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    job_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (job_id, stage, key)
+);
+"""
+
+_store: Optional["CheckpointStore"] = None
+_store_lock = threading.Lock()
+
+
+class CheckpointStore:
+    """
+    A local SQLite store of the work items generation jobs have finished.
+    
+    Every item (the parsed outline, one slide's expansion, one image, the
+    built deck, its PDF) is committed as soon as it is done, so a worker
+    dying loses at most the items in flight. The database is in WAL mode
+    with synchronous=NORMAL: a commit survives the process crashing, and
+    costs no fsync. Jobs untouched for `ttl_seconds` are deleted.
+    
+    Its methods block on SQLite; async code runs them in a worker thread
+    (open_job through asyncio.to_thread, saves through JobCheckpoint.put).
+    """
+    
+    def __init__(self, path: str, ttl_seconds: float = 86400.0):
+        """
+        Open (or create) the store.
+        
+        Args:
+            path: SQLite database file
+            ttl_seconds: Age after which a job's checkpoints are dropped
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+    
+    def open_job(self, job_id: str, fingerprint: str) -> "JobCheckpoint":
+        """
+        Start or resume a job, loading what earlier attempts finished.
+        
+        Args:
+            job_id: Id the client retries the job under
+            fingerprint: Hash of the job's input and options; checkpoints
+                made for a different fingerprint are discarded
+        
+        Returns:
+            The job's checkpoints
+        """
+        start = time.perf_counter()
+        now = time.time()
+        items: Dict[str, Dict[str, Any]] = {stage: {} for stage in STAGES}
+        with self._lock:
+            connection = self._connection
+            connection.execute("BEGIN")
+            try:
+                expired = now - self.ttl_seconds
+                connection.execute(
+                    "DELETE FROM items WHERE job_id IN (SELECT job_id FROM jobs WHERE updated_at < ?)",
+                    (expired,)
+                )
+                connection.execute("DELETE FROM jobs WHERE updated_at < ?", (expired,))
+                
+                row = connection.execute("SELECT fingerprint FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                if row is not None and row[0] != fingerprint:
+                    logger.info("Job %s was retried with another input; starting over", job_id[:12])
+                    connection.execute("DELETE FROM items WHERE job_id = ?", (job_id,))
+                connection.execute(
+                    "INSERT OR REPLACE INTO jobs (job_id, fingerprint, updated_at) VALUES (?, ?, ?)",
+                    (job_id, fingerprint, now)
+                )
+                for stage, key, value in connection.execute(
+                    "SELECT stage, key, value FROM items WHERE job_id = ?", (job_id,)
+                ):
+                    items.setdefault(stage, {})[key] = json.loads(value)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        
+        load_seconds = time.perf_counter() - start
+        CHECKPOINT_LOAD_DURATION.observe(load_seconds)
+        return JobCheckpoint(self, job_id, items, load_seconds)
+    
+    def save(self, job_id: str, stage: str, key: str, value: Any):
+        """Commit one finished work item."""
+        encoded = json.dumps(value)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO items (job_id, stage, key, value) VALUES (?, ?, ?, ?)",
+                (job_id, stage, key, encoded)
+            )
+    
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class JobCheckpoint:
+    """
+    The checkpointed work of one job, and what resuming it saved.
+    
+    Single results (parse, build, export) are read and written with get()
+    and put(); per-slide results go through a memo() the pipeline stages
+    read and extend. Items are committed in worker threads, off the event
+    loop; flush() waits for the commits made so far.
+    """
+    
+    def __init__(self, store: CheckpointStore, job_id: str, items: Dict[str, Dict[str, Any]], load_seconds: float):
+        self.store = store
+        self.job_id = job_id
+        self.items = items
+        self.load_seconds = load_seconds
+        self.resumed = any(items.values())
+        self.restored: Dict[str, int] = {}
+        self.computed: Dict[str, int] = {}
+        self._saving: Set[asyncio.Future] = set()
+    
+    def get(self, stage: str, key: str = "", valid: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """
+        A finished item, counted as restored, or None.
+        
+        Args:
+            stage: Stage of the item
+            key: Item within the stage ("" for single results)
+            valid: Check the item is still usable, e.g. that a file still exists
+        """
+        value = self.items.get(stage, {}).get(key)
+        if value is None or (valid is not None and not valid(value)):
+            return None
+        self._count(self.restored, stage, "restored")
+        return value
+    
+    def put(self, stage: str, value: Any, key: str = ""):
+        """Checkpoint a finished item; the commit runs in a worker thread."""
+        self.items.setdefault(stage, {})[key] = value
+        saving = asyncio.ensure_future(asyncio.to_thread(self.store.save, self.job_id, stage, key, value))
+        self._saving.add(saving)
+        saving.add_done_callback(self._saving.discard)
+        self._count(self.computed, stage, "saved")
+    
+    async def flush(self):
+        """
+        Wait until every item put so far is committed.
+        
+        Raises:
+            sqlite3.Error: If a commit failed
+        """
+        while self._saving:
+            await asyncio.gather(*self._saving)
+    
+    def memo(
+        self,
+        stage: str,
+        decode: Callable[[Any], Any] = lambda value: value,
+        encode: Callable[[Any], Any] = lambda value: value,
+        valid: Optional[Callable[[Any], bool]] = None
+    ) -> "StageMemo":
+        """
+        A dict of the stage's items by key that checkpoints every entry added to it.
+        
+        Args:
+            stage: Stage of the items
+            decode: Turns a checkpointed value into the memo's
+            encode: Turns a memo value into a checkpointed one
+            valid: Check an item is still usable, e.g. that a file still
+                exists; items failing it read as missing
+        """
+        return StageMemo(self, stage, decode, encode, valid)
+    
+    def report(self) -> ResumeReport:
+        """Convert to the validated API model."""
+        return ResumeReport(
+            job_id=self.job_id,
+            resumed=self.resumed,
+            load_seconds=round(self.load_seconds, 6),
+            restored=self.restored,
+            computed=self.computed
+        )
+    
+    @staticmethod
+    def _count(counts: Dict[str, int], stage: str, outcome: str):
+        counts[stage] = counts.get(stage, 0) + 1
+        CHECKPOINT_ITEMS.labels(stage=stage, outcome=outcome).inc()
+
+
+class StageMemo(dict):
+    """
+    Finished items of one stage, by key, written through to the checkpoint store.
+    
+    Stages take it as their memo argument: get() of a checkpointed item
+    that is still valid counts it as restored, and every item they add is
+    committed.
+    """
+    
+    def __init__(
+        self,
+        job: JobCheckpoint,
+        stage: str,
+        decode: Callable[[Any], Any],
+        encode: Callable[[Any], Any],
+        valid: Optional[Callable[[Any], bool]] = None
+    ):
+        super().__init__((key, decode(value)) for key, value in job.items.get(stage, {}).items())
+        self.job = job
+        self.stage = stage
+        self.encode = encode
+        self.valid = valid
+    
+    def get(self, key, default=None):
+        value = super().get(key, default)
+        if value is default:
+            return value
+        if self.valid is not None and not self.valid(value):
+            return default
+        JobCheckpoint._count(self.job.restored, self.stage, "restored")
+        return value
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.job.put(self.stage, self.encode(value), key)
+
+
+def checkpoint_store() -> Optional[CheckpointStore]:
+    """
+    Return the process-wide checkpoint store, or None unless CHECKPOINTS_ENABLED.
+    
+    CHECKPOINT_PATH and CHECKPOINT_TTL_SECONDS configure it.
+    """
+    global _store
+    if os.getenv("CHECKPOINTS_ENABLED", "false").lower() != "true":
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CheckpointStore(
+                    os.getenv("CHECKPOINT_PATH", "cache/checkpoints.sqlite3"),
+                    ttl_seconds=float(os.getenv("CHECKPOINT_TTL_SECONDS", "86400"))
+                )
+    return _store
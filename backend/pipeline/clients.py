@@ -0,0 +1,91 @@
+"""
+Clients Module
+Process-wide API clients, created on first use and shared by the pipeline.
+"""
+
+import os
+from pipeline.cassette import CassetteHTTP, CassetteOpenAI, cassette_from_env
+
+
+_openai_client = None
+_http_client = None
+_cassette = None
+_cassette_loaded = False
+
+
+def cassette():
+    """Return the cassette set up by LLM_CASSETTE_MODE, or None when it is off."""
+    global _cassette, _cassette_loaded
+    if not _cassette_loaded:
+        _cassette = cassette_from_env()
+        _cassette_loaded = True
+    return _cassette
+
+
+def openai_client():
+    """
+    Return the shared AsyncOpenAI client.
+    
+    openai is imported on first use, so modules that only hold a reference
+    to this function stay cheap to import. All pipeline components share
+    the client and therefore its connection pool. With a cassette, the
+    client records its calls, or is replaced by one that replays them.
+    
+    Returns:
+        AsyncOpenAI client, or None if OPENAI_API_KEY is not set (and no
+        cassette is being replayed)
+    """
+    global _openai_client
+    if _openai_client is not None:
+        return _openai_client
+    
+    recording = cassette()
+    if recording is not None and recording.mode == "replay":
+        _openai_client = CassetteOpenAI(recording)
+        return _openai_client
+    
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return None
+    from openai import AsyncOpenAI
+    _openai_client = AsyncOpenAI(api_key=api_key)
+    if recording is not None:
+        _openai_client = CassetteOpenAI(recording, _openai_client)
+    return _openai_client
+
+
+def set_openai_client(client):
+    """
+    Replace the shared OpenAI client, e.g. with a simulated one in load tests.
+    
+    Components pick the client up when they are built, so call this before
+    the first request.
+    """
+    global _openai_client
+    _openai_client = client
+
+
+def http_client():
+    """Return the shared httpx.AsyncClient used to download generated images."""
+    global _http_client
+    if _http_client is None:
+        recording = cassette()
+        if recording is not None and recording.mode == "replay":
+            _http_client = CassetteHTTP(recording)
+        else:
+            import httpx
+            _http_client = httpx.AsyncClient(timeout=httpx.Timeout(60.0))
+            if recording is not None:
+                _http_client = CassetteHTTP(recording, _http_client)
+    return _http_client
+
+
+async def close_clients():
+    """Close the shared clients and their connection pools."""
+    global _openai_client, _http_client
+    openai, http = _openai_client, _http_client
+    _openai_client = _http_client = None
+    if openai is not None:
+        await openai.close()
+    if http is not None:
+        await http.aclose()
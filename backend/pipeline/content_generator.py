@@ -4,9 +4,32 @@ Uses LLM to expand slide content and generate speaker notes.
 """
 
 import os
-from typing import List, Optional
-from openai import AsyncOpenAI
-from models import SlideData
+import json
+import asyncio
+import hashlib
+import logging
+from typing import Dict, List, Optional
+from models import SlideRecord
+from telemetry import CACHE_HITS, CACHE_MISSES, MOCK_FALLBACKS, span, stage
+from pipeline.budget import RequestBudget, current_budget
+from pipeline.clients import openai_client
+from pipeline.deadline import Deadline, DeadlineExceeded, check_deadline
+from pipeline.model_router import model_router
+from pipeline.semantic_cache import semantic_cache
+from pipeline.tenancy import current_tenant
+
+logger = logging.getLogger(__name__)
+
+# Bound once; the label lookup would otherwise run for every slide
+_FALLBACK_NO_API_KEY = MOCK_FALLBACKS.labels(component="content_generator", reason="no_api_key")
+_FALLBACK_BUDGET = MOCK_FALLBACKS.labels(component="content_generator", reason="budget")
+_FALLBACK_ERROR = MOCK_FALLBACKS.labels(component="content_generator", reason="error")
+_FALLBACK_SLA = MOCK_FALLBACKS.labels(component="content_generator", reason="sla")
+_REUSED = CACHE_HITS.labels(cache="expansions")
+_NOT_REUSED = CACHE_MISSES.labels(cache="expansions")
+
+# Bumped whenever an expansion prompt changes, so stale cached expansions are not reused
+_PROMPT_VERSION = "1"
 
 
 class ContentGenerator:
@@ -17,85 +40,234 @@ class ContentGenerator:
     
     def __init__(self):
         """Initialize the content generator with OpenAI client."""
-        api_key = os.getenv("OPENAI_API_KEY")
-        self.client = AsyncOpenAI(api_key=api_key) if api_key else None
-        self.model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-        self.use_mock = not api_key  # Use mock mode if no API key
+        self.client = openai_client()
+        # Picks the model per task (see MODEL_ROUTES / MODEL_FALLBACKS)
+        self.router = model_router()
+        self.use_mock = self.client is None  # Use mock mode if no API key (or cassette)
+        # Output limits per call; a request budget can shrink them further
+        self.max_tokens = {
+            "bullets": int(os.getenv("BULLETS_MAX_TOKENS", "300")),
+            "speaker_notes": int(os.getenv("SPEAKER_NOTES_MAX_TOKENS", "200")),
+            "image_prompt": int(os.getenv("IMAGE_PROMPT_MAX_TOKENS", "100")),
+        }
+        # Slides of one request expanded at once; the scheduler shares calls between requests
+        self.concurrency = max(1, int(os.getenv("EXPAND_CONCURRENCY", "4")))
+        # Reuses expansions of near-duplicate slides (None unless SEMANTIC_CACHE_ENABLED)
+        self.semantic_cache = semantic_cache()
     
     async def expand_slides(
         self,
-        slides: List[SlideData],
-        include_speaker_notes: bool = True
-    ) -> List[SlideData]:
+        slides: List[SlideRecord],
+        include_speaker_notes: bool = True,
+        soft_deadline: Optional[Deadline] = None,
+        expansions: Optional[Dict[str, SlideRecord]] = None
+    ) -> List[SlideRecord]:
         """
         Expand content for all slides.
         
+        Up to EXPAND_CONCURRENCY slides are expanded at once. Token usage is
+        charged to the active request budget, if any, and optional stages
+        are skipped as it runs out. Expansion stops at the request deadline.
+        
         Args:
             slides: List of slides with basic structure
             include_speaker_notes: Whether to generate speaker notes
+            soft_deadline: SLA mode: slides not expanded by then keep their
+                outline content and are marked as degraded
+            expansions: Complete expansions by slide_key(), e.g. of a previous
+                preview: slides found here are not expanded again. Updated
+                with the complete expansions made now.
             
         Returns:
             List of slides with expanded content
         """
-        expanded_slides = []
+        expanded_slides: List[Optional[SlideRecord]] = [None] * len(slides)
+        if expansions is not None:
+            for position, slide in enumerate(slides):
+                expansion = expansions.get(self.slide_key(slide, include_speaker_notes))
+                if expansion is None:
+                    _NOT_REUSED.inc()
+                    continue
+                _REUSED.inc()
+                expanded_slides[position] = SlideRecord(
+                    title=slide.title,
+                    bullets=list(expansion.bullets),
+                    speaker_notes=expansion.speaker_notes,
+                    image_prompt=expansion.image_prompt
+                )
         
-        for slide in slides:
-            expanded_slide = await self._expand_single_slide(
-                slide,
-                include_speaker_notes
-            )
-            expanded_slides.append(expanded_slide)
+        # Workers take slides in order, so budget shares are assigned in deck order
+        todo = [(position, slide) for position, slide in enumerate(slides) if expanded_slides[position] is None]
+        budget = current_budget()
+        if budget is not None:
+            budget.expect_slides(len(todo))
+        pending = iter(todo)
+        
+        async def worker():
+            for position, slide in pending:
+                check_deadline()
+                expanded_slides[position] = await self._expand_single_slide(
+                    slide,
+                    include_speaker_notes,
+                    expansions
+                )
+        
+        with stage("expand_slides", slides=len(todo)):
+            timeout = soft_deadline.remaining() if soft_deadline is not None else None
+            # Past the soft deadline already: every slide falls back
+            if todo and timeout != 0:
+                workers = [asyncio.ensure_future(worker()) for _ in range(min(self.concurrency, len(todo)))]
+                try:
+                    done, _ = await asyncio.wait(
+                        workers,
+                        timeout=timeout,
+                        return_when=asyncio.FIRST_EXCEPTION
+                    )
+                    for task in done:
+                        task.result()
+                finally:
+                    # One worker failing (e.g. past the deadline) or the soft
+                    # deadline passing stops the others
+                    for task in workers:
+                        task.cancel()
+        
+        for position, slide in enumerate(slides):
+            if expanded_slides[position] is None:
+                expanded_slides[position] = self._degraded_slide(slide, include_speaker_notes)
         
         return expanded_slides
     
+    def _degraded_slide(self, slide: SlideRecord, include_speaker_notes: bool) -> SlideRecord:
+        """Fallback for a slide cut off by the soft deadline: outline content, no image."""
+        _FALLBACK_SLA.inc()
+        degraded = self._mock_expand_slide(slide, include_speaker_notes)
+        degraded.image_prompt = None
+        degraded.degraded = ["content"]
+        return degraded
+    
     async def _expand_single_slide(
         self,
-        slide: SlideData,
-        include_speaker_notes: bool
-    ) -> SlideData:
+        slide: SlideRecord,
+        include_speaker_notes: bool,
+        expansions: Optional[Dict[str, SlideRecord]] = None
+    ) -> SlideRecord:
         """
         Expand content for a single slide.
         
         Args:
             slide: Slide to expand
             include_speaker_notes: Whether to generate speaker notes
+            expansions: Where to record the expansion if it is complete
             
         Returns:
             Slide with expanded content
         """
+        budget = current_budget()
+        index = budget.begin_slide(slide.title) if budget is not None else None
+        
         if self.use_mock:
+            _FALLBACK_NO_API_KEY.inc()
             return self._mock_expand_slide(slide, include_speaker_notes)
         
-        try:
-            # Generate expanded bullets
-            bullets = await self._generate_bullets(slide.title, slide.bullets)
-            
-            # Generate speaker notes if requested
-            speaker_notes = None
-            if include_speaker_notes:
-                speaker_notes = await self._generate_speaker_notes(
-                    slide.title,
-                    bullets
+        # A near-duplicate's expansion costs nothing, so it is used even past the budget
+        namespace = self.cache_namespace(include_speaker_notes)
+        if self.semantic_cache is not None:
+            cached = self.semantic_cache.lookup(namespace, slide.title, slide.bullets)
+            if cached is not None:
+                bullets, speaker_notes, image_prompt = cached
+                expanded = SlideRecord(
+                    title=slide.title,
+                    bullets=list(bullets),
+                    speaker_notes=speaker_notes,
+                    image_prompt=image_prompt
                 )
+                if expansions is not None:
+                    expansions[self.slide_key(slide, include_speaker_notes)] = expanded
+                return expanded
+        
+        if not self._allows(budget, "bullets", index):
+            # Budget spent: keep the outline's content and skip the image
+            _FALLBACK_BUDGET.inc()
+            expanded = self._mock_expand_slide(slide, include_speaker_notes)
+            expanded.image_prompt = None
+            return expanded
+        
+        try:
+            with span("expand_slide", title=slide.title):
+                # Generate expanded bullets
+                bullets = await self._generate_bullets(slide.title, slide.bullets, index)
+                
+                # Generate speaker notes if requested and affordable
+                speaker_notes = None
+                if include_speaker_notes and self._allows(budget, "speaker_notes", index):
+                    speaker_notes = await self._generate_speaker_notes(
+                        slide.title,
+                        bullets,
+                        index
+                    )
+                
+                # Generate image prompt (no prompt means no image)
+                image_prompt = None
+                if self._allows(budget, "image_prompt", index):
+                    image_prompt = await self._generate_image_prompt(slide.title, bullets, index)
             
-            # Generate image prompt
-            image_prompt = await self._generate_image_prompt(slide.title, bullets)
-            
-            return SlideData(
+            expanded = SlideRecord(
                 title=slide.title,
                 bullets=bullets,
                 speaker_notes=speaker_notes,
                 image_prompt=image_prompt
             )
             
+            # Only complete expansions are cached, not ones trimmed by the budget
+            complete = image_prompt is not None and (speaker_notes is not None or not include_speaker_notes)
+            if self.semantic_cache is not None and complete:
+                self.semantic_cache.insert(
+                    namespace,
+                    slide.title,
+                    slide.bullets,
+                    (tuple(bullets), speaker_notes, image_prompt)
+                )
+            if expansions is not None and complete:
+                expansions[self.slide_key(slide, include_speaker_notes)] = expanded
+            
+            return expanded
+            
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            print(f"Error expanding slide '{slide.title}': {e}")
+            logger.warning("Error expanding slide '%s': %s", slide.title, e)
+            _FALLBACK_ERROR.inc()
             return self._mock_expand_slide(slide, include_speaker_notes)
     
+    def cache_namespace(self, include_speaker_notes: bool) -> str:
+        """
+        Everything besides the slide that shapes an expansion: prompts, models
+        and options, plus the current request's tenant, so tenants never
+        receive expansions made from each other's content.
+        """
+        models = ",".join(self.router.primary(task) for task in ("bullets", "speaker_notes", "image_prompt"))
+        return f"{_PROMPT_VERSION}|{models}|{include_speaker_notes}|{current_tenant() or ''}"
+    
+    def slide_key(self, slide: SlideRecord, include_speaker_notes: bool) -> str:
+        """
+        Content hash of an outline slide and everything else its expansion depends on.
+        
+        Slides are expanded independently of each other, so a slide keeps its
+        key when others are inserted, removed or reordered around it.
+        """
+        content = json.dumps([self.cache_namespace(include_speaker_notes), slide.title, slide.bullets])
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()[:32]
+    
+    @staticmethod
+    def _allows(budget: Optional[RequestBudget], task: str, index: Optional[int]) -> bool:
+        """Whether the request budget (if any) leaves room for a stage."""
+        return budget is None or budget.allows(task, index)
+    
     async def _generate_bullets(
         self,
         title: str,
-        existing_bullets: List[str]
+        existing_bullets: List[str],
+        index: Optional[int] = None
     ) -> List[str]:
         """Generate or expand bullet points for a slide."""
         if not self.client:
@@ -115,14 +287,16 @@ Requirements:
 
 Return only the bullet points, one per line, without bullet markers."""
 
-        response = await self.client.chat.completions.create(
-            model=self.model,
+        response = await self.router.completion(
+            self.client,
+            "bullets",
+            slide=index,
             messages=[
                 {"role": "system", "content": "You are an expert presentation designer."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
-            max_tokens=300
+            max_tokens=self.max_tokens["bullets"]
         )
         
         content = response.choices[0].message.content.strip()
@@ -133,7 +307,8 @@ Return only the bullet points, one per line, without bullet markers."""
     async def _generate_speaker_notes(
         self,
         title: str,
-        bullets: List[str]
+        bullets: List[str],
+        index: Optional[int] = None
     ) -> str:
         """Generate speaker notes for a slide."""
         if not self.client:
@@ -153,19 +328,26 @@ Requirements:
 
 Return only the speaker notes text."""
 
-        response = await self.client.chat.completions.create(
-            model=self.model,
+        response = await self.router.completion(
+            self.client,
+            "speaker_notes",
+            slide=index,
             messages=[
                 {"role": "system", "content": "You are an expert presentation coach."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
-            max_tokens=200
+            max_tokens=self.max_tokens["speaker_notes"]
         )
         
         return response.choices[0].message.content.strip()
     
-    async def _generate_image_prompt(self, title: str, bullets: List[str]) -> str:
+    async def _generate_image_prompt(
+        self,
+        title: str,
+        bullets: List[str],
+        index: Optional[int] = None
+    ) -> str:
         """Generate a prompt for image generation."""
         if not self.client:
             return f"Professional icon or illustration representing {title}"
@@ -182,23 +364,25 @@ Requirements:
 
 Return only the image prompt."""
 
-        response = await self.client.chat.completions.create(
-            model=self.model,
+        response = await self.router.completion(
+            self.client,
+            "image_prompt",
+            slide=index,
             messages=[
                 {"role": "system", "content": "You are an expert visual designer."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
-            max_tokens=100
+            max_tokens=self.max_tokens["image_prompt"]
         )
         
         return response.choices[0].message.content.strip()
     
     def _mock_expand_slide(
         self,
-        slide: SlideData,
+        slide: SlideRecord,
         include_speaker_notes: bool
-    ) -> SlideData:
+    ) -> SlideRecord:
         """Create mock expanded content when API is unavailable."""
         bullets = slide.bullets if slide.bullets else [
             f"Key insight about {slide.title}",
@@ -210,7 +394,7 @@ Return only the image prompt."""
         if include_speaker_notes:
             speaker_notes = f"When presenting this slide, emphasize the key concepts of {slide.title} and how they relate to the overall topic."
         
-        return SlideData(
+        return SlideRecord(
             title=slide.title,
             bullets=bullets,
             speaker_notes=speaker_notes,
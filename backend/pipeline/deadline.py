@@ -0,0 +1,110 @@
+"""
+Deadline Module
+Request deadlines, propagated to pipeline stages through the request context.
+"""
+
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+
+_current_deadline: ContextVar[Optional["Deadline"]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs past its deadline."""
+    pass
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client went away before its response was ready."""
+    pass
+
+
+class Deadline:
+    """
+    A point in time after which a request's result is no longer wanted.
+    
+    Unlike a time budget, which trims optional stages, a deadline stops the
+    work: stages check it between units of work, outbound calls are given
+    the remaining time as their timeout, and the request is cancelled when
+    it passes.
+    """
+    
+    def __init__(self, seconds: Optional[float] = None):
+        """
+        Start a deadline.
+        
+        Args:
+            seconds: Time from now until the deadline (None for no deadline)
+        """
+        self.expires_at = math.inf if seconds is None else time.monotonic() + seconds
+    
+    @property
+    def bounded(self) -> bool:
+        return self.expires_at != math.inf
+    
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+    
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None without a deadline."""
+        if not self.bounded:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+    
+    def extend(self, other: "Deadline"):
+        """Move the deadline out to `other`'s if that is later, e.g. for shared work."""
+        self.expires_at = max(self.expires_at, other.expires_at)
+
+
+@contextmanager
+def deadline_context(deadline: Deadline):
+    """Make `deadline` the active deadline for the current request."""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """The deadline of the request being served, if any."""
+    return _current_deadline.get()
+
+
+def deadline_expired() -> bool:
+    """Whether the current request is past its deadline."""
+    deadline = _current_deadline.get()
+    return deadline is not None and deadline.expired
+
+
+def check_deadline():
+    """
+    Stop work for a request that is past its deadline.
+    
+    Raises:
+        DeadlineExceeded: If the current request's deadline has passed
+    """
+    if deadline_expired():
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+def timeout_for(default: Optional[float] = None) -> Optional[float]:
+    """
+    Timeout for an outbound call: the default, capped by the time left.
+    
+    Raises:
+        DeadlineExceeded: If the current request's deadline has passed
+    """
+    check_deadline()
+    deadline = _current_deadline.get()
+    remaining = deadline.remaining() if deadline is not None else None
+    if remaining is None:
+        return default
+    if default is None:
+        return remaining
+    return min(default, remaining)
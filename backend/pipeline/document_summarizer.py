@@ -0,0 +1,350 @@
+"""
+Document Summarizer Module
+Turns long prose documents into slide outlines with map-reduce summarization.
+"""
+
+import os
+import re
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from models import SlideRecord
+from telemetry import CACHE_HITS, CACHE_MISSES, MOCK_FALLBACKS, queued, stage
+from pipeline.clients import openai_client
+from pipeline.deadline import DeadlineExceeded
+from pipeline.model_router import model_router
+
+logger = logging.getLogger(__name__)
+
+
+# A section summary: (title, bullets). Tuples keep cached results immutable.
+Section = Tuple[str, Tuple[str, ...]]
+
+# Bumped whenever the map prompt changes, so stale cache entries are not reused
+_PROMPT_VERSION = "1"
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+class DocumentSummarizer:
+    """
+    Builds a slide outline from a long document.
+    
+    Map: the document is split into token-bounded chunks on line boundaries
+    and each chunk is summarized into a few sections, concurrently.
+    Reduce: chunk sections are merged (hierarchically when they do not fit
+    in one request) into an outline capped at a target slide count.
+    
+    Chunk summaries are cached by content hash, so re-running an edited
+    document only re-summarizes the chunks that changed.
+    """
+    
+    def __init__(self):
+        """Initialize the summarizer with OpenAI client and limits."""
+        self.client = openai_client()
+        self.router = model_router()
+        self.use_mock = self.client is None  # Use mock mode if no API key (or cassette)
+        self.chunk_tokens = int(os.getenv("SUMMARY_CHUNK_TOKENS", "1500"))
+        self.concurrency = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+        self.target_slides = int(os.getenv("DOCUMENT_TARGET_SLIDES", "10"))
+        self.cache_size = int(os.getenv("SUMMARY_CACHE_SIZE", "1024"))
+        self._cache: "OrderedDict[str, List[Section]]" = OrderedDict()
+    
+    async def summarize(
+        self,
+        lines: List[str],
+        target_slides: Optional[int] = None
+    ) -> List[SlideRecord]:
+        """
+        Summarize document lines into a slide outline.
+        
+        Args:
+            lines: Non-empty document lines (paragraphs or wrapped prose)
+            target_slides: Maximum number of slides to produce
+        
+        Returns:
+            List of SlideRecord objects, the first one being the title slide
+        """
+        target = max(2, target_slides or self.target_slides)
+        
+        with stage("summarize", lines=len(lines), target_slides=target) as current:
+            chunks = self._chunk(lines)
+            current.set_attribute("chunks", len(chunks))
+            semaphore = asyncio.Semaphore(self.concurrency)
+            chunk_sections = await asyncio.gather(*(
+                self._summarize_chunk_cached(chunk, semaphore) for chunk in chunks
+            ))
+            sections = [section for result in chunk_sections for section in result]
+            
+            # One slot is taken by the title slide
+            sections = await self._reduce(sections, target - 1, semaphore)
+        
+        title_slide = SlideRecord(
+            title=self._document_title(lines),
+            bullets=[title for title, _ in sections[:3]]
+        )
+        return [title_slide] + [
+            SlideRecord(title=title, bullets=list(bullets))
+            for title, bullets in sections
+        ]
+    
+    def _chunk(self, lines: List[str]) -> List[str]:
+        """
+        Pack lines into chunks of at most chunk_tokens estimated tokens.
+        
+        Boundaries fall on line boundaries, so an edit only changes the
+        chunks it touches unless it moves a boundary. Lines longer than a
+        chunk are split on sentence boundaries.
+        """
+        chunks = []
+        current: List[str] = []
+        current_tokens = 0
+        
+        for line in lines:
+            pieces = [line]
+            if self._estimate_tokens(line) > self.chunk_tokens:
+                pieces = _SENTENCE_RE.split(line)
+            
+            for piece in pieces:
+                tokens = self._estimate_tokens(piece)
+                if current and current_tokens + tokens > self.chunk_tokens:
+                    chunks.append("\n".join(current))
+                    current, current_tokens = [], 0
+                current.append(piece)
+                current_tokens += tokens
+        
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
+    
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Rough token estimate (about four characters per token)."""
+        return len(text) // 4 + 1
+    
+    async def _summarize_chunk_cached(
+        self,
+        chunk: str,
+        semaphore: asyncio.Semaphore
+    ) -> List[Section]:
+        """Summarize a chunk, reusing a cached result for unchanged text."""
+        key = hashlib.sha256(
+            f"{_PROMPT_VERSION}\0{self.router.primary('summary')}\0{self.use_mock}\0{chunk}".encode("utf-8")
+        ).hexdigest()
+        
+        if key in self._cache:
+            CACHE_HITS.labels(cache="summary").inc()
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        CACHE_MISSES.labels(cache="summary").inc()
+        
+        async with queued(semaphore, "summarizer"):
+            sections = await self._summarize_chunk(chunk)
+        
+        self._cache[key] = sections
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return sections
+    
+    async def _summarize_chunk(self, chunk: str) -> List[Section]:
+        """Summarize one chunk into 1-3 sections."""
+        if self.use_mock:
+            MOCK_FALLBACKS.labels(component="document_summarizer", reason="no_api_key").inc()
+            return self._mock_summarize_chunk(chunk)
+        
+        try:
+            prompt = f"""Summarize the following part of a document as 1-3 presentation slide sections.
+
+{chunk}
+
+Requirements:
+- Each section starts with its slide title on its own line
+- Follow each title with 2-4 concise bullet points, each starting with "- "
+- Keep only the most important facts and takeaways
+
+Return only the sections."""
+            
+            response = await self.router.completion(
+                self.client,
+                "summary",
+                messages=[
+                    {"role": "system", "content": "You are an expert at distilling documents into presentations."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3,
+                max_tokens=400
+            )
+            
+            sections = self._parse_sections(response.choices[0].message.content)
+            return sections or self._mock_summarize_chunk(chunk)
+            
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.warning("Error summarizing document chunk: %s", e)
+            MOCK_FALLBACKS.labels(component="document_summarizer", reason="error").inc()
+            return self._mock_summarize_chunk(chunk)
+    
+    async def _reduce(
+        self,
+        sections: List[Section],
+        target: int,
+        semaphore: asyncio.Semaphore
+    ) -> List[Section]:
+        """
+        Reduce sections to at most `target`.
+        
+        When the sections do not fit in one request they are reduced in
+        batches first, each batch keeping its share of the target.
+        """
+        if len(sections) <= target:
+            return sections
+        
+        total_tokens = sum(self._estimate_tokens(self._format_section(s)) for s in sections)
+        if total_tokens > self.chunk_tokens and len(sections) > 2 * target:
+            batches = self._batch_sections(sections)
+            per_batch = max(1, -(-2 * target // len(batches)))
+            
+            async def reduce_batch(batch: List[Section]) -> List[Section]:
+                async with queued(semaphore, "summarizer"):
+                    return await self._reduce_once(batch, per_batch)
+            
+            reduced = await asyncio.gather(*(reduce_batch(b) for b in batches))
+            sections = [section for batch in reduced for section in batch]
+            # Guard against a reduction that made no progress
+            if len(sections) >= sum(len(b) for b in batches):
+                return self._merge_sections(sections, target)
+            return await self._reduce(sections, target, semaphore)
+        
+        async with queued(semaphore, "summarizer"):
+            return await self._reduce_once(sections, target)
+    
+    def _batch_sections(self, sections: List[Section]) -> List[List[Section]]:
+        """Group consecutive sections into batches of at most chunk_tokens."""
+        batches: List[List[Section]] = [[]]
+        tokens = 0
+        for section in sections:
+            section_tokens = self._estimate_tokens(self._format_section(section))
+            if batches[-1] and tokens + section_tokens > self.chunk_tokens:
+                batches.append([])
+                tokens = 0
+            batches[-1].append(section)
+            tokens += section_tokens
+        return batches
+    
+    async def _reduce_once(self, sections: List[Section], target: int) -> List[Section]:
+        """Merge sections into at most `target` sections with a single request."""
+        if len(sections) <= target:
+            return sections
+        if self.use_mock:
+            return self._merge_sections(sections, target)
+        
+        try:
+            outline = "\n\n".join(self._format_section(s) for s in sections)
+            prompt = f"""Merge these slide sections, taken in order from one document, into at most {target} slide sections.
+
+{outline}
+
+Requirements:
+- Keep the document's order and combine related sections
+- Each section starts with its slide title on its own line
+- Follow each title with 2-5 concise bullet points, each starting with "- "
+
+Return only the sections."""
+            
+            response = await self.router.completion(
+                self.client,
+                "summary_reduce",
+                messages=[
+                    {"role": "system", "content": "You are an expert presentation designer."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3,
+                max_tokens=120 * target
+            )
+            
+            merged = self._parse_sections(response.choices[0].message.content)
+            if merged:
+                return merged[:target]
+            return self._merge_sections(sections, target)
+            
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.warning("Error reducing document outline: %s", e)
+            MOCK_FALLBACKS.labels(component="document_summarizer", reason="error").inc()
+            return self._merge_sections(sections, target)
+    
+    def _merge_sections(self, sections: List[Section], target: int) -> List[Section]:
+        """Merge consecutive sections into `target` evenly sized groups."""
+        if len(sections) <= target:
+            return sections
+        
+        merged = []
+        for group_index in range(target):
+            start = group_index * len(sections) // target
+            end = (group_index + 1) * len(sections) // target
+            group = sections[start:end]
+            bullets = tuple(
+                bullets[0] if bullets else title
+                for title, bullets in group
+            )[:5]
+            merged.append((group[0][0], bullets))
+        return merged
+    
+    def _mock_summarize_chunk(self, chunk: str) -> List[Section]:
+        """Extractive summary used when the API is unavailable."""
+        sentences = [s.strip() for s in _SENTENCE_RE.split(chunk.replace("\n", " ")) if s.strip()]
+        if not sentences:
+            return []
+        
+        title = self._shorten(sentences[0], 8)
+        bullets = tuple(self._shorten(s, 15) for s in sentences[1:4]) or (self._shorten(sentences[0], 15),)
+        return [(title, bullets)]
+    
+    @staticmethod
+    def _parse_sections(content: str) -> List[Section]:
+        """Parse "Title / - bullet" formatted LLM output into sections."""
+        sections = []
+        title = None
+        bullets: List[str] = []
+        
+        for line in content.split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+            if line[0] in "-*•":
+                if title is not None:
+                    bullets.append(line.lstrip("-*• ").strip())
+                continue
+            if title is not None:
+                sections.append((title, tuple(bullets)))
+            title = line.strip("#* ").rstrip(":")
+            bullets = []
+        
+        if title is not None:
+            sections.append((title, tuple(bullets)))
+        return sections
+    
+    @staticmethod
+    def _format_section(section: Section) -> str:
+        """Format a section the way the prompts ask for it."""
+        title, bullets = section
+        return "\n".join([title] + [f"- {b}" for b in bullets])
+    
+    def _document_title(self, lines: List[str]) -> str:
+        """Use a short first line as the deck title."""
+        first = lines[0].strip() if lines else ""
+        if first and len(first) <= 80:
+            return first
+        return self._shorten(first, 8) if first else "Document Summary"
+    
+    @staticmethod
+    def _shorten(text: str, max_words: int) -> str:
+        """Trim text to at most max_words words."""
+        words = text.split()
+        if len(words) <= max_words:
+            return text.rstrip(".")
+        return " ".join(words[:max_words]) + "…"
@@ -4,51 +4,205 @@ Generates images or icons for slides using AI or placeholder graphics.
 """
 
 import os
+import uuid
+import asyncio
 import hashlib
-from typing import List, Optional
-from openai import AsyncOpenAI
-import httpx
-from models import SlideData
+import logging
+from typing import Dict, List, Optional, Set
+from PIL import Image, ImageDraw, ImageFont
+from PIL.PngImagePlugin import PngInfo
+from models import SlideRecord
+from telemetry import CACHE_HITS, CACHE_MISSES, IMAGE_BYTES, MOCK_FALLBACKS, llm_call, stage
+from pipeline.clients import http_client, openai_client
+from pipeline.deadline import Deadline, DeadlineExceeded, check_deadline, timeout_for
+from pipeline.image_library import library_from_env
+from pipeline.scheduler import scheduled
+
+logger = logging.getLogger(__name__)
+
+_FALLBACK_SLA = MOCK_FALLBACKS.labels(component="image_generator", reason="sla")
+_LIBRARY_HITS = CACHE_HITS.labels(cache="image_library")
+_LIBRARY_MISSES = CACHE_MISSES.labels(cache="image_library")
+_CACHE_HITS = CACHE_HITS.labels(cache="image")
+_CACHE_MISSES = CACHE_MISSES.labels(cache="image")
+
+# Tile colours for draft art, picked by title
+_DRAFT_COLORS = ((74, 144, 226), (31, 56, 100), (0, 150, 136), (255, 87, 51), (103, 58, 183), (96, 125, 139))
 
 
 class ImageGenerator:
     """
     Generates images for slides using OpenAI DALL-E or placeholder images.
     Falls back to placeholder mode if API key is not available.
+    
+    With a local image library (IMAGE_LIBRARY_DIR), slides take the best
+    matching library image first, and only slides without a match are
+    generated.
     """
     
     def __init__(self):
         """Initialize the image generator."""
-        api_key = os.getenv("OPENAI_API_KEY")
-        self.client = AsyncOpenAI(api_key=api_key) if api_key else None
+        self.client = openai_client()
         self.use_dalle = os.getenv("USE_DALLE", "false").lower() == "true"
+        # Created when the first image is downloaded, not at startup
         self.image_dir = os.path.join(os.path.dirname(__file__), "..", "output", "images")
-        os.makedirs(self.image_dir, exist_ok=True)
+        # Edge of the square placeholder art drawn for draft decks
+        self.draft_size = int(os.getenv("DRAFT_IMAGE_SIZE", "512"))
+        # Generated images are kept by prompt, so repeated prompts (and cache warm-up) skip DALL-E
+        self.image_cache = os.getenv("IMAGE_CACHE_ENABLED", "true").lower() == "true"
+        # Local licensed images/icons, indexed once at start-up (None without IMAGE_LIBRARY_DIR)
+        self.library = library_from_env()
     
-    async def generate_images(self, slides: List[SlideData]) -> List[SlideData]:
+    async def generate_images(
+        self,
+        slides: List[SlideRecord],
+        soft_deadline: Optional[Deadline] = None,
+        used_images: Optional[Set[str]] = None,
+        images: Optional[Dict[str, str]] = None
+    ) -> List[SlideRecord]:
         """
         Generate images for all slides.
         
         Args:
             slides: List of slides with image prompts
-            
+            soft_deadline: SLA mode: slides not imaged by then get a placeholder
+                and are marked as degraded
+            used_images: Library images the deck already uses, to avoid repeats
+                across calls; updated with the new ones (default: these slides only)
+            images: Generated image files by image prompt, e.g. checkpointed by an
+                earlier attempt: prompts found here are not generated again.
+                Updated with the images generated now.
+        
         Returns:
             List of slides with image_path populated
         """
         slides_with_images = []
+        used = used_images if used_images is not None else set()
         
-        for slide in slides:
-            if slide.image_prompt:
-                image_path = await self._generate_single_image(
-                    slide.image_prompt,
-                    slide.title
-                )
-                slide.image_path = image_path
-            
-            slides_with_images.append(slide)
+        with stage("generate_images", slides=len(slides)):
+            for slide in slides:
+                check_deadline()
+                if slide.image_prompt:
+                    library_image = self._library_image(slide.image_prompt, used)
+                    generated = None
+                    if library_image is None and images is not None:
+                        generated = images.get(slide.image_prompt)
+                    if library_image is not None:
+                        slide.image_path = library_image
+                    elif generated is not None and os.path.exists(generated):
+                        slide.image_path = generated
+                    else:
+                        if soft_deadline is None:
+                            slide.image_path = await self._generate_single_image(
+                                slide.image_prompt,
+                                slide.title
+                            )
+                        else:
+                            slide.image_path = await self._generate_before(soft_deadline, slide)
+                        # Placeholder URLs are free to make again
+                        if images is not None and slide.image_path and os.path.exists(slide.image_path):
+                            images[slide.image_prompt] = slide.image_path
+                
+                slides_with_images.append(slide)
         
         return slides_with_images
     
+    async def draft_images(self, slides: List[SlideRecord]) -> List[int]:
+        """
+        Give every content slide with an image prompt a local image, at once.
+        
+        Used by progressive generation: slides get their library image if
+        one matches, and placeholder art otherwise. The draft deck is built
+        with these, and the art is swapped for generated images later.
+        
+        Args:
+            slides: List of slides with image prompts
+        
+        Returns:
+            Positions of the slides that got placeholder art
+        """
+        positions = []
+        used = set()
+        for position, slide in enumerate(slides):
+            # The title slide (position 0) has no picture
+            if position and slide.image_prompt:
+                slide.image_path = self._library_image(slide.image_prompt, used)
+                if slide.image_path is None:
+                    positions.append(position)
+        
+        def draw():
+            for position in positions:
+                slides[position].image_path = self.placeholder_art(slides[position].title, position)
+        
+        with stage("draft_images", slides=len(positions)):
+            await asyncio.to_thread(draw)
+        return positions
+    
+    def placeholder_art(self, title: str, position: int) -> str:
+        """
+        Draw placeholder art for a slide: a flat tile with the title's initials.
+        
+        The slide position is stored in the PNG, so each slide of a deck gets
+        a picture part of its own that can be replaced independently.
+        
+        Args:
+            title: Slide title
+            position: Position of the slide in the deck
+        
+        Returns:
+            Path to the PNG file
+        """
+        digest = hashlib.md5(title.encode()).hexdigest()
+        filepath = os.path.join(self.image_dir, f"draft_{digest[:8]}_{position}.png")
+        if os.path.exists(filepath):
+            return filepath
+        
+        size = self.draft_size
+        image = Image.new("RGB", (size, size), _DRAFT_COLORS[int(digest, 16) % len(_DRAFT_COLORS)])
+        initials = "".join(word[0] for word in title.split()[:2] if word[0].isalnum()).upper() or "?"
+        ImageDraw.Draw(image).text(
+            (size / 2, size / 2),
+            initials,
+            fill=(255, 255, 255),
+            font=ImageFont.load_default(size=size // 3),
+            anchor="mm"
+        )
+        info = PngInfo()
+        info.add_text("slide", str(position))
+        
+        # Written under a temporary name so a concurrent reader never sees half a file
+        os.makedirs(self.image_dir, exist_ok=True)
+        partial = f"{filepath}.{uuid.uuid4().hex[:8]}.tmp"
+        image.save(partial, "PNG", pnginfo=info)
+        os.replace(partial, filepath)
+        return filepath
+    
+    def _library_image(self, prompt: str, used: Set[str]) -> Optional[str]:
+        """Best library image for a prompt that the deck does not use yet, if any."""
+        if self.library is None:
+            return None
+        path = self.library.match(prompt, exclude=used)
+        if path is None:
+            _LIBRARY_MISSES.inc()
+            return None
+        _LIBRARY_HITS.inc()
+        used.add(path)
+        return path
+    
+    async def _generate_before(self, soft_deadline: Deadline, slide: SlideRecord) -> Optional[str]:
+        """Generate a slide's image, or a placeholder if the soft deadline comes first."""
+        if not soft_deadline.expired:
+            try:
+                return await asyncio.wait_for(
+                    self._generate_single_image(slide.image_prompt, slide.title),
+                    soft_deadline.remaining()
+                )
+            except asyncio.TimeoutError:
+                pass
+        _FALLBACK_SLA.inc()
+        slide.degraded.append("image")
+        return await self._generate_placeholder_image(slide.title)
+    
     async def _generate_single_image(
         self,
         prompt: str,
@@ -60,13 +214,15 @@ class ImageGenerator:
         Args:
             prompt: Image generation prompt
             title: Slide title (for filename)
-            
+        
         Returns:
             Path to generated image or None
         """
         if self.use_dalle and self.client:
             return await self._generate_dalle_image(prompt, title)
         else:
+            if self.use_dalle:
+                MOCK_FALLBACKS.labels(component="image_generator", reason="no_api_key").inc()
             return await self._generate_placeholder_image(title)
     
     async def _generate_dalle_image(
@@ -79,31 +235,52 @@ class ImageGenerator:
             # Enhance prompt for better results
             enhanced_prompt = f"Simple, professional, minimalist icon or illustration: {prompt}. Clean design, no text, suitable for presentation slide."
             
-            response = await self.client.images.generate(
-                model="dall-e-3",
-                prompt=enhanced_prompt,
-                size="1024x1024",
-                quality="standard",
-                n=1
-            )
+            cached_path = self._cached_image_path(enhanced_prompt)
+            if cached_path is not None:
+                if os.path.exists(cached_path):
+                    _CACHE_HITS.inc()
+                    return cached_path
+                _CACHE_MISSES.inc()
+            
+            async with scheduled():
+                options = {}
+                timeout = timeout_for()
+                if timeout is not None:
+                    options["timeout"] = timeout
+                with llm_call("image", "dall-e-3"):
+                    response = await self.client.images.generate(
+                        model="dall-e-3",
+                        prompt=enhanced_prompt,
+                        size="1024x1024",
+                        quality="standard",
+                        n=1,
+                        **options
+                    )
             
             image_url = response.data[0].url
             
             # Download the image
-            filename = self._generate_filename(title)
-            filepath = os.path.join(self.image_dir, filename)
+            filepath = cached_path or os.path.join(self.image_dir, self._generate_filename(title))
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
             
-            async with httpx.AsyncClient() as client:
-                img_response = await client.get(image_url)
-                img_response.raise_for_status()
-                
-                with open(filepath, 'wb') as f:
-                    f.write(img_response.content)
+            async with scheduled():
+                img_response = await http_client().get(image_url, timeout=timeout_for(60.0))
+            img_response.raise_for_status()
+            
+            # Written aside and moved into place: a cached image is never seen half-written
+            partial = f"{filepath}.{uuid.uuid4().hex}.partial"
+            with open(partial, 'wb') as f:
+                f.write(img_response.content)
+            os.replace(partial, filepath)
+            IMAGE_BYTES.labels(source="dalle").inc(len(img_response.content))
             
             return filepath
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            print(f"Error generating DALL-E image for '{title}': {e}")
+            logger.warning("Error generating DALL-E image for '%s': %s", title, e)
+            MOCK_FALLBACKS.labels(component="image_generator", reason="error").inc()
             return await self._generate_placeholder_image(title)
     
     async def _generate_placeholder_image(self, title: str) -> Optional[str]:
@@ -112,7 +289,7 @@ class ImageGenerator:
         
         Args:
             title: Slide title
-            
+        
         Returns:
             Path/URL to placeholder image
         """
@@ -130,6 +307,13 @@ class ImageGenerator:
         # For now, return the URL which can be used by the slide builder
         return placeholder_url
     
+    def _cached_image_path(self, prompt: str) -> Optional[str]:
+        """Where the image generated for a prompt is cached (None with the cache off)."""
+        if not self.image_cache:
+            return None
+        key = hashlib.sha256(f"dall-e-3|1024x1024|standard|{prompt}".encode()).hexdigest()[:32]
+        return os.path.join(self.image_dir, "cache", f"{key}.png")
+    
     def _generate_filename(self, title: str) -> str:
         """Generate a safe filename from slide title."""
         # Remove special characters and limit length
@@ -0,0 +1,240 @@
+"""
+Image Library Module
+Picks slide images from a local directory of licensed images and icons.
+"""
+
+import os
+import re
+import json
+import math
+import time
+import logging
+import argparse
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from pipeline.semantic_cache import HashedNgramEmbedder
+
+logger = logging.getLogger(__name__)
+
+# Formats python-pptx can embed
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp")
+
+INDEX_FILENAME = ".image_index.npz"
+TAGS_FILENAME = "tags.json"
+
+_TERM_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+# Words image prompts use for style rather than subject
+_PROMPT_STOPWORDS = frozenset(
+    "a an and as at background by clean concept depicting design flat for from icon illustration "
+    "image in minimalist modern of on or picture professional representing showing simple slide "
+    "style suitable symbol text the to vector visual with".split()
+)
+
+
+def terms(text: str) -> List[str]:
+    """
+    Split text, file names and paths into lowercase terms.
+    
+    Separators, camelCase and digits split terms ("CloudServer_2" gives
+    cloud, server, 2), and plural "s" endings are dropped so "servers"
+    matches a "server" icon.
+    """
+    result = []
+    for term in _TERM_RE.findall(text):
+        term = term.lower()
+        if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        result.append(term)
+    return result
+
+
+class ImageLibrary:
+    """
+    An index of local images, searched by the terms of an image prompt.
+    
+    Each image is tagged with the terms of its path (folders and file
+    name) plus any tags listed for it in the directory's tags.json. A
+    prompt is matched through an inverted index: images score the IDF of
+    every prompt term among their tags, so specific terms ("firewall")
+    outweigh common ones ("business"). With embeddings, prompts no tag
+    matches fall back to the most similar tag set by cosine similarity.
+    """
+    
+    def __init__(
+        self,
+        directory: str,
+        paths: List[str],
+        tags: List[List[str]],
+        vectors: Optional[np.ndarray] = None,
+        min_similarity: float = 0.3
+    ):
+        """
+        Build the in-memory search structures.
+        
+        Args:
+            directory: Root of the library
+            paths: Image paths relative to the directory
+            tags: Tags of each image
+            vectors: Optional tag embeddings, one row per image
+            min_similarity: Cosine similarity an embedding match needs
+        """
+        self.directory = directory
+        self.paths = paths
+        self.tags = tags
+        self.vectors = vectors
+        self.min_similarity = min_similarity
+        self.embedder = HashedNgramEmbedder(vectors.shape[1]) if vectors is not None else None
+        
+        self._postings: Dict[str, List[int]] = {}
+        for entry, entry_tags in enumerate(tags):
+            for tag in set(entry_tags):
+                self._postings.setdefault(tag, []).append(entry)
+        self._idf = {
+            tag: math.log(1 + len(paths) / len(entries))
+            for tag, entries in self._postings.items()
+        }
+    
+    def __len__(self) -> int:
+        return len(self.paths)
+    
+    @classmethod
+    def scan(cls, directory: str, embeddings: bool = False, dimensions: int = 256) -> "ImageLibrary":
+        """
+        Index a directory from scratch.
+        
+        Args:
+            directory: Root of the library
+            embeddings: Whether to embed the tags for fuzzy matching
+            dimensions: Embedding length
+        """
+        extra_tags: Dict[str, List[str]] = {}
+        tags_path = os.path.join(directory, TAGS_FILENAME)
+        if os.path.exists(tags_path):
+            with open(tags_path, encoding="utf-8") as f:
+                extra_tags = json.load(f)
+        
+        paths, tags = [], []
+        for root, folders, files in os.walk(directory):
+            folders.sort()
+            for filename in sorted(files):
+                if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                relative = os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, "/")
+                entry_tags = terms(os.path.splitext(relative)[0])
+                for tag in extra_tags.get(relative, ()):
+                    entry_tags.extend(terms(tag))
+                paths.append(relative)
+                tags.append(entry_tags)
+        
+        vectors = None
+        if embeddings:
+            embedder = HashedNgramEmbedder(dimensions)
+            vectors = np.zeros((len(paths), dimensions), dtype=np.float32)
+            for entry, entry_tags in enumerate(tags):
+                vectors[entry] = embedder.embed(" ".join(entry_tags))
+        return cls(directory, paths, tags, vectors)
+    
+    @classmethod
+    def load(cls, directory: str, index_path: Optional[str] = None, embeddings: bool = False) -> "ImageLibrary":
+        """
+        Load the precomputed index of a directory, or scan it if there is none.
+        
+        Args:
+            directory: Root of the library
+            index_path: Index file (default: .image_index.npz in the directory)
+            embeddings: Whether embeddings are wanted if the directory has to be scanned
+        """
+        index_path = index_path or os.path.join(directory, INDEX_FILENAME)
+        if not os.path.exists(index_path):
+            logger.info("No image index at %s; scanning %s", index_path, directory)
+            return cls.scan(directory, embeddings=embeddings)
+        
+        with np.load(index_path, allow_pickle=False) as saved:
+            paths = json.loads(str(saved["paths"]))
+            tags = json.loads(str(saved["tags"]))
+            vectors = saved["vectors"] if "vectors" in saved.files else None
+        return cls(directory, paths, tags, vectors)
+    
+    def save(self, index_path: Optional[str] = None) -> str:
+        """Write the index, for loading at start-up, and return its path."""
+        index_path = index_path or os.path.join(self.directory, INDEX_FILENAME)
+        arrays = {"paths": np.array(json.dumps(self.paths)), "tags": np.array(json.dumps(self.tags))}
+        if self.vectors is not None:
+            arrays["vectors"] = self.vectors
+        with open(index_path, "wb") as f:
+            np.savez(f, **arrays)
+        return index_path
+    
+    def match(self, prompt: str, exclude: Iterable[str] = ()) -> Optional[str]:
+        """
+        Find the best image for a prompt.
+        
+        Args:
+            prompt: Image prompt of the slide
+            exclude: Paths already used in the deck, skipped while others match
+        
+        Returns:
+            Absolute path of the image, or None if nothing matches
+        """
+        excluded = exclude if isinstance(exclude, (set, frozenset)) else set(exclude)
+        scores: Dict[int, float] = {}
+        for term in set(terms(prompt)) - _PROMPT_STOPWORDS:
+            weight = self._idf.get(term)
+            if weight is None:
+                continue
+            for entry in self._postings[term]:
+                scores[entry] = scores.get(entry, 0.0) + weight
+        
+        # Highest score first; among equals, the image with the fewest tags is the most specific
+        for entry in sorted(scores, key=lambda entry: (-scores[entry], len(self.tags[entry]), entry)):
+            path = os.path.join(self.directory, self.paths[entry])
+            if path not in excluded:
+                return path
+        
+        if self.vectors is not None and len(self.paths):
+            similarities = self.vectors @ self.embedder.embed(" ".join(terms(prompt)))
+            for entry in np.argsort(-similarities):
+                if similarities[entry] < self.min_similarity:
+                    break
+                path = os.path.join(self.directory, self.paths[entry])
+                if path not in excluded:
+                    return path
+        return None
+
+
+def library_from_env() -> Optional[ImageLibrary]:
+    """
+    Load the library in IMAGE_LIBRARY_DIR (None when unset).
+    
+    IMAGE_LIBRARY_INDEX overrides the index path, and
+    IMAGE_LIBRARY_EMBEDDINGS enables fuzzy matching when scanning.
+    """
+    directory = os.getenv("IMAGE_LIBRARY_DIR", "")
+    if not directory:
+        return None
+    start = time.perf_counter()
+    library = ImageLibrary.load(
+        directory,
+        index_path=os.getenv("IMAGE_LIBRARY_INDEX") or None,
+        embeddings=os.getenv("IMAGE_LIBRARY_EMBEDDINGS", "false").lower() == "true"
+    )
+    logger.info("Image library: %d images from %s in %.3fs", len(library), directory, time.perf_counter() - start)
+    return library
+
+
+def main():
+    """Build the index of an image library directory."""
+    parser = argparse.ArgumentParser(description="Index a directory of slide images and icons")
+    parser.add_argument("directory", help="Library root; tags come from paths and an optional tags.json")
+    parser.add_argument("--index", help=f"Index file to write (default: DIRECTORY/{INDEX_FILENAME})")
+    parser.add_argument("--embeddings", action="store_true", help="Also embed tags for fuzzy matching")
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    library = ImageLibrary.scan(args.directory, embeddings=args.embeddings)
+    path = library.save(args.index)
+    print(f"Indexed {len(library)} images in {time.perf_counter() - start:.2f}s -> {path}")
+
+
+if __name__ == "__main__":
+    main()
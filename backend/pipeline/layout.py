@@ -0,0 +1,39 @@
+"""
+Slide Layout Module
+Geometry of the deck's slides, shared by the PowerPoint builder and the PDF renderer.
+"""
+
+from typing import Dict, Tuple
+
+# A shape's (left, top, width, height), in inches
+Box = Tuple[float, float, float, float]
+
+SLIDE_WIDTH = 10
+SLIDE_HEIGHT = 7.5
+
+# Title slide: the title, and the first bullets joined as a subtitle
+TITLE_SLIDE_TITLE: Box = (1, 2.5, 8, 1.5)
+TITLE_SLIDE_SUBTITLE: Box = (1, 4.5, 8, 0.8)
+SUBTITLE_BULLETS = 3
+SUBTITLE_SIZE = 20
+
+# Content slides
+CONTENT_TITLE: Box = (0.5, 0.5, 9, 0.8)
+BULLET_SPACE_BEFORE = 12  # points
+
+
+def content_boxes(has_image: bool) -> Dict[str, Box]:
+    """
+    Boxes of a content slide's bullets and picture.
+    
+    Args:
+        has_image: Whether the slide has a picture
+    
+    Returns:
+        "bullets", plus "image" for the two-column layout
+    """
+    if has_image:
+        # Two-column layout: content on left, image on right
+        return {"bullets": (0.5, 1.8, 5, 4.5), "image": (6, 2, 3.5, 4.5)}
+    # Full-width layout when no image
+    return {"bullets": (0.8, 1.8, 8.5, 4.5)}
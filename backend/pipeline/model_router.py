@@ -0,0 +1,175 @@
+"""
+Model Router Module
+Per-task model selection with a latency-aware fallback.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+from telemetry import MODEL_LATENCY_P95, MODEL_ROUTES
+from pipeline.budget import budgeted_completion
+from pipeline.deadline import timeout_for
+from pipeline.scheduler import scheduled
+
+
+_router: Optional["ModelRouter"] = None
+_router_lock = threading.Lock()
+
+
+def _parse_mapping(value: str) -> Dict[str, str]:
+    """Parse "task=model,task=model" into a dict, ignoring blank entries."""
+    mapping = {}
+    for entry in value.split(","):
+        task, sep, model = entry.partition("=")
+        if sep and task.strip() and model.strip():
+            mapping[task.strip()] = model.strip()
+    return mapping
+
+
+class LatencyWindow:
+    """Rolling window of the most recent call latencies of one model."""
+    
+    def __init__(self, size: int):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.p95: Optional[float] = None
+    
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        # Nearest-rank p95; windows are small, so sorting on every call is cheap
+        ordered = sorted(self.samples)
+        self.p95 = ordered[max(0, -(-95 * len(ordered) // 100) - 1)]
+
+
+class ModelRouter:
+    """
+    Chooses the model for each LLM task.
+    
+    Every task uses OPENAI_MODEL unless MODEL_ROUTES maps it to another
+    model. A task listed in MODEL_FALLBACKS switches to its fallback model
+    while the rolling p95 latency of its primary model exceeds
+    MODEL_P95_THRESHOLD_SECONDS. Every MODEL_PROBE_INTERVAL-th call still
+    goes to the slow primary, so its latency window keeps updating and the
+    task switches back once the primary recovers. Failed calls are recorded
+    at MODEL_FAILURE_PENALTY_SECONDS or their real latency, whichever is
+    longer, so a primary that keeps failing fast is also diverted from.
+    
+    Tasks without a fallback (bullets, by default) always use their primary
+    model, so routing never trades away their quality.
+    """
+    
+    def __init__(self):
+        """Initialize routes, fallbacks and latency windows from the environment."""
+        self.default_model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+        self.routes = _parse_mapping(os.getenv("MODEL_ROUTES", ""))
+        self.fallbacks = _parse_mapping(os.getenv("MODEL_FALLBACKS", ""))
+        self.p95_threshold = float(os.getenv("MODEL_P95_THRESHOLD_SECONDS", "8"))
+        self.window_size = int(os.getenv("MODEL_LATENCY_WINDOW", "50"))
+        # Fewer samples than this are not enough to call a model slow
+        self.min_samples = int(os.getenv("MODEL_LATENCY_MIN_SAMPLES", "10"))
+        self.probe_interval = int(os.getenv("MODEL_PROBE_INTERVAL", "20"))
+        # Failed calls count as at least this slow, so a model that errors
+        # quickly does not look fast
+        self.failure_penalty = float(
+            os.getenv("MODEL_FAILURE_PENALTY_SECONDS", str(2 * self.p95_threshold))
+        )
+        
+        self._windows: Dict[str, LatencyWindow] = {}
+        self._diverted: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def primary(self, task: str) -> str:
+        """The model configured for a task, ignoring latency."""
+        return self.routes.get(task, self.default_model)
+    
+    def p95(self, model: str) -> Optional[float]:
+        """Rolling p95 latency of a model, or None until it has enough samples."""
+        window = self._windows.get(model)
+        if window is None or len(window.samples) < self.min_samples:
+            return None
+        return window.p95
+    
+    def is_slow(self, model: str) -> bool:
+        """Whether a model's rolling p95 is above the threshold."""
+        p95 = self.p95(model)
+        return p95 is not None and p95 > self.p95_threshold
+    
+    def select(self, task: str) -> str:
+        """
+        Choose the model for one call of a task.
+        
+        Args:
+            task: Task name, e.g. "bullets" or "speaker_notes"
+        
+        Returns:
+            The task's primary model, or its fallback while the primary is slow
+        """
+        primary = self.primary(task)
+        fallback = self.fallbacks.get(task)
+        if fallback is None or fallback == primary or not self.is_slow(primary):
+            with self._lock:
+                self._diverted.pop(task, None)
+            MODEL_ROUTES.labels(task=task, model=primary, route="primary").inc()
+            return primary
+        
+        with self._lock:
+            diverted = self._diverted.get(task, 0) + 1
+            self._diverted[task] = diverted
+        if self.probe_interval > 0 and diverted % self.probe_interval == 0:
+            MODEL_ROUTES.labels(task=task, model=primary, route="probe").inc()
+            return primary
+        MODEL_ROUTES.labels(task=task, model=fallback, route="fallback").inc()
+        return fallback
+    
+    def observe(self, model: str, seconds: float):
+        """Record the latency of one call to a model."""
+        with self._lock:
+            window = self._windows.get(model)
+            if window is None:
+                window = self._windows[model] = LatencyWindow(self.window_size)
+            window.observe(seconds)
+            p95 = window.p95
+        MODEL_LATENCY_P95.labels(model=model).set(p95)
+    
+    async def completion(self, client, task: str, slide: Optional[int] = None, **kwargs):
+        """
+        Create a budgeted chat completion on the model routed for a task,
+        holding a scheduler slot for the call.
+        
+        Args:
+            client: AsyncOpenAI client
+            task: Task label, e.g. "bullets" or "summary"
+            slide: Index of the slide the call belongs to, if any
+            **kwargs: Arguments for client.chat.completions.create, without model
+        
+        Returns:
+            The chat completion response
+        """
+        # Queue for a slot first, so scheduler waits do not count as model latency
+        async with scheduled():
+            # The call may only take the time left before the request's deadline
+            timeout = timeout_for()
+            if timeout is not None:
+                kwargs["timeout"] = timeout
+            model = self.select(task)
+            start = time.perf_counter()
+            try:
+                response = await budgeted_completion(client, task, slide=slide, model=model, **kwargs)
+            except Exception:
+                # Failed and timed-out calls count too, at no less than the
+                # failure penalty: an error returned at once is not a fast call
+                self.observe(model, max(time.perf_counter() - start, self.failure_penalty))
+                raise
+            self.observe(model, time.perf_counter() - start)
+            return response
+
+
+def model_router() -> ModelRouter:
+    """Return the process-wide router, so all components share latency windows."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter()
+    return _router
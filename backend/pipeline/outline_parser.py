@@ -3,9 +3,220 @@ Outline Parser Module
 Converts raw text input into structured slide sections.
 """
 
+import gc
+import os
 import re
-from typing import List
-from models import SlideData, OutlineSection
+import logging
+from contextlib import contextmanager
+from typing import AsyncIterable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from models import SlideRecord, OutlineSection
+from telemetry import stage
+
+logger = logging.getLogger(__name__)
+
+
+# Bullet glyphs at the start of a line
+_BULLET_CHARS = frozenset('*-•+')
+_BULLET_RE = re.compile(r'[\*\-•+]\s*')
+
+# Numbered markers (group 1): "1." "12)" "1.2." "1.2.3)" "(3)"; a number must
+# end in "." or ")", so "3.5 million" is prose. Letter markers (groups 2-4):
+# "a." "B)" "(c)" and roman numerals "iv." "II)" "(ix)"
+_NUMBER_RE = re.compile(
+    r'(?:(\d+(?:\.\d+)*[.)]|\(\d+\))'
+    r'|(\(?)([A-Za-z]|[ivxlc]{2,}|[IVXLC]{2,})([.)]))\s+'
+)
+_ROMAN_CHARS = frozenset('ivxlcIVXLC')
+# Markdown headings: "# Title", "## Section"
+_HEADING_RE = re.compile(r'#{1,6}\s+')
+
+# Numbered markers end within this many characters of the line start
+_MARKER_SCAN = 16
+
+# Lines indented by at most this many columns are top-level sections
+_TOP_LEVEL_INDENT = 2
+
+# Line marker kinds
+_PLAIN, _BULLET, _NUMBERED, _HEADING = 0, 1, 2, 3
+
+
+class _Line(NamedTuple):
+    """A classified outline line."""
+    
+    depth: int
+    marker: int
+    text: str
+
+
+class _Outline:
+    """
+    Single-pass line tokenizer.
+    
+    Each non-empty line is classified once (depth, marker kind and clean
+    text) as it is added, and the statistics used to pick a parse strategy
+    are collected along the way. Lines can be added one at a time, so input
+    can be fed while it is still being received.
+    
+    A single letter followed by "." or ")" starts lists ("a.", "B)") but
+    also initials and abbreviations ("C. elegans"). Such a marker only
+    stands once finish() has seen a sibling: the next or previous letter,
+    or a longer roman numeral ("I." next to "II."), in the same style at
+    the same depth. Otherwise the line is restored as prose.
+    """
+    
+    __slots__ = (
+        'lines', 'marked', 'bulleted', 'bullet_depths', 'chars',
+        '_indents', '_first', '_headed', '_letters', '_pending'
+    )
+    
+    def __init__(self):
+        self.lines: List[_Line] = []
+        self.chars = 0
+        self.marked = 0
+        self.bulleted = 0
+        self.bullet_depths = set()
+        self._indents = [0]
+        self._first = True
+        self._headed = False
+        # Letter markers seen, by (depth, opening parenthesis, closing punctuation, case)
+        self._letters: Dict[tuple, set] = {}
+        # Single-letter markers awaiting a sibling: (line index, style, letter, unstripped text)
+        self._pending: List[tuple] = []
+    
+    def add(self, raw: str):
+        """
+        Classify one raw line.
+        
+        Depth is tracked with a stack of open indentation levels, so any
+        consistent indentation width works. The first line is always treated
+        as top-level, matching input that has been stripped. Markdown
+        headings are top-level sections and push the lines under them down
+        one level.
+        """
+        text = raw.strip()
+        if not text:
+            return
+        
+        # Indentation and depth
+        if self._first:
+            indent = 0
+            self._first = False
+        else:
+            # Everything before the first character of the text is indentation
+            indent = raw.index(text[0])
+            if indent and raw.find('\t', 0, indent) >= 0:
+                indent = len(raw[:indent].expandtabs(4))
+        
+        indents = self._indents
+        if indent <= _TOP_LEVEL_INDENT:
+            if len(indents) > 1:
+                del indents[1:]
+            indents[0] = indent
+            depth = 0
+        else:
+            while len(indents) > 1 and indent < indents[-1]:
+                indents.pop()
+            if indent > indents[-1]:
+                indents.append(indent)
+            depth = len(indents) - 1
+        
+        # Marker; every numbered form ends in "." or ")" near the start,
+        # which rules out most prose lines without running the pattern
+        marker = _PLAIN
+        letter = None
+        first_char = text[0]
+        if first_char in _BULLET_CHARS:
+            marker = _BULLET
+            text = text[_BULLET_RE.match(text).end():]
+        elif first_char == '#':
+            match = _HEADING_RE.match(text)
+            if match:
+                marker = _HEADING
+                text = text[match.end():]
+                self._headed = True
+        elif text.find('.', 0, _MARKER_SCAN) >= 0 or text.find(')', 0, _MARKER_SCAN) >= 0:
+            match = _NUMBER_RE.match(text)
+            if match is not None:
+                number, opening, letter, closing = match.groups()
+                # "(c." is not a marker
+                if number is None and opening and closing != ')':
+                    match = letter = None
+            if match is not None:
+                marker = _NUMBERED
+                unstripped = text
+                text = text[match.end():]
+        
+        if marker == _HEADING:
+            depth = 0
+        elif self._headed:
+            depth += 1
+        
+        if letter is not None:
+            style = (depth, opening, closing, letter.isupper())
+            letters = self._letters.get(style)
+            if letters is None:
+                letters = self._letters[style] = set()
+            letters.add(letter)
+            if len(letter) == 1:
+                self._pending.append((len(self.lines), style, letter, unstripped))
+        
+        if marker:
+            self.marked += 1
+            if marker == _BULLET:
+                self.bulleted += 1
+                self.bullet_depths.add(depth)
+            if not text:
+                return
+        
+        self.chars += len(text)
+        # tuple.__new__ skips the Python-level constructor NamedTuple generates
+        self.lines.append(tuple.__new__(_Line, (depth, marker, text)))
+    
+    def finish(self):
+        """Restore single-letter markers without a sibling as prose."""
+        for index, style, token, unstripped in self._pending:
+            letters = self._letters[style]
+            if (
+                chr(ord(token) + 1) in letters
+                or chr(ord(token) - 1) in letters
+                or (token in _ROMAN_CHARS and any(len(other) > 1 for other in letters))
+            ):
+                continue
+            line = self.lines[index]
+            self.lines[index] = _Line(line.depth, _PLAIN, unstripped)
+            self.marked -= 1
+            self.chars += len(unstripped) - len(line.text)
+        self._pending = []
+
+
+@contextmanager
+def _gc_paused():
+    """
+    Pause the cycle collector while a large outline is turned into objects.
+    
+    Lines, sections and slides form no reference cycles, but allocating
+    hundreds of thousands of them triggers repeated collections that scan
+    the whole growing tree. Only used around synchronous work, never
+    across an await.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class SlideLimitExceeded(ValueError):
+    """Raised when an outline produces more slides than allowed."""
+    
+    def __init__(self, slide_count: int, limit: int):
+        super().__init__(
+            f"Outline produces {slide_count} slides, the limit is {limit}"
+        )
+        self.slide_count = slide_count
+        self.limit = limit
 
 
 class OutlineParser:
@@ -15,148 +226,287 @@ class OutlineParser:
     - Simple topics (generates outline)
     - Bullet lists
     - Nested outlines
+    - Long prose documents (summarized, when a summarizer is configured)
     """
     
-    def __init__(self):
+    def __init__(self, summarizer=None):
+        """
+        Initialize the parser.
+        
+        Args:
+            summarizer: Optional DocumentSummarizer for long prose input
+        """
+        self.summarizer = summarizer
+        # Unmarked prose at least this long is summarized, not split per line
+        self.document_min_chars = int(os.getenv("DOCUMENT_MIN_CHARS", "3000"))
         self.min_slides = 3
-        self.max_slides = 20
+        self.max_slides = int(os.getenv("MAX_SLIDES", "1000"))
+        # Per-tenant overrides, e.g. TENANT_MAX_SLIDES="acme=1000,trial=10"
+        self.tenant_max_slides = self._parse_tenant_limits(
+            os.getenv("TENANT_MAX_SLIDES", "")
+        )
     
-    async def parse(self, input_text: str) -> List[SlideData]:
+    async def parse(
+        self,
+        input_text: str,
+        max_slides: Optional[int] = None,
+        target_slides: Optional[int] = None
+    ) -> List[SlideRecord]:
         """
         Parse input text into a list of slide structures.
         
         Args:
             input_text: Raw input from user
+            max_slides: Slide limit to enforce (defaults to self.max_slides)
+            target_slides: Slide count to aim for when summarizing a document
             
         Returns:
-            List of SlideData objects with titles and initial bullets
+            List of SlideRecord objects with titles and initial bullets
+            
+        Raises:
+            SlideLimitExceeded: If the outline has more slides than allowed
+        """
+        return await self.parse_lines(input_text.split('\n'), max_slides, target_slides)
+    
+    async def parse_lines(
+        self,
+        lines: Iterable[str],
+        max_slides: Optional[int] = None,
+        target_slides: Optional[int] = None
+    ) -> List[SlideRecord]:
+        """
+        Parse an iterable of raw lines into a list of slide structures.
+        
+        Every line is classified exactly once; the input type is then
+        detected from the collected line statistics.
+        
+        Args:
+            lines: Raw input lines (trailing newlines are ignored)
+            max_slides: Slide limit to enforce (defaults to self.max_slides)
+            target_slides: Slide count to aim for when summarizing a document
+            
+        Returns:
+            List of SlideRecord objects with titles and initial bullets
+            
+        Raises:
+            SlideLimitExceeded: If the outline has more slides than allowed
+        """
+        with stage("parse"):
+            with _gc_paused():
+                outline = self._tokenize(lines)
+            return await self._build_slides(outline, max_slides, target_slides)
+    
+    async def parse_stream(
+        self,
+        lines: AsyncIterable[str],
+        max_slides: Optional[int] = None,
+        target_slides: Optional[int] = None
+    ) -> List[SlideRecord]:
         """
-        input_text = input_text.strip()
+        Parse lines as they arrive, e.g. from a streamed upload.
+        
+        Args:
+            lines: Async iterable of raw input lines
+            max_slides: Slide limit to enforce (defaults to self.max_slides)
+            target_slides: Slide count to aim for when summarizing a document
+            
+        Returns:
+            List of SlideRecord objects with titles and initial bullets
+            
+        Raises:
+            SlideLimitExceeded: If the outline has more slides than allowed
+        """
+        with stage("parse"):
+            outline = _Outline()
+            async for raw in lines:
+                outline.add(raw)
+            return await self._build_slides(outline, max_slides, target_slides)
+    
+    async def _build_slides(
+        self,
+        outline: _Outline,
+        max_slides: Optional[int],
+        target_slides: Optional[int]
+    ) -> List[SlideRecord]:
+        """Pick a parse strategy for a tokenized input and enforce the limit."""
+        outline.finish()
+        limit = max_slides if max_slides is not None else self.max_slides
         
         # Detect input type and parse accordingly
-        if self._is_simple_topic(input_text):
-            return await self._parse_simple_topic(input_text)
-        elif self._is_bulleted_list(input_text):
-            return await self._parse_bulleted_list(input_text)
+        if self.summarizer and self._is_long_document(outline):
+            target = min(target_slides or self.summarizer.target_slides, limit)
+            slides = await self.summarizer.summarize(
+                [line.text for line in outline.lines],
+                target_slides=target
+            )
+        elif self._is_simple_topic(outline):
+            topic = '\n'.join(line.text for line in outline.lines)
+            slides = await self._parse_simple_topic(topic)
+        elif self._is_bulleted_list(outline):
+            slides = await self._parse_bulleted_list(outline)
         else:
-            return await self._parse_nested_outline(input_text)
+            slides = await self._parse_nested_outline(outline)
+        
+        if len(slides) > limit:
+            raise SlideLimitExceeded(len(slides), limit)
+        
+        return slides
+    
+    def slide_limit(self, tenant: Optional[str] = None) -> int:
+        """Return the slide limit for a tenant, falling back to the default."""
+        if tenant and tenant in self.tenant_max_slides:
+            return self.tenant_max_slides[tenant]
+        return self.max_slides
     
-    def _is_simple_topic(self, text: str) -> bool:
+    @staticmethod
+    def _parse_tenant_limits(spec: str) -> Dict[str, int]:
+        """
+        Parse a "tenant=limit,tenant=limit" specification.
+        
+        Malformed entries are logged and skipped, so a typo leaves that
+        tenant on the default limit rather than failing start-up.
+        """
+        limits = {}
+        for entry in spec.split(','):
+            if not entry.strip():
+                continue
+            tenant, _, limit = entry.partition('=')
+            tenant, limit = tenant.strip(), limit.strip()
+            if not tenant or not limit.isdigit() or int(limit) < 1:
+                logger.warning("Ignoring malformed TENANT_MAX_SLIDES entry %r", entry.strip())
+                continue
+            limits[tenant] = int(limit)
+        return limits
+    
+    def _tokenize(self, lines: Iterable[str]) -> _Outline:
+        """Classify all lines of an input in a single pass."""
+        outline = _Outline()
+        for raw in lines:
+            outline.add(raw)
+        return outline
+    
+    def _is_long_document(self, outline: _Outline) -> bool:
+        """Check if input is long, mostly unmarked prose (e.g. a pasted report)."""
+        lines = len(outline.lines)
+        return (
+            outline.chars >= self.document_min_chars
+            and outline.marked < lines * 0.3
+            and outline.chars >= lines * 60  # Paragraphs, not a list of titles
+        )
+    
+    def _is_simple_topic(self, outline: _Outline) -> bool:
         """Check if input is a simple topic/question."""
-        lines = text.strip().split('\n')
-        return len(lines) <= 2 and not any(c in text for c in ['*', '-', '•', '1.', '2.'])
+        return len(outline.lines) <= 2 and not outline.marked
     
-    def _is_bulleted_list(self, text: str) -> bool:
-        """Check if input is a simple bulleted list."""
-        lines = [l.strip() for l in text.split('\n') if l.strip()]
-        bullet_chars = ['*', '-', '•']
-        bulleted_lines = sum(1 for l in lines if any(l.startswith(c) for c in bullet_chars))
-        return bulleted_lines >= len(lines) * 0.7
+    def _is_bulleted_list(self, outline: _Outline) -> bool:
+        """Check if input is a flat bulleted list (all bullets at one depth)."""
+        return (
+            outline.bulleted >= len(outline.lines) * 0.7
+            and len(outline.bullet_depths) <= 1
+        )
     
-    async def _parse_simple_topic(self, topic: str) -> List[SlideData]:
+    async def _parse_simple_topic(self, topic: str) -> List[SlideRecord]:
         """
         Generate a slide structure from a simple topic.
         Creates a basic outline: Title, Introduction, Key Points, Conclusion.
         """
         slides = [
-            SlideData(
+            SlideRecord(
                 title=topic,
                 bullets=["Overview", "Key Concepts", "Applications"]
             ),
-            SlideData(
+            SlideRecord(
                 title="Introduction",
                 bullets=[f"Understanding {topic}", "Context and Background"]
             ),
-            SlideData(
+            SlideRecord(
                 title="Key Concepts",
                 bullets=["Concept 1", "Concept 2", "Concept 3"]
             ),
-            SlideData(
+            SlideRecord(
                 title="Applications",
                 bullets=["Real-world use cases", "Practical examples"]
             ),
-            SlideData(
+            SlideRecord(
                 title="Conclusion",
                 bullets=["Summary", "Key Takeaways", "Next Steps"]
             )
         ]
         return slides
     
-    async def _parse_bulleted_list(self, text: str) -> List[SlideData]:
+    async def _parse_bulleted_list(self, outline: _Outline) -> List[SlideRecord]:
         """
         Parse a simple bulleted list into slides.
         Each bullet becomes a slide title.
         """
-        lines = [l.strip() for l in text.split('\n') if l.strip()]
+        lines = outline.lines
         slides = []
         
         # Add title slide if first line looks like a title
-        first_line = lines[0]
-        if not any(first_line.startswith(c) for c in ['*', '-', '•', '1.', '2.']):
-            slides.append(SlideData(
-                title=first_line,
+        if lines and lines[0].marker in (_PLAIN, _HEADING):
+            slides.append(SlideRecord(
+                title=lines[0].text,
                 bullets=["Overview", "Key Topics"]
             ))
             lines = lines[1:]
         
         # Convert each bullet to a slide
         for line in lines:
-            # Remove bullet characters
-            title = re.sub(r'^[\*\-•]\s*', '', line)
-            title = re.sub(r'^\d+\.\s*', '', title)
-            
-            if title:
-                slides.append(SlideData(
-                    title=title,
-                    bullets=[]  # Will be expanded by content generator
-                ))
+            slides.append(SlideRecord(
+                title=line.text,
+                bullets=[]  # Will be expanded by content generator
+            ))
         
         return slides
     
-    async def _parse_nested_outline(self, text: str) -> List[SlideData]:
+    async def _parse_nested_outline(self, outline: _Outline) -> List[SlideRecord]:
         """
         Parse a nested outline into slides.
         Top-level items become slide titles, nested items become bullets.
         """
-        lines = [l for l in text.split('\n') if l.strip()]
-        sections = self._extract_sections(lines)
-        
-        slides = []
-        for section in sections:
-            slides.append(SlideData(
-                title=section.title,
-                bullets=section.sub_points
-            ))
+        with _gc_paused():
+            sections, points = self._extract_sections(outline.lines)
+            
+            slides = []
+            for section, bullets in zip(sections, points):
+                slides.append(SlideRecord(
+                    title=section.title,
+                    bullets=bullets
+                ))
         
         return slides
     
-    def _extract_sections(self, lines: List[str]) -> List[OutlineSection]:
-        """Extract hierarchical sections from outline text."""
+    def _extract_sections(self, lines: List[_Line]) -> Tuple[List[OutlineSection], List[List[str]]]:
+        """
+        Build the section tree from classified lines.
+        
+        Returns:
+            The top-level sections, and for each one the titles of all its
+            descendants in document order, collected in the same pass
+        """
         sections = []
-        current_section = None
+        points: List[List[str]] = []
+        open_sections: List[OutlineSection] = []
+        pop = open_sections.pop
+        push = open_sections.append
+        bullets: List[str] = []
         
-        for line in lines:
-            indent_level = len(line) - len(line.lstrip())
-            clean_line = line.strip()
+        for depth, _, title in lines:
+            section = OutlineSection(title, [], depth, [])
             
-            # Remove bullet/number markers
-            clean_line = re.sub(r'^[\*\-•]\s*', '', clean_line)
-            clean_line = re.sub(r'^\d+\.\s*', '', clean_line)
+            while open_sections and open_sections[-1].depth >= depth:
+                pop()
             
-            if not clean_line:
-                continue
+            if open_sections:
+                parent = open_sections[-1]
+                parent.children.append(section)
+                parent.sub_points.append(title)
+                bullets.append(title)
+            else:
+                sections.append(section)
+                bullets = []
+                points.append(bullets)
             
-            # Determine if this is a main section or sub-point
-            if indent_level <= 2:  # Main section
-                if current_section:
-                    sections.append(current_section)
-                current_section = OutlineSection(title=clean_line, depth=0)
-            else:  # Sub-point
-                if current_section:
-                    current_section.sub_points.append(clean_line)
-        
-        # Add last section
-        if current_section:
-            sections.append(current_section)
-        
-        return sections
+            push(section)
+        
+        return sections, points
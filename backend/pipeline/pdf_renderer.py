@@ -0,0 +1,494 @@
+"""
+PDF Renderer Module
+Renders slides straight to PDF, without LibreOffice.
+"""
+
+import os
+import zlib
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+from PIL import Image
+from models import SlideRecord
+from telemetry import span
+from pipeline.layout import (
+    BULLET_SPACE_BEFORE, CONTENT_TITLE, SLIDE_HEIGHT, SLIDE_WIDTH, SUBTITLE_BULLETS,
+    SUBTITLE_SIZE, TITLE_SLIDE_SUBTITLE, TITLE_SLIDE_TITLE, Box, content_boxes
+)
+
+logger = logging.getLogger(__name__)
+
+POINTS_PER_INCH = 72
+
+# Text box insets python-pptx gives new text boxes, in inches
+_INSET_X = 0.1
+_INSET_Y = 0.05
+# Line height and first baseline, relative to the font size
+_LINE_HEIGHT = 1.2
+_ASCENT = 0.9
+
+# Advance widths of the standard Helvetica fonts (1/1000 em) for
+# characters 32-126, from their Adobe font metrics
+_HELVETICA_WIDTHS = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584
+)
+_HELVETICA_BOLD_WIDTHS = (
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584
+)
+# Common WinAnsi punctuation above 126: quotes, bullet, dashes, ellipsis
+_EXTENDED_WIDTHS = {
+    0x85: (1000, 1000), 0x91: (222, 278), 0x92: (222, 278), 0x93: (333, 500),
+    0x94: (333, 500), 0x95: (350, 350), 0x96: (556, 556), 0x97: (1000, 1000)
+}
+_DEFAULT_WIDTH = 556
+
+
+def _font_widths(bold: bool) -> List[int]:
+    """Widths of all 256 WinAnsi codes in one of the two fonts."""
+    table = _HELVETICA_BOLD_WIDTHS if bold else _HELVETICA_WIDTHS
+    widths = [_DEFAULT_WIDTH] * 256
+    widths[32:127] = table
+    for code, (regular, bold_width) in _EXTENDED_WIDTHS.items():
+        widths[code] = bold_width if bold else regular
+    return widths
+
+
+# Resource names of the fonts, by boldness
+_FONTS = {False: (b"F1", b"Helvetica", _font_widths(False)), True: (b"F2", b"Helvetica-Bold", _font_widths(True))}
+
+
+@dataclass
+class _PdfImage:
+    """An image encoded as a PDF XObject, with its soft mask if it has transparency."""
+    
+    width: int
+    height: int
+    filter: bytes
+    data: bytes
+    color_space: bytes = b"DeviceRGB"
+    mask: Optional[bytes] = None
+
+
+class UnsupportedText(ValueError):
+    """Slide text the built-in fonts cannot draw: characters outside Windows-1252."""
+
+
+class PdfRenderer:
+    """
+    Renders decks to PDF directly from slide data.
+    
+    Pages use the layout the PowerPoint builder uses (pipeline.layout),
+    so the PDF matches the deck. Text is set in the PDF's built-in
+    Helvetica fonts, which need no embedding, and wrapped with their
+    metrics; titles wrap inside their box instead of running off the
+    page. Every distinct image is encoded once, in parallel with the
+    page content, as an XObject all pages showing it refer to: JPEGs
+    are copied as they are, other images are downscaled to the
+    resolution of their frame. The built-in fonts only cover
+    Windows-1252, so decks with other characters are refused with
+    UnsupportedText rather than drawn with "?".
+    """
+    
+    def __init__(self, workers: Optional[int] = None, image_dpi: Optional[float] = None):
+        """
+        Initialize the renderer.
+        
+        Args:
+            workers: Threads encoding images and pages (default: PDF_RENDER_WORKERS)
+            image_dpi: Resolution images are downscaled to (default: PDF_IMAGE_DPI)
+        """
+        self.workers = workers or int(os.getenv("PDF_RENDER_WORKERS", "4"))
+        self.image_dpi = image_dpi or float(os.getenv("PDF_IMAGE_DPI", "200"))
+    
+    def render(self, slides: Sequence[SlideRecord], theme_colors: dict, output_path: str) -> str:
+        """
+        Write slides as a PDF, one page per slide.
+        
+        Args:
+            slides: Slides with content, the first being the title slide
+            theme_colors: Theme of the deck (see SlideBuilder.themes)
+            output_path: File to write; replaced atomically
+        
+        Returns:
+            Path to the PDF file
+        
+        Raises:
+            UnsupportedText: If a slide has text outside Windows-1252
+        """
+        if not slides:
+            raise ValueError("Cannot render a PDF without slides")
+        
+        with span("render_pdf", slides=len(slides)) as current:
+            stream = self.stream(theme_colors, os.path.dirname(output_path) or ".")
+            try:
+                stream.add(slides)
+                stream.close(output_path)
+            except BaseException:
+                stream.abort()
+                raise
+            current.set_attribute("images", len(stream.images))
+        return output_path
+    
+    def stream(self, theme_colors: dict, directory: str) -> "PdfStream":
+        """
+        Start a PDF written a chunk of slides at a time, for decks too large to hold.
+        
+        Args:
+            theme_colors: Theme of the deck (see SlideBuilder.themes)
+            directory: Where the partial file is written, e.g. the output directory
+        
+        Returns:
+            The open PDF; add() pages to it, then close() it
+        """
+        return PdfStream(self, theme_colors, directory)
+    
+    def _encode_image(self, path: str, box: Box) -> Optional[_PdfImage]:
+        """Encode one image for its frame, or None if it cannot be read."""
+        try:
+            with Image.open(path) as image:
+                if image.format == "JPEG" and image.mode in ("RGB", "L"):
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    color_space = b"DeviceRGB" if image.mode == "RGB" else b"DeviceGray"
+                    return _PdfImage(image.width, image.height, b"DCTDecode", data, color_space)
+                
+                # Pictures are stretched to their frame, as in the deck
+                size = (
+                    min(image.width, round(box[2] * self.image_dpi)),
+                    min(image.height, round(box[3] * self.image_dpi))
+                )
+                transparent = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+                image = image.convert("RGBA" if transparent else "RGB")
+                if image.size != size:
+                    image = image.resize(size, Image.LANCZOS)
+                
+                mask = None
+                if transparent:
+                    mask = zlib.compress(image.getchannel("A").tobytes())
+                    image = image.convert("RGB")
+                return _PdfImage(size[0], size[1], b"FlateDecode", zlib.compress(image.tobytes()), mask=mask)
+        except Exception as e:
+            logger.warning("Error adding image %s to PDF: %s", path, e)
+            return None
+    
+    def _page_content(
+        self,
+        position: int,
+        slide: SlideRecord,
+        theme_colors: dict,
+        images: Dict[str, bytes]
+    ) -> bytes:
+        """Draw one slide as a compressed PDF content stream."""
+        ops = [b"%s rg 0 0 %s %s re f" % (
+            _color(theme_colors["background"]), _number(_points(SLIDE_WIDTH)), _number(_points(SLIDE_HEIGHT))
+        )]
+        title_bold = theme_colors.get("title_bold", True)
+        
+        if position == 0:
+            self._text(ops, TITLE_SLIDE_TITLE, [slide.title], theme_colors.get("title_size", 54),
+                       title_bold, theme_colors["title_color"], centered=True, fit=True)
+            if slide.bullets:
+                subtitle = " | ".join(slide.bullets[:SUBTITLE_BULLETS])
+                self._text(ops, TITLE_SLIDE_SUBTITLE, [subtitle], SUBTITLE_SIZE,
+                           False, theme_colors["text_color"], centered=True)
+        else:
+            has_image = slide.image_path and os.path.exists(slide.image_path)
+            boxes = content_boxes(has_image)
+            name = images.get(slide.image_path) if has_image else None
+            if name is not None:
+                left, top, width, height = map(_points, boxes["image"])
+                ops.append(b"q %s 0 0 %s %s %s cm /%s Do Q" % (
+                    _number(width), _number(height), _number(left),
+                    _number(_points(SLIDE_HEIGHT) - top - height), name
+                ))
+            self._text(ops, CONTENT_TITLE, [slide.title], theme_colors.get("title_size", 36),
+                       title_bold, theme_colors["title_color"], fit=True)
+            if slide.bullets:
+                self._text(ops, boxes["bullets"], slide.bullets, theme_colors.get("bullet_size", 20),
+                           False, theme_colors["text_color"], space_before=BULLET_SPACE_BEFORE)
+        
+        return zlib.compress(b"\n".join(ops))
+    
+    @staticmethod
+    def _text(
+        ops: List[bytes],
+        box: Box,
+        paragraphs: Sequence[str],
+        size: float,
+        bold: bool,
+        color,
+        centered: bool = False,
+        space_before: float = 0,
+        fit: bool = False
+    ):
+        """
+        Set paragraphs in a text box, top-anchored and wrapped to its width.
+        
+        With fit, the font shrinks (down to half its size) until the text
+        fits the box's height, so long titles do not cover the bullets.
+        Otherwise text that overflows the box carries on below it, as in
+        the deck, until the bottom of the page.
+        """
+        font, _, widths = _FONTS[bool(bold)]
+        left, top, width, height = map(_points, box)
+        left += _points(_INSET_X)
+        width -= 2 * _points(_INSET_X)
+        height -= 2 * _points(_INSET_Y)
+        page_height = _points(SLIDE_HEIGHT)
+        encoded = [
+            # Line breaks within a paragraph are kept, as python-pptx keeps them
+            [text.encode("cp1252") for text in paragraph.split("\n")]
+            for paragraph in paragraphs
+        ]
+        smallest = size / 2
+        
+        while True:
+            lines = [
+                [line for text in paragraph for line in _wrap(text, widths, size, width)]
+                for paragraph in encoded
+            ]
+            total = sum(len(paragraph) for paragraph in lines) * _LINE_HEIGHT * size
+            total += space_before * (len(lines) - 1)
+            if not fit or total <= height or size * 0.9 < smallest:
+                break
+            size *= 0.9
+        
+        ops.append(b"BT /%s %s Tf %s rg" % (font, _number(size), _color(color)))
+        baseline = top + _points(_INSET_Y) + _ASCENT * size
+        for number, paragraph in enumerate(lines):
+            if number:
+                baseline += space_before
+            for line in paragraph:
+                if baseline > page_height:
+                    ops.append(b"ET")
+                    return
+                x = left
+                if centered:
+                    x += (width - _measure(line, widths, size)) / 2
+                ops.append(b"1 0 0 1 %s %s Tm (%s) Tj" % (
+                    _number(x), _number(page_height - baseline), _escape(line)
+                ))
+                baseline += _LINE_HEIGHT * size
+        ops.append(b"ET")
+
+
+class PdfStream:
+    """
+    A PDF written as its pages are made, one chunk of slides at a time.
+    
+    Fonts, images and pages are written to a partial file as they are
+    added, so only the chunk in hand is held; images are still written
+    once however many pages show them. The page tree, the resources and
+    the cross-reference table are written on close(), which moves the
+    file into place. Object numbers of the catalog, page tree and
+    resources are reserved up front, so pages can refer to them.
+    """
+    
+    def __init__(self, renderer: PdfRenderer, theme_colors: dict, directory: str):
+        self.renderer = renderer
+        self.theme_colors = theme_colors
+        # XObject names of the images written so far, by path
+        self.images: Dict[str, bytes] = {}
+        self.error: Optional[Exception] = None
+        self._xobjects: List[bytes] = []
+        self._pages: List[int] = []
+        self._offsets: Dict[int, int] = {}
+        self._count = 0
+        self._pool = ThreadPoolExecutor(max_workers=renderer.workers)
+        # Named once the deck's path is known, in close()
+        self._partial = os.path.join(directory, f"{uuid.uuid4().hex}.pdf.partial")
+        self._file = open(self._partial, "xb")
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._catalog, self._tree, self._resources = self._reserve(), self._reserve(), self._reserve()
+        self._fonts = []
+        for name, base_font, _ in _FONTS.values():
+            number = self._add(b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % base_font)
+            self._fonts.append(b"/%s %d 0 R" % (name, number))
+    
+    def add(self, slides: Sequence[SlideRecord]):
+        """
+        Write the pages of the next slides, the first slide added being the title slide.
+        
+        A failure leaves the stream unusable: error is set, the partial file
+        is removed and later calls do nothing.
+        
+        Raises:
+            UnsupportedText: If a slide has text outside Windows-1252
+        """
+        if self.error is not None:
+            return
+        try:
+            _check_text(slides, self._count)
+            # Pictures of the content slides not written yet
+            paths = list(dict.fromkeys(
+                slide.image_path for position, slide in enumerate(slides, self._count)
+                if position and slide.image_path and slide.image_path not in self.images
+                and os.path.exists(slide.image_path)
+            ))
+            image_box = content_boxes(True)["image"]
+            encoded = list(self._pool.map(lambda path: self.renderer._encode_image(path, image_box), paths))
+            for path, image in zip(paths, encoded):
+                if image is not None:
+                    self._add_image(path, image)
+            
+            pages = self._pool.map(
+                lambda item: self.renderer._page_content(item[0], item[1], self.theme_colors, self.images),
+                enumerate(slides, self._count)
+            )
+            for content in pages:
+                # The page, then its content as the next object
+                page = self._add(b"<< /Type /Page /Parent %d 0 R /Resources %d 0 R /Contents %d 0 R >>" % (
+                    self._tree, self._resources, len(self._offsets) + 2
+                ))
+                self._add(b"/Filter /FlateDecode", content)
+                self._pages.append(page)
+            self._count += len(slides)
+        except Exception as e:
+            self.error = e
+            self.abort()
+            raise
+    
+    def close(self, output_path: str) -> str:
+        """
+        Finish the document and move it to output_path.
+        
+        Returns:
+            Path to the PDF file
+        
+        Raises:
+            The error that made an earlier add() fail, if one did
+        """
+        if self.error is not None:
+            raise self.error
+        if not self._pages:
+            raise ValueError("Cannot render a PDF without slides")
+        try:
+            self._add(b"<< /Font << %s >> /XObject << %s >> >>" % (
+                b" ".join(self._fonts), b" ".join(self._xobjects)
+            ), number=self._resources)
+            self._add(b"<< /Type /Pages /Kids [%s] /Count %d /MediaBox [0 0 %s %s] >>" % (
+                b" ".join(b"%d 0 R" % page for page in self._pages), len(self._pages),
+                _number(_points(SLIDE_WIDTH)), _number(_points(SLIDE_HEIGHT))
+            ), number=self._tree)
+            self._add(b"<< /Type /Catalog /Pages %d 0 R >>" % self._tree, number=self._catalog)
+            info = self._add(b"<< /Producer (Prompt2Deck) >>")
+            
+            size = len(self._offsets) + 1
+            xref = self._file.tell()
+            self._file.write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+            self._file.write(b"".join(b"%010d 00000 n \n" % self._offsets[number] for number in range(1, size)))
+            self._file.write(b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+                size, self._catalog, info, xref
+            ))
+            self._file.close()
+            os.replace(self._partial, output_path)
+        except BaseException:
+            self.abort()
+            raise
+        self._pool.shutdown()
+        return output_path
+    
+    def abort(self):
+        """Drop the partial file, e.g. when the deck build failed; safe to call more than once."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._file.close()
+        if os.path.exists(self._partial):
+            os.remove(self._partial)
+    
+    def _reserve(self) -> int:
+        """Number an object to be written later, so others can refer to it first."""
+        number = len(self._offsets) + 1
+        self._offsets[number] = -1
+        return number
+    
+    def _add(self, body: bytes, stream: Optional[bytes] = None, number: Optional[int] = None) -> int:
+        """Write an object (a new one, or a reserved one), returning its number."""
+        if number is None:
+            number = self._reserve()
+        if stream is not None:
+            body = b"<< %s /Length %d >>\nstream\n%s\nendstream" % (body, len(stream), stream)
+        self._offsets[number] = self._file.tell()
+        self._file.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        return number
+    
+    def _add_image(self, path: str, image: _PdfImage):
+        """Write an image and its soft mask, and name it for the pages showing it."""
+        header = b"/Type /XObject /Subtype /Image /Width %d /Height %d /BitsPerComponent 8 /Filter /%s" % (
+            image.width, image.height, image.filter
+        )
+        mask = b""
+        if image.mask is not None:
+            mask = b" /SMask %d 0 R" % self._add(header + b" /ColorSpace /DeviceGray", image.mask)
+        number = self._add(header + b" /ColorSpace /%s%s" % (image.color_space, mask), image.data)
+        name = b"Im%d" % (len(self.images) + 1)
+        self.images[path] = name
+        self._xobjects.append(b"/%s %d 0 R" % (name, number))
+
+
+def _check_text(slides: Sequence[SlideRecord], start: int = 0):
+    """Raise UnsupportedText if the text drawn on any of the slides is outside Windows-1252."""
+    for position, slide in enumerate(slides, start):
+        for text in (slide.title, *slide.bullets):
+            try:
+                text.encode("cp1252")
+            except UnicodeEncodeError as e:
+                raise UnsupportedText(
+                    f"Slide {position + 1} has characters the PDF fonts lack: {text[e.start:e.end]!r}"
+                ) from None
+
+
+def _points(inches: float) -> float:
+    return inches * POINTS_PER_INCH
+
+
+def _number(value: float) -> bytes:
+    """Format a number for a content stream."""
+    return (b"%.2f" % value).rstrip(b"0").rstrip(b".")
+
+
+def _color(rgb) -> bytes:
+    """A theme color (an RGBColor, i.e. a tuple of bytes) as PDF color components."""
+    return b" ".join(_number(component / 255) for component in tuple(rgb))
+
+
+def _escape(text: bytes) -> bytes:
+    """Escape a string for a PDF literal."""
+    return text.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)").replace(b"\r", b"\\r")
+
+
+def _measure(text: bytes, widths: List[int], size: float) -> float:
+    return sum(widths[code] for code in text) * size / 1000
+
+
+def _wrap(text: bytes, widths: List[int], size: float, width: float) -> List[bytes]:
+    """Break text into lines that fit a width, at spaces, or mid-word for words too long for a line."""
+    lines: List[bytes] = []
+    line = b""
+    for word in text.strip(b" ").split(b" "):
+        candidate = line + b" " + word if line else word
+        if _measure(candidate, widths, size) <= width:
+            line = candidate
+            continue
+        if line:
+            lines.append(line)
+        line = word
+        while len(line) > 1 and _measure(line, widths, size) > width:
+            cut = 1
+            while cut < len(line) and _measure(line[:cut + 1], widths, size) <= width:
+                cut += 1
+            lines.append(line[:cut])
+            line = line[cut:]
+    lines.append(line)
+    return lines
@@ -0,0 +1,161 @@
+"""
+Scheduler Module
+Priority and fair-share scheduling of outbound LLM and image calls.
+"""
+
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Deque, List, Optional, Tuple
+from telemetry import QUEUE_DEPTH, SCHEDULER_WAIT
+
+
+# Priority classes, highest first
+PRIORITIES = ("interactive", "generate", "batch")
+
+_work_class: ContextVar[Tuple[str, str]] = ContextVar("work_class", default=("generate", "anonymous"))
+
+_scheduler: Optional["Scheduler"] = None
+_scheduler_lock = threading.Lock()
+
+
+class Scheduler:
+    """
+    Hands out a fixed number of slots for outbound calls.
+    
+    When every slot is taken, calls queue by priority class and, within a
+    class, per client. A freed slot goes to the highest class with waiters;
+    inside that class clients take turns, so one client's large job cannot
+    hold back another client's next call for more than one turn.
+    """
+    
+    def __init__(self, capacity: int):
+        """
+        Initialize an idle scheduler.
+        
+        Args:
+            capacity: Number of calls allowed to run at once
+        """
+        self.capacity = capacity
+        self.active = 0
+        self.waiting = 0
+        # One queue per client for each priority class; dict order is the turn order
+        self._queues: List["OrderedDict[str, Deque[asyncio.Future]]"] = [
+            OrderedDict() for _ in PRIORITIES
+        ]
+        self._depth = [QUEUE_DEPTH.labels(queue=f"llm_{priority}") for priority in PRIORITIES]
+        self._wait = [SCHEDULER_WAIT.labels(priority=priority) for priority in PRIORITIES]
+    
+    @asynccontextmanager
+    async def slot(self, priority: str = "generate", client: str = "anonymous"):
+        """Hold a slot for the duration of the block."""
+        await self.acquire(priority, client)
+        try:
+            yield
+        finally:
+            self.release()
+    
+    async def acquire(self, priority: str, client: str):
+        """
+        Wait for a slot.
+        
+        Args:
+            priority: One of PRIORITIES
+            client: Client the call is made for; clients share a class fairly
+        """
+        level = PRIORITIES.index(priority)
+        if self.active < self.capacity and not self.waiting:
+            self.active += 1
+            self._wait[level].observe(0.0)
+            return
+        
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        self._queues[level].setdefault(client, deque()).append(future)
+        self.waiting += 1
+        self._depth[level].inc()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the caller went away: hand the slot on
+                self.release()
+            else:
+                self._discard(level, client, future)
+            raise
+        finally:
+            self._depth[level].dec()
+            self._wait[level].observe(time.perf_counter() - start)
+    
+    def release(self):
+        """Free a slot and grant it to the next waiter, if any."""
+        self.active -= 1
+        while self.active < self.capacity:
+            future = self._next_waiter()
+            if future is None:
+                return
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+    
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        """Pop the head waiter of the next client in the highest non-empty class."""
+        for clients in self._queues:
+            if clients:
+                client, queue = clients.popitem(last=False)
+                future = queue.popleft()
+                self.waiting -= 1
+                if queue:
+                    # Back of the line for the client's next call
+                    clients[client] = queue
+                return future
+        return None
+    
+    def _discard(self, level: int, client: str, future: asyncio.Future):
+        queue = self._queues[level].get(client)
+        if queue is not None and future in queue:
+            queue.remove(future)
+            self.waiting -= 1
+            if not queue:
+                del self._queues[level][client]
+
+
+def scheduler() -> Scheduler:
+    """Return the process-wide scheduler, sized by LLM_CONCURRENCY."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = Scheduler(int(os.getenv("LLM_CONCURRENCY", "8")))
+    return _scheduler
+
+
+@contextmanager
+def work_class(priority: Optional[str] = None, client: Optional[str] = None):
+    """
+    Set the priority class and client of the calls made inside the block.
+    
+    Args:
+        priority: One of PRIORITIES (None keeps the current class)
+        client: Client id for fair sharing (None keeps the current client)
+    """
+    current_priority, current_client = _work_class.get()
+    if priority is not None and priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority class: {priority}")
+    token = _work_class.set((priority or current_priority, client or current_client))
+    try:
+        yield
+    finally:
+        _work_class.reset(token)
+
+
+@asynccontextmanager
+async def scheduled():
+    """Hold a scheduler slot for one outbound call, in the current work class."""
+    priority, client = _work_class.get()
+    async with scheduler().slot(priority, client):
+        yield
@@ -0,0 +1,324 @@
+"""
+Semantic Cache Module
+Reuses slide expansions for near-duplicate slides, found by vector similarity.
+"""
+
+import os
+import re
+import json
+import zlib
+import asyncio
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from telemetry import CACHE_HITS, CACHE_MISSES, SEMANTIC_CACHE_SIMILARITY
+
+logger = logging.getLogger(__name__)
+
+# A cached expansion: (bullets, speaker notes, image prompt)
+Expansion = Tuple[Tuple[str, ...], Optional[str], Optional[str]]
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("a an and are as at be by for from in is of on or the to with".split())
+
+# Feature weights relative to a character n-gram
+_WORD_WEIGHT = 4.0
+_PREFIX_WEIGHT = 3.0
+_PREFIX_LENGTH = 5
+
+_cache: Optional["SemanticCache"] = None
+_cache_lock = threading.Lock()
+
+
+class HashedNgramEmbedder:
+    """
+    Embeds text offline as hashed character n-grams and words.
+    
+    Every word, padded with spaces, contributes its character n-grams and
+    the word itself (see features()) to a fixed number of buckets (the hashing trick). The
+    bucket's sign comes from the hash too, so collisions tend to cancel
+    out. Vectors are L2-normalized: their dot product is the cosine
+    similarity. Rewordings of the same words ("Cloud Computing Basics",
+    "Basics of Cloud Computing") share most of their n-grams; no model or
+    network is needed. Abbreviations and synonyms ("Intro to ML",
+    "Introduction to Machine Learning") share too few to score as close.
+    """
+    
+    def __init__(self, dimensions: int = 1024, ngram_sizes: Sequence[int] = (3, 4)):
+        """
+        Initialize the embedder.
+        
+        Args:
+            dimensions: Length of the vectors
+            ngram_sizes: Character n-gram lengths to hash
+        """
+        self.dimensions = dimensions
+        self.ngram_sizes = tuple(ngram_sizes)
+    
+    def features(self, text: str) -> List[Tuple[str, float]]:
+        """
+        Weighted features of a text.
+        
+        Whole words weigh most, so "Supervised" and "Unsupervised" stay
+        apart despite sharing n-grams. Prefixes of long words and the
+        initials of word pairs add a little similarity between short
+        forms and acronyms and what they stand for ("intro" and
+        "introduction", "ML" and "machine learning"), but not enough to
+        match them at the default threshold.
+        """
+        words = [word for word in _WORD_RE.findall(text.lower()) if word not in _STOPWORDS]
+        features = []
+        for word in words:
+            features.append((word, _WORD_WEIGHT))
+            if len(word) > _PREFIX_LENGTH:
+                features.append((word[:_PREFIX_LENGTH], _PREFIX_WEIGHT))
+            padded = f" {word} "
+            for size in self.ngram_sizes:
+                features.extend((padded[i:i + size], 1.0) for i in range(len(padded) - size + 1))
+        for first, second in zip(words, words[1:]):
+            features.append((first[0] + second[0], _PREFIX_WEIGHT))
+        return features
+    
+    def embed(self, text: str) -> np.ndarray:
+        """
+        Embed text as a normalized float32 vector (all zeros for empty text).
+        
+        Hashes are CRC32, not hash(), so vectors stay the same across
+        processes and a persisted index remains valid.
+        """
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        features = self.features(text)
+        if not features:
+            return vector
+        hashes = np.fromiter(
+            (zlib.crc32(feature.encode("utf-8")) for feature, _ in features),
+            dtype=np.uint32,
+            count=len(features)
+        )
+        weights = np.fromiter((weight for _, weight in features), dtype=np.float32, count=len(features))
+        np.add.at(vector, hashes % self.dimensions, np.where(hashes >> 31, weights, -weights))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """
+    A bounded nearest-neighbour cache of slide expansions.
+    
+    Each entry is the embedding of a slide's title and outline bullets,
+    stored as a row of a preallocated NumPy matrix, with the expansion
+    made for it. A lookup is one matrix-vector product: the most similar
+    entry is reused if its cosine similarity reaches the threshold, the
+    knob that trades hit rate for faithfulness. Entries only match lookups
+    in the same namespace (prompt version, models, options and tenant), and the
+    least recently used entry is evicted when the cache is full. With a
+    path, the index is saved every few inserts and on shutdown, and loaded
+    at start-up.
+    """
+    
+    def __init__(
+        self,
+        capacity: int = 2048,
+        threshold: float = 0.9,
+        path: Optional[str] = None,
+        dimensions: int = 1024,
+        title_weight: float = 2.0,
+        save_every: int = 50
+    ):
+        """
+        Initialize an empty cache, loading the saved index if there is one.
+        
+        Args:
+            capacity: Maximum number of entries
+            threshold: Cosine similarity a cached slide needs to be reused
+            path: .npz file to persist the index to (None for memory only)
+            dimensions: Embedding length
+            title_weight: Weight of the title relative to the bullets
+            save_every: Inserts between saves
+        """
+        self.capacity = capacity
+        self.threshold = threshold
+        self.path = path
+        self.title_weight = title_weight
+        self.save_every = save_every
+        self.embedder = HashedNgramEmbedder(dimensions)
+        
+        self._vectors = np.zeros((capacity, dimensions), dtype=np.float32)
+        self._namespace_ids = np.full(capacity, -1, dtype=np.int32)
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._values: List[Optional[Expansion]] = [None] * capacity
+        self._namespaces: Dict[str, int] = {}
+        self._size = 0
+        self._clock = 0
+        self._unsaved = 0
+        self._write_lock = threading.Lock()
+        
+        if path and os.path.exists(path):
+            self._load()
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def embed_slide(self, title: str, bullets: Sequence[str]) -> np.ndarray:
+        """Embed a slide: its title, weighted, plus its outline bullets."""
+        vector = self.title_weight * self.embedder.embed(title)
+        if bullets:
+            vector += self.embedder.embed(" ".join(bullets))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def lookup(self, namespace: str, title: str, bullets: Sequence[str]) -> Optional[Expansion]:
+        """
+        Find the expansion of a near-duplicate slide.
+        
+        Args:
+            namespace: Partition the entry must belong to
+            title: Slide title
+            bullets: Outline bullets of the slide
+        
+        Returns:
+            The cached expansion, or None on a miss
+        """
+        row, similarity = self._nearest(namespace, self.embed_slide(title, bullets))
+        if row is None or similarity < self.threshold:
+            CACHE_MISSES.labels(cache="semantic").inc()
+            return None
+        CACHE_HITS.labels(cache="semantic").inc()
+        self._touch(row)
+        return self._values[row]
+    
+    def insert(self, namespace: str, title: str, bullets: Sequence[str], expansion: Expansion):
+        """
+        Store a slide's expansion.
+        
+        A slide that is practically identical to an entry replaces it, so
+        repeated slides do not fill the cache with copies.
+        """
+        vector = self.embed_slide(title, bullets)
+        row, similarity = self._nearest(namespace, vector)
+        if row is None or similarity < 0.999:
+            if self._size < self.capacity:
+                row = self._size
+                self._size += 1
+            else:
+                row = int(np.argmin(self._last_used[:self._size]))
+        
+        self._vectors[row] = vector
+        self._namespace_ids[row] = self._namespaces.setdefault(namespace, len(self._namespaces))
+        self._values[row] = expansion
+        self._touch(row)
+        
+        self._unsaved += 1
+        if self.path and self._unsaved >= self.save_every:
+            self._save_in_background()
+    
+    def save(self):
+        """Write the index to its path now (no-op without a path)."""
+        if self.path and self._unsaved:
+            self._write(self._snapshot())
+    
+    def _nearest(self, namespace: str, vector: np.ndarray) -> Tuple[Optional[int], float]:
+        """Most similar entry of the namespace and its cosine similarity."""
+        namespace_id = self._namespaces.get(namespace)
+        if namespace_id is None or not self._size:
+            return None, 0.0
+        scores = self._vectors[:self._size] @ vector
+        scores[self._namespace_ids[:self._size] != namespace_id] = -1.0
+        row = int(np.argmax(scores))
+        similarity = float(scores[row])
+        SEMANTIC_CACHE_SIMILARITY.observe(max(similarity, 0.0))
+        return row, similarity
+    
+    def _touch(self, row: int):
+        self._clock += 1
+        self._last_used[row] = self._clock
+    
+    def _snapshot(self) -> dict:
+        """Copy the index, on the event loop, for writing elsewhere."""
+        self._unsaved = 0
+        size = self._size
+        return {
+            "vectors": self._vectors[:size].copy(),
+            "namespace_ids": self._namespace_ids[:size].copy(),
+            "last_used": self._last_used[:size].copy(),
+            "namespaces": np.array(json.dumps(self._namespaces)),
+            "values": np.array(json.dumps(self._values[:size])),
+        }
+    
+    def _save_in_background(self):
+        """Write a snapshot off the event loop (or inline outside of one)."""
+        snapshot = self._snapshot()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(snapshot)
+        else:
+            loop.run_in_executor(None, self._write, snapshot)
+    
+    def _write(self, snapshot: dict):
+        """Save a snapshot atomically: readers see the old or the new file."""
+        with self._write_lock:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                partial = self.path + ".partial"
+                with open(partial, "wb") as f:
+                    np.savez(f, **snapshot)
+                os.replace(partial, self.path)
+            except OSError as e:
+                logger.warning("Could not save semantic cache to %s: %s", self.path, e)
+    
+    def _load(self):
+        """Load a saved index, keeping the most recently used entries that fit."""
+        try:
+            with np.load(self.path, allow_pickle=False) as saved:
+                vectors = saved["vectors"]
+                if vectors.shape[1:] != self._vectors.shape[1:]:
+                    logger.warning("Ignoring semantic cache %s: built with other dimensions", self.path)
+                    return
+                namespaces = json.loads(str(saved["namespaces"]))
+                values = json.loads(str(saved["values"]))
+                keep = np.argsort(saved["last_used"])[::-1][:self.capacity]
+                
+                size = len(keep)
+                self._vectors[:size] = vectors[keep]
+                self._namespace_ids[:size] = saved["namespace_ids"][keep]
+                self._last_used[:size] = saved["last_used"][keep]
+                self._values[:size] = [
+                    (tuple(values[i][0]), values[i][1], values[i][2]) for i in keep
+                ]
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning("Could not load semantic cache from %s: %s", self.path, e)
+            return
+        
+        self._namespaces = namespaces
+        self._size = size
+        self._clock = int(self._last_used[:size].max(initial=0))
+        logger.info("Loaded %d semantic cache entries from %s", size, self.path)
+
+
+def semantic_cache() -> Optional[SemanticCache]:
+    """
+    Return the process-wide semantic cache, or None unless SEMANTIC_CACHE_ENABLED.
+    
+    SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_SIZE and SEMANTIC_CACHE_PATH
+    ("" for memory only) configure it.
+    """
+    global _cache
+    if os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() != "true":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticCache(
+                    capacity=int(os.getenv("SEMANTIC_CACHE_SIZE", "2048")),
+                    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9")),
+                    path=os.getenv("SEMANTIC_CACHE_PATH", "cache/semantic_cache.npz") or None
+                )
+    return _cache
+
+
+def close_semantic_cache():
+    """Save the semantic cache, if one was built."""
+    if _cache is not None:
+        _cache.save()
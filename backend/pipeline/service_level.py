@@ -0,0 +1,87 @@
+"""
+Service Level Module
+Soft deadlines that let a request deliver a complete deck on time (SLA mode).
+"""
+
+import os
+from typing import Optional
+from pipeline.deadline import Deadline
+
+
+class ServiceLevel:
+    """
+    A response-time target for one request.
+    
+    Unlike a request deadline, which fails the request when it passes, a
+    service level hands each stage a soft deadline: slides a stage has not
+    finished by then get fallback content and are marked as degraded, and
+    the request goes on to deliver a complete deck on time.
+    
+    The time left after the build reserve is split between expansion and
+    images; without an image stage, expansion gets all of it.
+    """
+    
+    def __init__(
+        self,
+        seconds: float,
+        build_reserve: float = 1.0,
+        expand_share: float = 0.7
+    ):
+        """
+        Start the clock on a service level.
+        
+        Args:
+            seconds: Time from now by which the response is due
+            build_reserve: Seconds kept back for building and returning the deck
+            expand_share: Fraction of the remaining time given to expansion
+        """
+        self.seconds = seconds
+        self.deliver_by = Deadline(seconds)
+        self.build_reserve = build_reserve
+        self.expand_share = expand_share
+    
+    @classmethod
+    def from_options(
+        cls,
+        options,
+        deadline: Optional[Deadline] = None
+    ) -> Optional["ServiceLevel"]:
+        """
+        Build a service level from request options, falling back to the server default.
+        
+        REQUEST_SLA_SECONDS sets the default; 0 (the default) turns SLA mode
+        off. A request deadline shorter than the SLA takes its place.
+        
+        Returns:
+            The service level, or None when SLA mode is off
+        """
+        seconds = getattr(options, "sla_seconds", None)
+        if seconds is None:
+            seconds = float(os.getenv("REQUEST_SLA_SECONDS", "0")) or None
+        if seconds is None:
+            return None
+        if deadline is not None and deadline.bounded:
+            seconds = min(seconds, deadline.remaining())
+        return cls(
+            seconds,
+            build_reserve=float(os.getenv("SLA_BUILD_RESERVE_SECONDS", "1.0")),
+            expand_share=float(os.getenv("SLA_EXPAND_SHARE", "0.7"))
+        )
+    
+    def _stage_seconds(self) -> float:
+        """Time left for the generation stages."""
+        return max(0.0, self.deliver_by.remaining() - self.build_reserve)
+    
+    def expand_deadline(self, images: bool = True) -> Deadline:
+        """
+        Soft deadline for slide expansion, starting now.
+        
+        Args:
+            images: Whether an image stage follows and needs its share of the time
+        """
+        share = self.expand_share if images else 1.0
+        return Deadline(self._stage_seconds() * share)
+    
+    def image_deadline(self) -> Deadline:
+        """Soft deadline for image generation: everything up to the build reserve."""
+        return Deadline(self._stage_seconds())
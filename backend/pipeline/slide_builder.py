@@ -4,13 +4,58 @@ Assembles slides into a PowerPoint presentation using python-pptx.
 """
 
 import os
-from typing import List, Optional
+import gc
+import io
+import re
+import signal
+import posixpath
+import asyncio
+import hashlib
+import logging
+import zipfile
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterable, Dict, Iterable, List, Optional, Union
 from datetime import datetime
+from lxml import etree
+from PIL import Image
 from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.enum.text import PP_ALIGN
 from pptx.dml.color import RGBColor
-from models import SlideData
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from models import SlideRecord
+from telemetry import QUEUE_DEPTH, span, stage
+from pipeline.deadline import DeadlineExceeded, check_deadline, timeout_for
+from pipeline.layout import (
+    BULLET_SPACE_BEFORE, CONTENT_TITLE, SLIDE_HEIGHT, SLIDE_WIDTH, SUBTITLE_BULLETS,
+    SUBTITLE_SIZE, TITLE_SLIDE_SUBTITLE, TITLE_SLIDE_TITLE, content_boxes
+)
+from pipeline.pdf_renderer import PdfRenderer, PdfStream
+
+logger = logging.getLogger(__name__)
+
+
+# Namespaces and content types used when assembling packages part by part
+_PML_NS = "http://schemas.openxmlformats.org/presentationml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+_SLIDE_REL_TYPE = _REL_NS + "/slide"
+_SLIDE_CT = "application/vnd.openxmlformats-officedocument.presentationml.slide+xml"
+_NOTES_CT = "application/vnd.openxmlformats-officedocument.presentationml.notesSlide+xml"
+
+# Parts that are rewritten at the end of a streaming build
+_PACKAGE_INDEX_PARTS = (
+    "[Content_Types].xml",
+    "ppt/presentation.xml",
+    "ppt/_rels/presentation.xml.rels",
+)
+
+_TARGET_RE = re.compile(rb'Target="([^"]+)"')
+
+# Pillow format names of media part extensions
+_IMAGE_FORMATS = {"png": "PNG", "jpg": "JPEG", "jpeg": "JPEG", "gif": "GIF", "bmp": "BMP"}
 
 
 class SlideBuilder:
@@ -50,12 +95,30 @@ class SlideBuilder:
                 "title_bold": False  # Minimal = no bold
             }
         }
+        # Slides rendered per python-pptx package in large-deck mode
+        self.chunk_size = int(os.getenv("LARGE_DECK_CHUNK_SIZE", "50"))
+        # Longest a LibreOffice PDF conversion may run
+        self.pdf_timeout = float(os.getenv("PDF_EXPORT_TIMEOUT", "30"))
+        # PDFs are rendered from the slides unless LibreOffice is asked for
+        native = os.getenv("PDF_RENDERER", "native").lower() != "libreoffice"
+        self.pdf_renderer = PdfRenderer() if native else None
+        # Package skeleton for streaming builds, serialized once
+        self._template: Optional[bytes] = None
+    
+    def prewarm(self):
+        """
+        Load python-pptx's default template and cache the package skeleton.
+        
+        Called by the readiness probe so the first deck does not pay for it.
+        """
+        self._template_package()
     
     async def build_deck(
         self,
-        slides: List[SlideData],
+        slides: List[SlideRecord],
         output_dir: str,
-        theme: str = "professional"
+        theme: str = "professional",
+        output_path: Optional[str] = None
     ) -> str:
         """
         Build a PowerPoint presentation from slide data.
@@ -64,35 +127,415 @@ class SlideBuilder:
             slides: List of slides with content
             output_dir: Directory to save the presentation
             theme: Visual theme to apply
-            
+            output_path: File to write (default: a new timestamped file in output_dir)
+        
         Returns:
             Path to the generated PPTX file
         """
-        prs = Presentation()
-        prs.slide_width = Inches(10)
-        prs.slide_height = Inches(7.5)
+        with stage("build_deck", slides=len(slides)):
+            prs = self._new_presentation()
+            
+            theme_colors = self.themes.get(theme, self.themes["professional"])
+            
+            # Add title slide
+            self._add_title_slide(prs, slides[0], theme_colors)
+            
+            # Add content slides
+            for slide_data in slides[1:]:
+                check_deadline()
+                self._add_content_slide(prs, slide_data, theme_colors)
+            
+            # Generate filename and save
+            filepath = output_path or self._output_path(output_dir)
+            
+            prs.save(filepath)
+        return filepath
+    
+    async def build_deck_streaming(
+        self,
+        slides: Union[Iterable[SlideRecord], AsyncIterable[SlideRecord]],
+        output_dir: str,
+        theme: str = "professional",
+        chunk_size: Optional[int] = None,
+        pdf: Optional[PdfStream] = None
+    ) -> str:
+        """
+        Build a large presentation with bounded memory.
         
+        Slides are consumed lazily and rendered in chunks, each chunk as its
+        own small python-pptx package. The slide, notes and media parts of
+        every chunk are renumbered and written straight into the output zip,
+        so only one chunk is ever held in memory. The presentation index
+        parts are written last, once the full slide list is known.
+        
+        Args:
+            slides: Slides with content, as a list, generator or async iterator
+            output_dir: Directory to save the presentation
+            theme: Visual theme to apply
+            chunk_size: Slides per chunk (defaults to LARGE_DECK_CHUNK_SIZE)
+            pdf: PDF (see pdf_stream()) each chunk's pages are also added to,
+                alongside its slides; pass it to export_to_pdf() afterwards
+        
+        Returns:
+            Path to the generated PPTX file
+        """
+        chunk_size = chunk_size or self.chunk_size
         theme_colors = self.themes.get(theme, self.themes["professional"])
+        filepath = self._output_path(output_dir)
+        
+        state = {
+            "slide_count": 0,
+            "media": {},        # sha1 of blob -> part name
+            "defaults": {},     # extension -> content type
+            "overrides": []     # (part name, content type)
+        }
         
-        # Add title slide
-        self._add_title_slide(prs, slides[0], theme_colors)
+        with stage("build_deck_streaming", chunk_size=chunk_size) as current:
+            # One worker thread per build: spreading chunks over the default
+            # executor's threads fragments memory across malloc arenas
+            with ThreadPoolExecutor(max_workers=1) as worker:
+                try:
+                    template = await self._run_in_worker(worker, self._template_package)
+                    with zipfile.ZipFile(filepath, "w", zipfile.ZIP_DEFLATED) as out:
+                        with zipfile.ZipFile(io.BytesIO(template)) as tpl:
+                            for name in tpl.namelist():
+                                if name not in _PACKAGE_INDEX_PARTS:
+                                    out.writestr(name, tpl.read(name))
+                        
+                        async def write(chunk: List[SlideRecord]):
+                            writing = self._run_in_worker(worker, self._write_chunk, out, chunk, theme_colors, state)
+                            if pdf is None:
+                                await writing
+                            else:
+                                await asyncio.gather(writing, self._add_pdf_pages(pdf, chunk))
+                        
+                        chunk: List[SlideRecord] = []
+                        async for slide_data in self._aiter(slides):
+                            chunk.append(slide_data)
+                            if len(chunk) >= chunk_size:
+                                await write(chunk)
+                                chunk = []
+                        if chunk:
+                            await write(chunk)
+                        
+                        if state["slide_count"] == 0:
+                            raise ValueError("Cannot build a deck without slides")
+                        
+                        self._write_package_index(out, template, state)
+                except BaseException:
+                    # Failed, cancelled or past the deadline: drop the partial files
+                    if os.path.exists(filepath):
+                        os.remove(filepath)
+                    if pdf is not None:
+                        pdf.abort()
+                    raise
+                current.set_attribute("slides", state["slide_count"])
         
-        # Add content slides
-        for slide_data in slides[1:]:
-            self._add_content_slide(prs, slide_data, theme_colors)
+        return filepath
+    
+    async def replace_images(
+        self,
+        pptx_path: str,
+        images: Dict[int, str],
+        output_path: str
+    ) -> str:
+        """
+        Write a copy of a deck with the pictures of some slides replaced.
+        
+        Only the media parts change; slides, notes and layouts are copied
+        byte for byte, so nothing is re-rendered. Each new image fills the
+        frame of the picture it replaces.
+        
+        Args:
+            pptx_path: Deck to copy
+            images: New image file for each slide position
+            output_path: File to write
+        
+        Returns:
+            Path to the new deck
+        """
+        with stage("replace_images", slides=len(images)):
+            await asyncio.to_thread(self._replace_media, pptx_path, images, output_path)
+        return output_path
+    
+    def _replace_media(self, pptx_path: str, images: Dict[int, str], output_path: str):
+        """Copy a package, swapping in new media (see replace_images)."""
+        partial = output_path + ".partial"
+        with zipfile.ZipFile(pptx_path) as package:
+            media = self._slide_media(package)
+            replacements = {}
+            for position, image_path in images.items():
+                name = media.get(position)
+                if name is None:
+                    logger.warning("Slide %d has no picture to replace", position)
+                    continue
+                replacements[name] = self._encode_as(image_path, posixpath.splitext(name)[1])
+            
+            try:
+                with zipfile.ZipFile(partial, "w", zipfile.ZIP_DEFLATED) as out:
+                    for info in package.infolist():
+                        if info.filename in replacements:
+                            out.writestr(info.filename, replacements[info.filename], compress_type=zipfile.ZIP_STORED)
+                        else:
+                            out.writestr(info, package.read(info))
+            except BaseException:
+                if os.path.exists(partial):
+                    os.remove(partial)
+                raise
+        os.replace(partial, output_path)
+    
+    @staticmethod
+    def _slide_media(package: zipfile.ZipFile) -> Dict[int, str]:
+        """Map each slide position to the package name of its picture, in deck order."""
+        presentation = etree.fromstring(package.read("ppt/presentation.xml"))
+        rels = etree.fromstring(package.read("ppt/_rels/presentation.xml.rels"))
+        targets = {rel.get("Id"): rel.get("Target") for rel in rels}
+        
+        media = {}
+        for position, slide_id in enumerate(presentation.iter(f"{{{_PML_NS}}}sldId")):
+            slide_name = posixpath.normpath(posixpath.join("ppt", targets[slide_id.get(f"{{{_REL_NS}}}id")]))
+            folder, filename = posixpath.split(slide_name)
+            for rel in etree.fromstring(package.read(f"{folder}/_rels/{filename}.rels")):
+                if rel.get("Type") == RT.IMAGE:
+                    media[position] = posixpath.normpath(posixpath.join(folder, rel.get("Target")))
+        return media
+    
+    @staticmethod
+    def _encode_as(image_path: str, extension: str) -> bytes:
+        """Read an image, re-encoding it if the part it replaces has another format."""
+        with Image.open(image_path) as image:
+            image_format = _IMAGE_FORMATS.get(extension.lower().lstrip("."))
+            if image.format == image_format:
+                with open(image_path, "rb") as f:
+                    return f.read()
+            if image_format == "JPEG":
+                image = image.convert("RGB")
+            buffer = io.BytesIO()
+            image.save(buffer, image_format or "PNG")
+            return buffer.getvalue()
+    
+    @staticmethod
+    async def _add_pdf_pages(pdf: PdfStream, chunk: List[SlideRecord]):
+        """
+        Add a chunk's pages to a streamed PDF.
+        
+        A failure only costs the PDF: the stream keeps the error, and
+        export_to_pdf() converts the deck with LibreOffice instead.
+        """
+        try:
+            await asyncio.to_thread(pdf.add, chunk)
+        except Exception:
+            pass
+    
+    @staticmethod
+    async def _run_in_worker(worker: ThreadPoolExecutor, func, *args):
+        """
+        Run func on the build's worker thread.
+        
+        The call carries the caller's context, so spans opened in the worker
+        belong to the current request, and counts as queued until it starts.
+        """
+        depth = QUEUE_DEPTH.labels(queue="slide_builder")
+        depth.inc()
+        # Decremented exactly once: by the worker, or here if it never ran
+        pending = [depth]
+        context = contextvars.copy_context()
         
-        # Generate filename and save
+        def run():
+            try:
+                pending.pop().dec()
+            except IndexError:
+                pass
+            return context.run(func, *args)
+        
+        try:
+            return await asyncio.get_running_loop().run_in_executor(worker, run)
+        finally:
+            try:
+                pending.pop().dec()
+            except IndexError:
+                pass
+    
+    def _new_presentation(self) -> Presentation:
+        """Create an empty presentation with the deck's slide size."""
+        prs = Presentation()
+        prs.slide_width = Inches(SLIDE_WIDTH)
+        prs.slide_height = Inches(SLIDE_HEIGHT)
+        return prs
+    
+    def _output_path(self, output_dir: str) -> str:
+        """Generate a timestamped output path for a new deck."""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"presentation_{timestamp}.pptx"
-        filepath = os.path.join(output_dir, filename)
+        return os.path.join(output_dir, filename)
+    
+    def _template_package(self) -> bytes:
+        """
+        Serialize an empty presentation to use as the package skeleton.
         
-        prs.save(filepath)
-        return filepath
+        The notes master is created up front so every chunk shares the same
+        set of non-slide parts as the skeleton. The result is cached.
+        """
+        if self._template is None:
+            prs = self._new_presentation()
+            prs.notes_master
+            buffer = io.BytesIO()
+            prs.save(buffer)
+            self._template = buffer.getvalue()
+        return self._template
+    
+    @staticmethod
+    async def _aiter(slides):
+        """Iterate over a sync or async iterable of slides."""
+        if hasattr(slides, "__aiter__"):
+            async for slide_data in slides:
+                yield slide_data
+        else:
+            for slide_data in slides:
+                yield slide_data
+    
+    def _write_chunk(
+        self,
+        out: zipfile.ZipFile,
+        chunk: List[SlideRecord],
+        theme_colors: dict,
+        state: dict
+    ):
+        """Render a chunk of slides and copy its slide parts into the output."""
+        check_deadline()
+        with span("build_chunk", slides=len(chunk), first_slide=state["slide_count"] + 1):
+            prs = self._new_presentation()
+            prs.notes_master
+            
+            for i, slide_data in enumerate(chunk):
+                if state["slide_count"] == 0 and i == 0:
+                    self._add_title_slide(prs, slide_data, theme_colors)
+                else:
+                    self._add_content_slide(prs, slide_data, theme_colors)
+            
+            # Parts are serialized straight from the in-memory package; the
+            # chunk is never saved as a zip of its own
+            for slide in prs.slides:
+                state["slide_count"] += 1
+                self._copy_slide_parts(slide.part, out, state)
+            
+            # python-pptx parts reference each other in cycles, so a finished
+            # chunk is only reclaimed by the cycle collector; run it now rather
+            # than letting dead chunks pile up until the next full collection
+            del prs, slide
+            gc.collect()
+    
+    def _copy_slide_parts(self, slide_part, out: zipfile.ZipFile, state: dict):
+        """Copy one slide (and its notes and media) under its global number."""
+        number = state["slide_count"]
+        targets = {}
+        
+        for rel in slide_part.rels.values():
+            if rel.is_external:
+                continue
+            if rel.reltype == RT.IMAGE:
+                targets[rel.target_ref] = "../media/" + self._copy_media(rel.target_part, out, state)
+            elif rel.reltype == RT.NOTES_SLIDE:
+                targets[rel.target_ref] = f"../notesSlides/notesSlide{number}.xml"
+                notes_part = rel.target_part
+                notes_rels = self._retarget(notes_part.rels.xml, {
+                    "../slides/" + slide_part.partname.filename: f"../slides/slide{number}.xml"
+                })
+                out.writestr(f"ppt/notesSlides/notesSlide{number}.xml", notes_part.blob)
+                out.writestr(f"ppt/notesSlides/_rels/notesSlide{number}.xml.rels", notes_rels)
+                state["overrides"].append((f"/ppt/notesSlides/notesSlide{number}.xml", _NOTES_CT))
+        
+        out.writestr(f"ppt/slides/slide{number}.xml", slide_part.blob)
+        out.writestr(f"ppt/slides/_rels/slide{number}.xml.rels", self._retarget(slide_part.rels.xml, targets))
+        state["overrides"].append((f"/ppt/slides/slide{number}.xml", _SLIDE_CT))
+    
+    @staticmethod
+    def _retarget(rels_xml: bytes, targets: Dict[str, str]) -> bytes:
+        """Rewrite relationship targets in a serialized .rels part."""
+        return _TARGET_RE.sub(
+            lambda match: b'Target="%s"' % targets.get(
+                match.group(1).decode("utf-8"), match.group(1).decode("utf-8")
+            ).encode("utf-8"),
+            rels_xml
+        )
+    
+    def _copy_media(self, image_part, out: zipfile.ZipFile, state: dict) -> str:
+        """Write a media part once per deck and return its file name."""
+        blob = image_part.blob
+        digest = hashlib.sha1(blob).hexdigest()
+        
+        if digest not in state["media"]:
+            extension = image_part.partname.ext
+            filename = f"image{len(state['media']) + 1}.{extension}"
+            # Images are already compressed, deflating them again is wasted CPU
+            out.writestr(f"ppt/media/{filename}", blob, compress_type=zipfile.ZIP_STORED)
+            state["media"][digest] = filename
+            state["defaults"].setdefault(extension, image_part.content_type)
+        
+        return state["media"][digest]
+    
+    def _write_package_index(
+        self,
+        out: zipfile.ZipFile,
+        template: bytes,
+        state: dict
+    ):
+        """Write presentation.xml, its relationships and the content types."""
+        with zipfile.ZipFile(io.BytesIO(template)) as tpl:
+            presentation = etree.fromstring(tpl.read("ppt/presentation.xml"))
+            rels = etree.fromstring(tpl.read("ppt/_rels/presentation.xml.rels"))
+            content_types = etree.fromstring(tpl.read("[Content_Types].xml"))
+        
+        # Relationship ids for the slides continue after the template's own
+        used_ids = [
+            int(rel.get("Id")[3:]) for rel in rels
+            if rel.get("Id", "").startswith("rId") and rel.get("Id")[3:].isdigit()
+        ]
+        next_id = max(used_ids, default=0) + 1
+        
+        sld_id_lst = presentation.find(f"{{{_PML_NS}}}sldIdLst")
+        if sld_id_lst is None:
+            sld_id_lst = etree.Element(f"{{{_PML_NS}}}sldIdLst")
+            presentation.find(f"{{{_PML_NS}}}sldSz").addprevious(sld_id_lst)
+        
+        for number in range(1, state["slide_count"] + 1):
+            rel_id = f"rId{next_id + number - 1}"
+            etree.SubElement(rels, f"{{{_PKG_REL_NS}}}Relationship", {
+                "Id": rel_id,
+                "Type": _SLIDE_REL_TYPE,
+                "Target": f"slides/slide{number}.xml"
+            })
+            etree.SubElement(sld_id_lst, f"{{{_PML_NS}}}sldId", {
+                "id": str(255 + number),
+                f"{{{_REL_NS}}}id": rel_id
+            })
+        
+        known_defaults = {d.get("Extension") for d in content_types.iter(f"{{{_CT_NS}}}Default")}
+        first_override = content_types.find(f"{{{_CT_NS}}}Override")
+        for extension, content_type in state["defaults"].items():
+            if extension not in known_defaults:
+                default = etree.Element(f"{{{_CT_NS}}}Default", {
+                    "Extension": extension,
+                    "ContentType": content_type
+                })
+                first_override.addprevious(default)
+        for part_name, content_type in state["overrides"]:
+            etree.SubElement(content_types, f"{{{_CT_NS}}}Override", {
+                "PartName": part_name,
+                "ContentType": content_type
+            })
+        
+        for name, element in (
+            ("[Content_Types].xml", content_types),
+            ("ppt/presentation.xml", presentation),
+            ("ppt/_rels/presentation.xml.rels", rels)
+        ):
+            out.writestr(name, etree.tostring(element, xml_declaration=True, encoding="UTF-8", standalone=True))
     
     def _add_title_slide(
         self,
         prs: Presentation,
-        slide_data: SlideData,
+        slide_data: SlideRecord,
         theme_colors: dict
     ):
         """Add a title slide to the presentation."""
@@ -105,12 +548,7 @@ class SlideBuilder:
         fill.fore_color.rgb = theme_colors["background"]
         
         # Add title
-        left = Inches(1)
-        top = Inches(2.5)
-        width = Inches(8)
-        height = Inches(1.5)
-        
-        title_box = slide.shapes.add_textbox(left, top, width, height)
+        title_box = slide.shapes.add_textbox(*map(Inches, TITLE_SLIDE_TITLE))
         title_frame = title_box.text_frame
         title_frame.text = slide_data.title
         
@@ -123,22 +561,20 @@ class SlideBuilder:
         
         # Add subtitle if bullets exist
         if slide_data.bullets:
-            subtitle_text = " | ".join(slide_data.bullets[:3])
-            subtitle_box = slide.shapes.add_textbox(
-                Inches(1), Inches(4.5), Inches(8), Inches(0.8)
-            )
+            subtitle_text = " | ".join(slide_data.bullets[:SUBTITLE_BULLETS])
+            subtitle_box = slide.shapes.add_textbox(*map(Inches, TITLE_SLIDE_SUBTITLE))
             subtitle_frame = subtitle_box.text_frame
             subtitle_frame.text = subtitle_text
             
             subtitle_para = subtitle_frame.paragraphs[0]
             subtitle_para.alignment = PP_ALIGN.CENTER
-            subtitle_para.font.size = Pt(20)
+            subtitle_para.font.size = Pt(SUBTITLE_SIZE)
             subtitle_para.font.color.rgb = theme_colors["text_color"]
     
     def _add_content_slide(
         self,
         prs: Presentation,
-        slide_data: SlideData,
+        slide_data: SlideRecord,
         theme_colors: dict
     ):
         """Add a content slide to the presentation."""
@@ -153,37 +589,16 @@ class SlideBuilder:
         # Check if we have an image to add
         has_image = slide_data.image_path and os.path.exists(slide_data.image_path)
         
-        # Adjust layout based on whether we have an image
+        # Two columns with an image on the right, else full-width bullets
+        boxes = content_boxes(has_image)
         if has_image:
-            # Two-column layout: content on left, image on right
-            content_left = Inches(0.5)
-            content_width = Inches(5)
-            
-            # Add image on the right side
-            img_left = Inches(6)
-            img_top = Inches(2)
-            img_width = Inches(3.5)
-            img_height = Inches(4.5)
-            
             try:
-                slide.shapes.add_picture(
-                    slide_data.image_path,
-                    img_left,
-                    img_top,
-                    width=img_width,
-                    height=img_height
-                )
+                slide.shapes.add_picture(slide_data.image_path, *map(Inches, boxes["image"]))
             except Exception as e:
-                print(f"Error adding image to slide: {e}")
-        else:
-            # Full-width layout when no image
-            content_left = Inches(0.8)
-            content_width = Inches(8.5)
+                logger.warning("Error adding image to slide: %s", e)
         
         # Add title
-        title_box = slide.shapes.add_textbox(
-            Inches(0.5), Inches(0.5), Inches(9), Inches(0.8)
-        )
+        title_box = slide.shapes.add_textbox(*map(Inches, CONTENT_TITLE))
         title_frame = title_box.text_frame
         title_frame.text = slide_data.title
         
@@ -194,9 +609,7 @@ class SlideBuilder:
         
         # Add bullets
         if slide_data.bullets:
-            bullet_box = slide.shapes.add_textbox(
-                content_left, Inches(1.8), content_width, Inches(4.5)
-            )
+            bullet_box = slide.shapes.add_textbox(*map(Inches, boxes["bullets"]))
             text_frame = bullet_box.text_frame
             text_frame.word_wrap = True
             
@@ -209,7 +622,7 @@ class SlideBuilder:
                 para.level = 0
                 para.font.size = Pt(theme_colors.get("bullet_size", 20))
                 para.font.color.rgb = theme_colors["text_color"]
-                para.space_before = Pt(12)
+                para.space_before = Pt(BULLET_SPACE_BEFORE)
         
         # Add speaker notes if present
         if slide_data.speaker_notes:
@@ -217,43 +630,122 @@ class SlideBuilder:
             text_frame = notes_slide.notes_text_frame
             text_frame.text = slide_data.speaker_notes
     
-    async def export_to_pdf(self, pptx_path: str) -> Optional[str]:
+    def pdf_stream(self, output_dir: str, theme: str = "professional") -> Optional[PdfStream]:
+        """
+        Start a PDF that build_deck_streaming() adds pages to as it builds.
+        
+        Args:
+            output_dir: Directory the deck is saved to
+            theme: Visual theme the deck is built with
+        
+        Returns:
+            The open PDF, or None when PDF_RENDERER is "libreoffice"
+        """
+        if self.pdf_renderer is None:
+            return None
+        return self.pdf_renderer.stream(self.themes.get(theme, self.themes["professional"]), output_dir)
+    
+    async def export_to_pdf(
+        self,
+        pptx_path: str,
+        slides: Optional[List[SlideRecord]] = None,
+        theme: str = "professional",
+        pdf: Optional[PdfStream] = None
+    ) -> Optional[str]:
         """
         Export presentation to PDF.
         
-        Note: This requires LibreOffice or PowerPoint to be installed.
-        Alternatively, use a PDF conversion library.
+        With the deck's slides, or the PDF its streaming build wrote pages
+        to, the PDF is rendered from them directly (see PdfRenderer),
+        unless PDF_RENDERER is "libreoffice". Otherwise, or if rendering
+        fails (e.g. on text the built-in fonts cannot draw), the PPTX
+        file is converted with LibreOffice.
         
         Args:
             pptx_path: Path to PPTX file
-            
+            slides: Slides the deck was built from, if they are still held
+            theme: Visual theme the deck was built with
+            pdf: PDF the deck's streaming build added its pages to
+        
         Returns:
             Path to PDF file or None if export failed
         """
+        pdf_path = pptx_path.replace('.pptx', '.pdf')
+        if pdf is not None:
+            # The pages are written already; only the document's index is left
+            with stage("export_to_pdf", renderer="native"):
+                try:
+                    return await asyncio.to_thread(pdf.close, pdf_path)
+                except Exception as e:
+                    logger.warning("Native PDF rendering failed, trying LibreOffice: %s", e)
+        elif slides and self.pdf_renderer is not None:
+            check_deadline()
+            theme_colors = self.themes.get(theme, self.themes["professional"])
+            with stage("export_to_pdf", renderer="native"):
+                try:
+                    return await asyncio.to_thread(self.pdf_renderer.render, slides, theme_colors, pdf_path)
+                except Exception as e:
+                    logger.warning("Native PDF rendering failed, trying LibreOffice: %s", e)
+        return await self._convert_with_libreoffice(pptx_path, pdf_path)
+    
+    async def _convert_with_libreoffice(self, pptx_path: str, pdf_path: str) -> Optional[str]:
+        """
+        Convert a PPTX file to PDF with LibreOffice, if it is installed.
+        
+        The conversion runs as a subprocess limited to PDF_EXPORT_TIMEOUT
+        seconds, or to the time left before the request deadline. It is
+        killed on timeout and when the request is cancelled.
+        
+        Args:
+            pptx_path: Path to PPTX file
+            pdf_path: Path LibreOffice writes the PDF to
+        
+        Returns:
+            Path to PDF file or None if export failed
+        """
+        with stage("export_to_pdf", renderer="libreoffice"):
+            try:
+                timeout = timeout_for(self.pdf_timeout)
+                process = await asyncio.create_subprocess_exec(
+                    'soffice',
+                    '--headless',
+                    '--convert-to', 'pdf',
+                    '--outdir', os.path.dirname(pptx_path),
+                    pptx_path,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    # soffice forks soffice.bin; a session of its own lets us kill both
+                    start_new_session=True
+                )
+                try:
+                    await asyncio.wait_for(process.communicate(), timeout)
+                except BaseException:
+                    # Timed out or cancelled: nobody will read this PDF
+                    await self._kill_process_group(process)
+                    raise
+                
+                if process.returncode == 0 and os.path.exists(pdf_path):
+                    return pdf_path
+                else:
+                    logger.warning("PDF export failed: LibreOffice not available or conversion error")
+                    return None
+                
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                logger.warning("PDF export error: %s", e)
+                return None
+    
+    @staticmethod
+    async def _kill_process_group(process: asyncio.subprocess.Process):
+        """Kill a subprocess started in its own session, with its children."""
+        if process.returncode is not None:
+            return
         try:
-            # Try using LibreOffice for conversion
-            pdf_path = pptx_path.replace('.pptx', '.pdf')
-            
-            # This is a placeholder - actual implementation would need:
-            # - LibreOffice headless mode
-            # - Or a Python PDF library
-            # - Or a cloud conversion service
-            
-            import subprocess
-            result = subprocess.run([
-                'soffice',
-                '--headless',
-                '--convert-to', 'pdf',
-                '--outdir', os.path.dirname(pptx_path),
-                pptx_path
-            ], capture_output=True, timeout=30)
-            
-            if result.returncode == 0 and os.path.exists(pdf_path):
-                return pdf_path
+            if hasattr(os, "killpg"):
+                os.killpg(process.pid, signal.SIGKILL)
             else:
-                print("PDF export failed: LibreOffice not available or conversion error")
-                return None
-                
-        except Exception as e:
-            print(f"PDF export error: {e}")
-            return None
+                process.kill()
+        except ProcessLookupError:
+            pass
+        await process.wait()
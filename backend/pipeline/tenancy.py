@@ -0,0 +1,26 @@
+"""
+Tenancy Module
+The tenant a request is served for, propagated through the request context.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+
+_current_tenant: ContextVar[Optional[str]] = ContextVar("tenant", default=None)
+
+
+@contextmanager
+def tenant_context(tenant: Optional[str]):
+    """Make `tenant` (None for anonymous requests) the tenant of the current request."""
+    token = _current_tenant.set(tenant or None)
+    try:
+        yield tenant
+    finally:
+        _current_tenant.reset(token)
+
+
+def current_tenant() -> Optional[str]:
+    """The tenant of the request being served, or None if anonymous."""
+    return _current_tenant.get()
@@ -0,0 +1,168 @@
+"""
+Upload Reader Module
+Streams uploaded source documents line by line with a size cap.
+"""
+
+import os
+import codecs
+from typing import AsyncIterator, List, Optional
+from python_multipart import MultipartParser
+from python_multipart.multipart import parse_options_header
+from starlette.requests import Request
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload exceeds the configured size cap."""
+
+
+class UnsupportedUpload(ValueError):
+    """Raised when an upload is not a multipart .txt/.md file."""
+
+
+class MalformedUpload(ValueError):
+    """Raised when an upload's request headers are malformed, e.g. its Content-Length."""
+
+
+class UploadReader:
+    """
+    Reads a multipart/form-data upload incrementally.
+    
+    The request body is pushed through a streaming multipart parser as it
+    arrives, and the file part is decoded and split into lines on the fly,
+    so neither the body nor the file is ever buffered whole. Uploads over
+    the size cap are rejected from the Content-Length header when present,
+    and otherwise as soon as the cap is crossed.
+    """
+    
+    allowed_extensions = (".txt", ".md", ".markdown")
+    
+    def __init__(self):
+        """Initialize the reader with the configured size cap."""
+        self.max_bytes = int(os.getenv("MAX_UPLOAD_BYTES", str(5 * 1024 * 1024)))
+        # Allowance for multipart boundaries and part headers
+        self.envelope_bytes = 16 * 1024
+    
+    async def iter_lines(self, request: Request) -> AsyncIterator[str]:
+        """
+        Yield the lines of the uploaded file as the body streams in.
+        
+        Args:
+            request: Incoming request with a multipart/form-data body
+        
+        Yields:
+            Lines of the uploaded file, without line terminators
+        
+        Raises:
+            UploadTooLarge: If the file exceeds MAX_UPLOAD_BYTES
+            UnsupportedUpload: If the body is not a multipart .txt/.md upload
+            MalformedUpload: If the Content-Length header is not a byte count
+        """
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        boundary = params.get(b"boundary")
+        if content_type != b"multipart/form-data" or not boundary:
+            raise UnsupportedUpload("Expected a multipart/form-data upload")
+        
+        content_length = request.headers.get("content-length")
+        if content_length is not None:
+            # A length of ASCII digits only: int() would accept "-1", " 1" or "1_000"
+            if not (content_length.isascii() and content_length.isdigit()):
+                raise MalformedUpload(f"Invalid Content-Length header: {content_length!r}")
+            if int(content_length) > self.max_bytes + self.envelope_bytes:
+                raise UploadTooLarge(f"Upload exceeds the {self.max_bytes} byte limit")
+        
+        state = _PartState()
+        parser = MultipartParser(boundary, state.callbacks())
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        pending = ""
+        
+        async for chunk in request.stream():
+            parser.write(chunk)
+            
+            if state.error:
+                raise UnsupportedUpload(state.error)
+            if state.file_bytes > self.max_bytes:
+                raise UploadTooLarge(f"Upload exceeds the {self.max_bytes} byte limit")
+            
+            if state.data:
+                text = pending + decoder.decode(b"".join(state.data))
+                state.data.clear()
+                lines = text.split("\n")
+                pending = lines.pop()
+                for line in lines:
+                    yield line
+            
+            if state.file_done:
+                break
+        
+        if not state.file_seen:
+            raise UnsupportedUpload("No file part found in upload")
+        
+        pending += decoder.decode(b"", final=True)
+        if pending:
+            yield pending
+
+
+class _PartState:
+    """Callback state for the streaming multipart parser."""
+    
+    def __init__(self):
+        self.header_field = b""
+        self.header_value = b""
+        self.headers = {}
+        self.in_file = False
+        self.file_seen = False
+        self.file_done = False
+        self.file_bytes = 0
+        self.data: List[bytes] = []
+        self.error: Optional[str] = None
+    
+    def callbacks(self) -> dict:
+        """Callbacks for python_multipart.MultipartParser."""
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+    
+    def on_part_begin(self):
+        self.headers = {}
+    
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self.header_field += data[start:end]
+    
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self.header_value += data[start:end]
+    
+    def on_header_end(self):
+        self.headers[self.header_field.lower()] = self.header_value
+        self.header_field = b""
+        self.header_value = b""
+    
+    def on_headers_finished(self):
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+        # Only the first file part is read; other form fields are ignored
+        if filename is None or self.file_seen:
+            return
+        
+        name = filename.decode("utf-8", errors="replace").lower()
+        if not name.endswith(UploadReader.allowed_extensions):
+            self.error = f"Unsupported file type, expected one of {', '.join(UploadReader.allowed_extensions)}"
+            return
+        
+        self.in_file = True
+        self.file_seen = True
+    
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self.in_file:
+            self.file_bytes += end - start
+            self.data.append(data[start:end])
+    
+    def on_part_end(self):
+        if self.in_file:
+            self.in_file = False
+            self.file_done = True
@@ -0,0 +1,64 @@
+"""
+Preview Store Module
+Keeps the slide expansions of recent previews, so a re-preview only expands what changed.
+"""
+
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from models import SlideRecord
+
+
+class PreviewStore:
+    """
+    Remembers the complete slide expansions of recent previews by handle.
+    
+    A preview's handle is returned with it; a later preview of the edited
+    outline passes it back, and slides whose content hash is unchanged
+    reuse their expansion. The least recently used previews are forgotten
+    once more than `retained` are held. Handles are per process: with
+    several workers, a handle another worker issued just misses.
+    """
+    
+    def __init__(self, retained: int = 1000):
+        """
+        Initialize an empty store.
+        
+        Args:
+            retained: Previews remembered
+        """
+        self.retained = retained
+        self._previews: "OrderedDict[str, Dict[str, SlideRecord]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._previews)
+    
+    def get(self, preview_id: Optional[str]) -> Dict[str, SlideRecord]:
+        """A copy of the expansions of a preview by slide key (empty if unknown or forgotten)."""
+        if not preview_id:
+            return {}
+        with self._lock:
+            expansions = self._previews.get(preview_id)
+            if expansions is None:
+                return {}
+            self._previews.move_to_end(preview_id)
+            return dict(expansions)
+    
+    def put(self, expansions: Dict[str, SlideRecord]) -> str:
+        """
+        Remember the expansions of a preview.
+        
+        Args:
+            expansions: Complete expansions of its slides by slide key
+        
+        Returns:
+            The handle of the preview
+        """
+        preview_id = uuid.uuid4().hex
+        with self._lock:
+            self._previews[preview_id] = expansions
+            while len(self._previews) > self.retained:
+                self._previews.popitem(last=False)
+        return preview_id
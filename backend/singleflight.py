@@ -0,0 +1,136 @@
+"""
+Single-Flight Module
+Coalesces identical concurrent requests onto one shared pipeline execution.
+"""
+
+import json
+import asyncio
+import hashlib
+import logging
+from typing import Awaitable, Callable, Dict, TypeVar
+from pydantic import BaseModel
+from telemetry import SINGLEFLIGHT_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Runs at most one execution per key at a time.
+    
+    The first caller for a key (the leader) starts the work as a task; callers
+    arriving while it runs (followers) await the same task and receive the
+    same result or exception. Each caller awaits through asyncio.shield, so a
+    caller that disconnects or is cancelled only stops waiting; the shared
+    work keeps running for everyone else, and is cancelled once the last
+    caller has gone.
+    """
+    
+    def __init__(self):
+        """Initialize with no work in flight."""
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self._deadlines: Dict[str, object] = {}
+    
+    def __len__(self) -> int:
+        return len(self._inflight)
+    
+    async def do(
+        self,
+        key: str,
+        work: Callable[[], Awaitable[T]],
+        endpoint: str = "",
+        deadline=None
+    ) -> T:
+        """
+        Run `work` for `key`, or join the execution already in flight.
+        
+        Args:
+            key: Identity of the request, e.g. from request_key()
+            work: Coroutine function performing the request
+            endpoint: Endpoint name for metrics
+            deadline: The caller's Deadline; the work runs under the leader's,
+                which followers extend to their own
+        
+        Returns:
+            The result of the shared execution
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            SINGLEFLIGHT_REQUESTS.labels(endpoint=endpoint, role="leader").inc()
+            # The task inherits the leader's context: request id, budget and deadline
+            task = asyncio.ensure_future(work())
+            self._inflight[key] = task
+            if deadline is not None:
+                self._deadlines[key] = deadline
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            SINGLEFLIGHT_REQUESTS.labels(endpoint=endpoint, role="follower").inc()
+            logger.info("Joined in-flight %s request %s", endpoint, key[:12])
+            shared = self._deadlines.get(key)
+            if shared is not None and deadline is not None:
+                shared.extend(deadline)
+        
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                # Nobody is left to receive the result
+                logger.info("Cancelling abandoned %s request %s", endpoint, key[:12])
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+    
+    def _finish(self, key: str, task: asyncio.Task):
+        """Forget a finished execution so the next request starts fresh work."""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            self._deadlines.pop(key, None)
+        # Mark the exception as retrieved even if every caller has gone away
+        if not task.cancelled():
+            task.exception()
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize input text for request keys.
+    
+    Line endings, trailing whitespace and surrounding blank lines do not
+    change the parsed outline, so they do not change the key. Indentation
+    does, so it is kept.
+    """
+    lines = [line.rstrip() for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    while lines and not lines[0]:
+        lines.pop(0)
+    while lines and not lines[-1]:
+        lines.pop()
+    return "\n".join(lines)
+
+
+def request_key(endpoint: str, request: BaseModel, **context) -> str:
+    """
+    Hash a request into a single-flight key.
+    
+    Args:
+        endpoint: Endpoint name; previews and generations never share work
+        request: Request model with input_text and options
+        **context: Other inputs that change the result, e.g. the slide limit
+    
+    Returns:
+        Hex digest identifying the request
+    """
+    fields = request.model_dump()
+    payload = {
+        "endpoint": endpoint,
+        "input_text": normalize_text(fields.pop("input_text", "")),
+        "options": fields,
+        "context": context,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
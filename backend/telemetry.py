@@ -0,0 +1,607 @@
+"""
+Telemetry Module
+Prometheus-style metrics, request-scoped tracing spans and logging setup.
+"""
+
+import os
+import json
+import time
+import queue
+import uuid
+import bisect
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# Latency buckets in seconds, from fast parser stages up to slow LLM/image calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _CounterValue:
+    """A single labelled counter or gauge value."""
+    
+    __slots__ = ("value", "_lock")
+    
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+    
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+    
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+
+class _HistogramValue:
+    """A single labelled histogram: cumulative buckets, sum and count."""
+    
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+    
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Metric:
+    """
+    Base class for metrics with an optional fixed set of label names.
+    
+    Values are created per label combination on first use and are safe to
+    update from worker threads.
+    """
+    
+    kind = "untyped"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional["Registry"] = None
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+    
+    def labels(self, **labels):
+        """Return the value for a label combination, creating it if needed."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        value = self._values.get(key)
+        if value is None:
+            with self._lock:
+                value = self._values.setdefault(key, self._new_value())
+        return value
+    
+    def _new_value(self):
+        raise NotImplementedError
+    
+    def collect(self) -> Iterator[str]:
+        """Yield the metric in the Prometheus text exposition format."""
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for key, value in sorted(self._values.items()):
+            yield from self._samples(dict(zip(self.labelnames, key)), value)
+    
+    def _samples(self, labels: Dict[str, str], value) -> Iterator[str]:
+        yield f"{self.name}{_format_labels(labels)} {_format_number(value.value)}"
+
+
+class Counter(Metric):
+    """A monotonically increasing count."""
+    
+    kind = "counter"
+    
+    def _new_value(self):
+        return _CounterValue()
+    
+    def inc(self, amount: float = 1.0):
+        """Increment an unlabelled counter."""
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    """A value that can go up and down."""
+    
+    kind = "gauge"
+    
+    def _new_value(self):
+        return _CounterValue()
+    
+    def inc(self, amount: float = 1.0):
+        """Increment an unlabelled gauge."""
+        self.labels().inc(amount)
+    
+    def dec(self, amount: float = 1.0):
+        """Decrement an unlabelled gauge."""
+        self.labels().dec(amount)
+
+
+class Histogram(Metric):
+    """A distribution of observations in cumulative buckets."""
+    
+    kind = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        registry: Optional["Registry"] = None
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+    
+    def _new_value(self):
+        return _HistogramValue(self.buckets)
+    
+    def observe(self, value: float):
+        """Record an observation on an unlabelled histogram."""
+        self.labels().observe(value)
+    
+    def _samples(self, labels: Dict[str, str], value) -> Iterator[str]:
+        with value._lock:
+            counts = list(value.counts)
+            total, count = value.sum, value.count
+        
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            bucket_labels = dict(labels, le=_format_number(bound))
+            yield f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}"
+        yield f"{self.name}_bucket{_format_labels(dict(labels, le='+Inf'))} {count}"
+        yield f"{self.name}_sum{_format_labels(labels)} {_format_number(total)}"
+        yield f"{self.name}_count{_format_labels(labels)} {count}"
+
+
+class Registry:
+    """A collection of metrics rendered together by the /metrics endpoint."""
+    
+    def __init__(self):
+        self._metrics: List[Metric] = []
+    
+    def register(self, metric: Metric):
+        self._metrics.append(metric)
+    
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = (f'{name}="{_escape_label(value)}"' for name, value in labels.items())
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_number(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_REQUEST_DURATION = Histogram(
+    "prompt2deck_http_request_duration_seconds",
+    "HTTP request latency by route and status code.",
+    ("method", "route", "status")
+)
+STAGE_DURATION = Histogram(
+    "prompt2deck_stage_duration_seconds",
+    "Latency of pipeline stages.",
+    ("stage",)
+)
+LLM_CALL_DURATION = Histogram(
+    "prompt2deck_llm_call_duration_seconds",
+    "Latency of individual LLM and image API calls.",
+    ("task", "model", "outcome")
+)
+LLM_TOKENS = Counter(
+    "prompt2deck_llm_tokens_total",
+    "Tokens reported by the LLM API, by task and prompt/completion.",
+    ("task", "model", "kind")
+)
+CACHE_HITS = Counter(
+    "prompt2deck_cache_hits_total",
+    "Cache lookups answered from the cache.",
+    ("cache",)
+)
+CACHE_MISSES = Counter(
+    "prompt2deck_cache_misses_total",
+    "Cache lookups that had to compute a result.",
+    ("cache",)
+)
+SEMANTIC_CACHE_SIMILARITY = Histogram(
+    "prompt2deck_semantic_cache_similarity",
+    "Cosine similarity of the nearest semantic cache entry per lookup (tunes SEMANTIC_CACHE_THRESHOLD).",
+    buckets=(0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.93, 0.96, 0.98, 0.99, 1.0)
+)
+MOCK_FALLBACKS = Counter(
+    "prompt2deck_mock_fallbacks_total",
+    "Results produced by mock/placeholder fallbacks instead of the API.",
+    ("component", "reason")
+)
+IMAGE_BYTES = Counter(
+    "prompt2deck_image_bytes_total",
+    "Bytes of generated images downloaded.",
+    ("source",)
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "prompt2deck_requests_in_flight",
+    "HTTP requests currently being served."
+)
+QUEUE_DEPTH = Gauge(
+    "prompt2deck_queue_depth",
+    "Work items waiting for a concurrency slot or worker.",
+    ("queue",)
+)
+SINGLEFLIGHT_REQUESTS = Counter(
+    "prompt2deck_singleflight_requests_total",
+    "Requests that started shared work (leader) or joined in-flight work (follower).",
+    ("endpoint", "role")
+)
+REQUESTS_CANCELLED = Counter(
+    "prompt2deck_requests_cancelled_total",
+    "Requests whose work was cancelled, by endpoint and reason (deadline or disconnect).",
+    ("endpoint", "reason")
+)
+DEGRADED_SLIDES = Counter(
+    "prompt2deck_degraded_slides_total",
+    "Slides delivered with fallback content to meet an SLA, by endpoint.",
+    ("endpoint",)
+)
+DECK_UPGRADES = Counter(
+    "prompt2deck_deck_upgrades_total",
+    "Background deck upgrades finished, by outcome (done or failed).",
+    ("status",)
+)
+SCHEDULER_WAIT = Histogram(
+    "prompt2deck_scheduler_wait_seconds",
+    "Time outbound LLM/image calls waited for a scheduler slot, by priority class.",
+    ("priority",)
+)
+CHECKPOINT_ITEMS = Counter(
+    "prompt2deck_checkpoint_items_total",
+    "Generation work items checkpointed (saved) or skipped on resume (restored), by stage.",
+    ("stage", "outcome")
+)
+CHECKPOINT_LOAD_DURATION = Histogram(
+    "prompt2deck_checkpoint_load_seconds",
+    "Time to load a job's checkpoints when it starts or resumes."
+)
+MODEL_ROUTES = Counter(
+    "prompt2deck_model_routes_total",
+    "LLM calls routed per task to a model (primary, fallback or probe of a slow primary).",
+    ("task", "model", "route")
+)
+MODEL_LATENCY_P95 = Gauge(
+    "prompt2deck_model_latency_p95_seconds",
+    "Rolling p95 latency of LLM calls per model, as used for routing.",
+    ("model",)
+)
+
+
+@asynccontextmanager
+async def queued(semaphore: asyncio.Semaphore, queue: str):
+    """Acquire a semaphore, counting the wait in the queue depth gauge."""
+    depth = QUEUE_DEPTH.labels(queue=queue)
+    depth.inc()
+    try:
+        await semaphore.acquire()
+    finally:
+        depth.dec()
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+# --- Tracing -----------------------------------------------------------------
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed unit of work within a request."""
+    
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id",
+        "attributes", "start_time", "duration", "status"
+    )
+    
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_time = time.time()
+        self.duration = 0.0
+        self.status = "ok"
+    
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+    
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter:
+    """Receives finished spans. The base exporter discards them."""
+    
+    def export(self, span: Span):
+        pass
+    
+    def close(self):
+        """Flush buffered spans and release resources."""
+
+
+class LogSpanExporter(SpanExporter):
+    """Writes finished spans to the "prompt2deck.trace" logger."""
+    
+    def __init__(self):
+        self.logger = logging.getLogger("prompt2deck.trace")
+    
+    def export(self, span: Span):
+        self.logger.info(
+            "span %s %.1fms %s %s",
+            span.name, span.duration * 1000, span.status, span.attributes
+        )
+
+
+class JsonlSpanExporter(SpanExporter):
+    """
+    Appends finished spans as JSON lines to a local file.
+    
+    export() only queues the span, so it never blocks the event loop on
+    disk I/O. A daemon writer thread keeps the file open, serializes each
+    batch of queued spans and flushes it with a single write.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.SimpleQueue[Optional[Span]]" = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+    
+    def export(self, span: Span):
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="span-writer", daemon=True)
+                    self._writer.start()
+        self._queue.put(span)
+    
+    def close(self):
+        """Write out the queued spans and stop the writer thread."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put(None)
+            writer.join()
+    
+    def _write_loop(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                batch = [self._queue.get()]
+                # Drain whatever else is already queued into the same write
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                spans = [span for span in batch if span is not None]
+                if spans:
+                    f.write("".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans))
+                    f.flush()
+                if len(spans) < len(batch):
+                    return
+
+
+class InMemorySpanExporter(SpanExporter):
+    """Keeps finished spans in memory, for tests and benchmarks."""
+    
+    def __init__(self):
+        self.spans: List[Span] = []
+    
+    def export(self, span: Span):
+        self.spans.append(span)
+
+
+def exporter_from_env() -> SpanExporter:
+    """Build the span exporter selected by TRACE_EXPORTER (none, log or jsonl)."""
+    kind = os.getenv("TRACE_EXPORTER", "none").lower()
+    if kind == "log":
+        return LogSpanExporter()
+    if kind == "jsonl":
+        return JsonlSpanExporter(os.getenv("TRACE_FILE", "traces.jsonl"))
+    return SpanExporter()
+
+
+_exporter: SpanExporter = exporter_from_env()
+
+
+def set_span_exporter(exporter: SpanExporter) -> SpanExporter:
+    """Install a span exporter and return the previous one."""
+    global _exporter
+    previous, _exporter = _exporter, exporter
+    return previous
+
+
+def close_span_exporter():
+    """Flush and close the installed span exporter, e.g. on shutdown."""
+    _exporter.close()
+
+
+def current_request_id() -> Optional[str]:
+    """The id of the request being served, if any."""
+    return _request_id.get()
+
+
+@contextmanager
+def request_context(request_id: Optional[str] = None):
+    """
+    Bind a request id to the current context.
+    
+    Spans and log records created inside the block (including in tasks it
+    spawns) carry this id.
+    """
+    request_id = request_id or uuid.uuid4().hex
+    token = _request_id.set(request_id)
+    try:
+        yield request_id
+    finally:
+        _request_id.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block of work as a child of the current span.
+    
+    Args:
+        name: Span name, e.g. "expand_slides" or "llm.bullets"
+        **attributes: Attributes recorded on the span
+    
+    Yields:
+        The active Span, for adding attributes
+    """
+    parent = _current_span.get()
+    trace_id = _request_id.get() or (parent.trace_id if parent else uuid.uuid4().hex)
+    current = Span(name, trace_id, parent.span_id if parent else None, attributes)
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        _current_span.reset(token)
+        _exporter.export(current)
+
+
+@contextmanager
+def stage(name: str, **attributes):
+    """A span that is also recorded in the per-stage latency histogram."""
+    start = time.perf_counter()
+    try:
+        with span(name, **attributes) as current:
+            yield current
+    finally:
+        STAGE_DURATION.labels(stage=name).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def llm_call(task: str, model: str):
+    """A span for one LLM/image API call, recorded in the call latency histogram."""
+    with span(f"llm.{task}", model=model) as current:
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            yield current
+            outcome = "ok"
+        finally:
+            LLM_CALL_DURATION.labels(task=task, model=model, outcome=outcome).observe(
+                time.perf_counter() - start
+            )
+
+
+def record_usage(task: str, model: str, response, current: Optional[Span] = None):
+    """Count the tokens reported on a chat completion response."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    LLM_TOKENS.labels(task=task, model=model, kind="prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(task=task, model=model, kind="completion").inc(completion_tokens)
+    if current is not None:
+        current.set_attribute("prompt_tokens", prompt_tokens)
+        current.set_attribute("completion_tokens", completion_tokens)
+
+
+async def traced_completion(client, task: str, **kwargs):
+    """
+    Create a chat completion inside an LLM span and record its token usage.
+    
+    Args:
+        client: AsyncOpenAI client
+        task: Task label, e.g. "bullets", "speaker_notes", "summary"
+        **kwargs: Arguments for client.chat.completions.create
+    
+    Returns:
+        The chat completion response
+    """
+    model = kwargs.get("model", "")
+    with llm_call(task, model) as current:
+        response = await client.chat.completions.create(**kwargs)
+        record_usage(task, model, response, current)
+        return response
+
+
+# --- Logging -----------------------------------------------------------------
+
+class RequestIdFilter(logging.Filter):
+    """Adds the current request id to log records as %(request_id)s."""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get() or "-"
+        return True
+
+
+def configure_logging():
+    """Configure root logging with request ids, at LOG_LEVEL (default INFO)."""
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"
+    )
+    for handler in logging.getLogger().handlers:
+        if not any(isinstance(f, RequestIdFilter) for f in handler.filters):
+            handler.addFilter(RequestIdFilter())
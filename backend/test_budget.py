@@ -0,0 +1,107 @@
+"""
+Request budget tests: calls shrink to each slide's share of the token
+budget, optional stages are dropped as it runs low, and slides keep their
+outline once it is spent.
+
+Run with: python -m pytest test_budget.py
+"""
+
+import asyncio
+from loadtest import SimulatedLLM
+from models import SlideRecord
+from pipeline.budget import RequestBudget, budget_context
+from pipeline.content_generator import ContentGenerator
+
+SLIDES = 5
+
+
+class _RecordingLLM(SimulatedLLM):
+    """An instant simulated LLM that records the max_tokens of every call (each costs 120 + up to 80 tokens)."""
+    
+    def __init__(self):
+        super().__init__(median_seconds=0.0)
+        self.max_tokens = []
+    
+    async def _create(self, **kwargs):
+        self.max_tokens.append(kwargs["max_tokens"])
+        return await super()._create(**kwargs)
+
+
+def _expand(budget: RequestBudget):
+    """Expand SLIDES outline slides one at a time under a budget; returns the slides and the client."""
+    generator = ContentGenerator()
+    generator.client, generator.use_mock, generator.semantic_cache = _RecordingLLM(), False, None
+    generator.concurrency = 1
+    slides = [SlideRecord(title=f"Topic {i}", bullets=[f"Outline point {i}"]) for i in range(SLIDES)]
+    
+    async def run():
+        with budget_context(budget):
+            return await generator.expand_slides(slides, include_speaker_notes=True)
+    
+    return asyncio.run(run()), generator.client
+
+
+def test_output_limit_is_the_slide_share_with_a_floor():
+    budget = RequestBudget(max_tokens=6000)
+    budget.expect_slides(5)
+    budget.begin_slide("First")
+    # 6000 tokens over 5 slides, a sixth of the share per call
+    assert budget.output_limit(300) == 200
+    assert budget.output_limit(100) == 100
+    
+    small = RequestBudget(max_tokens=600)
+    small.expect_slides(5)
+    small.begin_slide("First")
+    assert small.output_limit(300) == small.min_output_tokens == 32
+    
+    assert RequestBudget().output_limit(300) == 300
+
+
+def test_calls_are_shrunk_to_the_slide_share():
+    budget = RequestBudget(max_tokens=60_000)
+    expanded, client = _expand(budget)
+    
+    # 12 000 tokens per slide: every stage runs, at its full max_tokens
+    assert len(client.max_tokens) == 3 * SLIDES
+    assert client.max_tokens[:3] == [300, 200, 100]
+    assert all(slide.speaker_notes and slide.image_prompt for slide in expanded)
+    
+    tight = RequestBudget(max_tokens=3000)
+    _, client = _expand(tight)
+    assert client.max_tokens[0] == 3000 // SLIDES // 6 == 100
+
+
+def test_optional_stages_are_skipped_when_the_share_is_small():
+    # Even the last slide, with all that is left, has less than 600 tokens
+    budget = RequestBudget(max_tokens=1200)
+    expanded, client = _expand(budget)
+    
+    assert len(client.max_tokens) == SLIDES
+    assert all(slide.speaker_notes is None and slide.image_prompt is None for slide in expanded)
+    assert budget.skipped == {"speaker_notes": SLIDES, "image_prompt": SLIDES}
+    assert not budget.exhausted
+
+
+def test_optional_stages_are_skipped_when_time_runs_low():
+    budget = RequestBudget(max_seconds=100)
+    # Less than a quarter of the time budget is left
+    budget.started_at -= 80
+    expanded, client = _expand(budget)
+    
+    assert len(client.max_tokens) == SLIDES
+    assert all(slide.speaker_notes is None and slide.image_prompt is None for slide in expanded)
+    assert budget.skipped == {"speaker_notes": SLIDES, "image_prompt": SLIDES}
+
+
+def test_slides_keep_their_outline_once_the_budget_is_spent():
+    # The first bullets call alone costs more than the budget
+    budget = RequestBudget(max_tokens=100)
+    expanded, client = _expand(budget)
+    
+    assert len(client.max_tokens) == 1
+    assert budget.exhausted
+    for i, slide in enumerate(expanded[1:], start=1):
+        assert slide.bullets == [f"Outline point {i}"]
+        assert slide.image_prompt is None
+    assert budget.skipped["bullets"] == SLIDES - 1
+    assert budget.report().llm_calls == 1
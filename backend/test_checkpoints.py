@@ -0,0 +1,157 @@
+"""
+Checkpoint tests: a job killed halfway resumes from its committed work.
+
+Run with: python -m pytest test_checkpoints.py
+"""
+
+import os
+
+# No API key: the content generator's client is set by the tests that need one
+os.environ["OPENAI_API_KEY"] = ""
+os.environ.setdefault("PREWARM_ON_STARTUP", "false")
+
+import asyncio
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+from dataclasses import asdict
+import httpx
+from PIL import Image
+import main
+from loadtest import SimulatedLLM
+from models import SlideRecord
+from pipeline.checkpoints import CheckpointStore
+from pipeline.content_generator import ContentGenerator
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SLIDES = 20
+
+# Expands SLIDES slides one at a time under job "job-1", checkpointing each
+_EXPAND_JOB = """
+import asyncio, sys
+from dataclasses import asdict
+from loadtest import SimulatedLLM
+from models import SlideRecord
+from pipeline.checkpoints import CheckpointStore
+from pipeline.content_generator import ContentGenerator
+
+async def run():
+    store = CheckpointStore(sys.argv[1])
+    checkpoint = await asyncio.to_thread(store.open_job, "job-1", "fingerprint")
+    generator = ContentGenerator()
+    generator.client, generator.use_mock, generator.concurrency = SimulatedLLM(0.05, sigma=0.0), False, 1
+    slides = [SlideRecord(title=f"Slide {i}", bullets=["Point"]) for i in range(int(sys.argv[2]))]
+    memo = checkpoint.memo("expand", decode=lambda slide: SlideRecord(**slide), encode=asdict)
+    await generator.expand_slides(slides, include_speaker_notes=False, expansions=memo)
+    await checkpoint.flush()
+
+asyncio.run(run())
+"""
+
+
+def _saved(path: str) -> int:
+    try:
+        with sqlite3.connect(path) as connection:
+            return connection.execute("SELECT COUNT(*) FROM items WHERE stage = 'expand'").fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+
+
+class _CountingLLM(SimulatedLLM):
+    """An instant simulated LLM that counts the calls made to it."""
+    
+    def __init__(self):
+        super().__init__(median_seconds=0.0)
+        self.calls = 0
+    
+    async def _create(self, **kwargs):
+        self.calls += 1
+        return await super()._create(**kwargs)
+
+
+def test_killed_job_resumes_from_committed_work(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite3")
+    env = dict(os.environ, OPENAI_API_KEY="", PREWARM_ON_STARTUP="false")
+    worker = subprocess.Popen([sys.executable, "-c", _EXPAND_JOB, path, str(SLIDES)], cwd=BACKEND_DIR, env=env)
+    try:
+        deadline = time.monotonic() + 30
+        while _saved(path) < 3 and time.monotonic() < deadline and worker.poll() is None:
+            time.sleep(0.02)
+    finally:
+        # The worker dies without any chance to clean up
+        worker.send_signal(signal.SIGKILL)
+        worker.wait()
+    saved = _saved(path)
+    assert 3 <= saved < SLIDES
+    
+    async def resume():
+        checkpoint = await asyncio.to_thread(CheckpointStore(path).open_job, "job-1", "fingerprint")
+        generator = ContentGenerator()
+        generator.client, generator.use_mock = _CountingLLM(), False
+        slides = [SlideRecord(title=f"Slide {i}", bullets=["Point"]) for i in range(SLIDES)]
+        memo = checkpoint.memo("expand", decode=lambda slide: SlideRecord(**slide), encode=asdict)
+        expanded = await generator.expand_slides(slides, include_speaker_notes=False, expansions=memo)
+        await checkpoint.flush()
+        return checkpoint, generator.client.calls, expanded
+    
+    checkpoint, calls, expanded = asyncio.run(resume())
+    assert checkpoint.resumed
+    assert checkpoint.restored == {"expand": saved}
+    assert checkpoint.computed == {"expand": SLIDES - saved}
+    # Bullets and an image prompt for each slide that was not committed
+    assert calls == 2 * (SLIDES - saved)
+    assert [slide.title for slide in expanded] == [f"Slide {i}" for i in range(SLIDES)]
+    assert _saved(path) == SLIDES
+
+
+def test_missing_image_file_is_not_restored(tmp_path):
+    image_path = str(tmp_path / "kept.png")
+    Image.new("RGB", (8, 8)).save(image_path)
+    
+    async def scenario():
+        store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+        checkpoint = await asyncio.to_thread(store.open_job, "job-1", "fingerprint")
+        memo = checkpoint.memo("image")
+        memo["kept"] = image_path
+        memo["deleted"] = str(tmp_path / "deleted.png")
+        await checkpoint.flush()
+        
+        retried = await asyncio.to_thread(store.open_job, "job-1", "fingerprint")
+        memo = retried.memo("image", valid=os.path.exists)
+        return memo.get("kept"), memo.get("deleted"), retried.restored
+    
+    kept, deleted, restored = asyncio.run(scenario())
+    assert kept == image_path
+    assert deleted is None
+    assert restored == {"image": 1}
+
+
+def test_concurrent_jobs_are_each_checkpointed(tmp_path, monkeypatch):
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+    monkeypatch.setattr(main, "checkpoint_store", lambda: store)
+    monkeypatch.setattr(main, "OUTPUT_DIR", str(tmp_path))
+    generator = main.get_content_generator()
+    # Slow enough that the two requests are in flight together
+    monkeypatch.setattr(generator, "client", SimulatedLLM(0.2, sigma=0.0))
+    monkeypatch.setattr(generator, "use_mock", False)
+    body = {"input_text": "Checkpointed Deck\n* Alpha\n* Beta", "generate_images": False}
+    
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.post("/generate", json=body, headers={"X-Job-ID": job_id}, timeout=30)
+                for job_id in ("job-a", "job-b")
+            ))
+    
+    responses = asyncio.run(scenario())
+    assert [response.json()["checkpoint"]["job_id"] for response in responses] == ["job-a", "job-b"]
+    # Both jobs can be resumed: a retry under either id restores the deck
+    request = main.GenerateRequest(**body)
+    max_slides = main.get_outline_parser().slide_limit(None)
+    fingerprint = main.request_key("generate", request, max_slides=max_slides, tenant=None)
+    for job_id in ("job-a", "job-b"):
+        assert store.open_job(job_id, fingerprint).get("build") is not None
+
@@ -0,0 +1,138 @@
+"""
+Deadline and cancellation tests: work stops when its result is no longer
+wanted, whether the deadline passed or the client went away.
+
+Run with: python -m pytest test_deadlines.py
+"""
+
+import os
+
+# No API key: slides are expanded with fallback content, without network calls
+os.environ["OPENAI_API_KEY"] = ""
+os.environ.setdefault("PREWARM_ON_STARTUP", "false")
+
+import asyncio
+import time
+import pytest
+from fastapi.testclient import TestClient
+import main
+from loadtest import SimulatedLLM
+from telemetry import MOCK_FALLBACKS
+from pipeline.deadline import ClientDisconnected, Deadline, DeadlineExceeded, deadline_context
+from pipeline.document_summarizer import DocumentSummarizer
+from pipeline.slide_builder import SlideBuilder
+
+
+class _Pipeline:
+    """A stage that never finishes on its own and records being cancelled."""
+    
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.cancelled = False
+    
+    async def __call__(self, *args, **kwargs):
+        self.started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+class _DisconnectingRequest:
+    """Stands in for a Request whose client disconnects once `gone` is set."""
+    
+    def __init__(self):
+        self.gone = asyncio.Event()
+    
+    async def receive(self):
+        await self.gone.wait()
+        return {"type": "http.disconnect"}
+
+
+def test_client_disconnect_cancels_the_pipeline():
+    async def scenario():
+        pipeline, request = _Pipeline(), _DisconnectingRequest()
+        serving = asyncio.ensure_future(main._serve(request, "preview", Deadline(), pipeline()))
+        await pipeline.started.wait()
+        request.gone.set()
+        with pytest.raises(ClientDisconnected):
+            await serving
+        return pipeline
+    
+    assert asyncio.run(scenario()).cancelled
+
+
+def test_expired_deadline_returns_504(monkeypatch):
+    pipeline = _Pipeline()
+    monkeypatch.setattr(main, "_preview_from_slides", pipeline)
+    with TestClient(main.app) as client:
+        start = time.monotonic()
+        response = client.post(
+            "/preview",
+            json={"input_text": "Deadline Deck\n* One\n* Two"},
+            headers={"X-Request-Timeout": "0.2"}
+        )
+        elapsed = time.monotonic() - start
+    assert response.status_code == 504
+    assert pipeline.cancelled
+    assert elapsed < 5
+
+
+def test_long_document_stops_at_its_deadline():
+    summarizer = DocumentSummarizer()
+    summarizer.client, summarizer.use_mock = SimulatedLLM(0.1, sigma=0.0), False
+    summarizer.chunk_tokens, summarizer.concurrency = 20, 1
+    # One chunk per paragraph: about 4 seconds of calls, one at a time
+    lines = [f"Paragraph {i} describes one finding of the annual report in some detail." for i in range(40)]
+    errors = MOCK_FALLBACKS.labels(component="document_summarizer", reason="error")
+    before = errors.value
+    
+    async def scenario():
+        with deadline_context(Deadline(0.3)):
+            await summarizer.summarize(lines)
+    
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(scenario())
+    assert time.monotonic() - start < 2
+    # Chunks past the deadline are not counted as failed calls
+    assert errors.value == before
+
+
+def _alive(pid: int) -> bool:
+    """Whether a process is running (a zombie waiting to be reaped is not)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+@pytest.mark.skipif(not hasattr(os, "killpg") or not os.path.isdir("/proc"), reason="needs POSIX process groups")
+def test_libreoffice_process_group_is_killed_on_timeout(tmp_path, monkeypatch):
+    # A fake soffice that, like the real one, forks a worker and waits on it
+    child_pid_file = tmp_path / "child.pid"
+    soffice = tmp_path / "soffice"
+    soffice.write_text(
+        "#!/bin/sh\n"
+        f"sleep 60 &\necho $! > {child_pid_file}\nwait\n"
+    )
+    soffice.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    
+    builder = SlideBuilder()
+    builder.pdf_timeout = 0.5
+    pptx_path = tmp_path / "deck.pptx"
+    pptx_path.write_bytes(b"")
+    
+    start = time.monotonic()
+    result = asyncio.run(builder._convert_with_libreoffice(str(pptx_path), str(tmp_path / "deck.pdf")))
+    assert result is None
+    assert time.monotonic() - start < 5
+    
+    child_pid = int(child_pid_file.read_text())
+    deadline = time.monotonic() + 2
+    while _alive(child_pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not _alive(child_pid)
@@ -0,0 +1,57 @@
+"""
+Large-deck tests: the streamed .pptx must load like a normally built one.
+
+Run with: python -m pytest test_large_deck.py
+"""
+
+import asyncio
+import zipfile
+from PIL import Image
+from pptx import Presentation
+from models import SlideRecord
+from pipeline.outline_parser import OutlineParser
+from pipeline.slide_builder import SlideBuilder
+
+
+def _slides(count: int, image_paths):
+    slides = [SlideRecord(title="Deck", bullets=["Subtitle"])]
+    for i in range(1, count):
+        slides.append(SlideRecord(
+            title=f"Slide {i}",
+            bullets=[f"Point {i}.{j}" for j in range(3)],
+            speaker_notes=f"Notes {i}",
+            image_path=image_paths[i % len(image_paths)]
+        ))
+    return slides
+
+
+def test_streamed_deck_reloads_with_every_slide(tmp_path):
+    image_paths = []
+    for color in ("red", "blue"):
+        path = tmp_path / f"{color}.png"
+        Image.new("RGB", (32, 32), color).save(path)
+        image_paths.append(str(path))
+    slides = _slides(23, image_paths)
+    
+    async def stream():
+        for slide in slides:
+            yield slide
+    
+    output_path = asyncio.run(SlideBuilder().build_deck_streaming(stream(), str(tmp_path), chunk_size=5))
+    
+    prs = Presentation(output_path)
+    assert len(prs.slides) == len(slides)
+    titles = [
+        next(shape for shape in slide.shapes if shape.has_text_frame).text_frame.text
+        for slide in prs.slides
+    ][1:]
+    assert titles == [slide.title for slide in slides[1:]]
+    assert prs.slides[7].notes_slide.notes_text_frame.text == "Notes 7"
+    with zipfile.ZipFile(output_path) as package:
+        # Each distinct picture is stored once however many chunks use it
+        assert len([name for name in package.namelist() if name.startswith("ppt/media/")]) == 2
+
+
+def test_malformed_tenant_limits_are_skipped():
+    limits = OutlineParser._parse_tenant_limits("acme=1000, trial = 10 ,broken=lots,=5,nolimit,zero=0,")
+    assert limits == {"acme": 1000, "trial": 10}
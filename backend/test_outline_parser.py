@@ -0,0 +1,41 @@
+"""
+Outline parser tests: list markers are stripped, prose that merely looks
+like one is kept whole.
+
+Run with: python -m pytest test_outline_parser.py
+"""
+
+import asyncio
+from pipeline.outline_parser import OutlineParser
+
+
+def _parse(text: str):
+    return asyncio.run(OutlineParser().parse(text))
+
+
+def test_leading_decimal_is_not_a_marker():
+    slides = _parse("\n".join(["3.5 million users signed up"] * 5))
+    assert [slide.title for slide in slides] == ["3.5 million users signed up"] * 5
+
+
+def test_lone_letter_abbreviation_is_not_a_marker():
+    slides = _parse("C. elegans research\n    Worm genetics\nMouse models\n    Knockouts")
+    assert [slide.title for slide in slides] == ["C. elegans research", "Mouse models"]
+
+
+def test_lettered_and_roman_lists_are_stripped():
+    slides = _parse(
+        "a. Alpha\n    i. One\n    ii. Two\n"
+        "b. Beta\n    (i) Three\n    (ii) Four\n"
+        "c. Gamma"
+    )
+    assert [slide.title for slide in slides] == ["Alpha", "Beta", "Gamma"]
+    assert slides[0].bullets == ["One", "Two"]
+    assert slides[1].bullets == ["Three", "Four"]
+
+
+def test_dotted_and_parenthesized_numbers_are_stripped():
+    slides = _parse("1. Alpha\n    1.1. First\n    1.2) Second\n(2) Beta\n    (3) Gamma")
+    assert [slide.title for slide in slides] == ["Alpha", "Beta"]
+    assert slides[0].bullets == ["First", "Second"]
+    assert slides[1].bullets == ["Gamma"]
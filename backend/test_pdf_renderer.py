@@ -0,0 +1,119 @@
+"""
+PDF renderer tests: the produced file is read back, page by page, through
+its cross-reference table.
+
+Run with: python -m pytest test_pdf_renderer.py
+"""
+
+import os
+import re
+import zlib
+import asyncio
+import pytest
+from PIL import Image
+from models import SlideRecord
+from pipeline.pdf_renderer import PdfRenderer, UnsupportedText
+from pipeline.slide_builder import SlideBuilder
+
+
+def _read_pdf(path):
+    """The text drawn on every page of a PDF, and its objects, found through the xref table."""
+    with open(path, "rb") as f:
+        data = f.read()
+    xref = int(re.search(rb"startxref\n(\d+)", data).group(1))
+    count = int(re.match(rb"xref\n0 (\d+)\n", data[xref:]).group(1))
+    entries = data[xref:].split(b"\n")[3:3 + count - 1]
+    objects = {}
+    for number, entry in enumerate(entries, start=1):
+        offset = int(entry[:10])
+        header = re.match(rb"%d 0 obj\n" % number, data[offset:])
+        assert header, f"xref entry {number} does not point at its object"
+        body = data[offset + header.end():]
+        length = re.match(rb"<<[^\n]*/Length (\d+) >>\nstream\n", body)
+        if length:
+            stream = body[length.end():length.end() + int(length.group(1))]
+            objects[number] = (body[:length.end()], stream)
+        else:
+            objects[number] = (body[:body.index(b"\nendobj")], None)
+    
+    def ref(body, key):
+        return int(re.search(rb"/%s (\d+) 0 R" % key, body).group(1))
+    
+    root = ref(re.search(rb"trailer\n(<<.*?>>)", data, re.S).group(1), b"Root")
+    tree = objects[ref(objects[root][0], b"Pages")][0]
+    kids = [int(kid) for kid in re.findall(rb"(\d+) 0 R", re.search(rb"/Kids \[(.*?)\]", tree).group(1))]
+    assert int(re.search(rb"/Count (\d+)", tree).group(1)) == len(kids)
+    pages = []
+    for kid in kids:
+        content = zlib.decompress(objects[ref(objects[kid][0], b"Contents")][1])
+        text = b" ".join(re.findall(rb"\((.*?)\) Tj", content))
+        pages.append(re.sub(rb"\\(.)", rb"\1", text).decode("cp1252"))
+    return pages, objects
+
+
+def _images(objects):
+    return sum(b"/Subtype /Image" in body and b"/DeviceGray" not in body for body, _ in objects.values())
+
+
+def test_rendered_pdf_has_a_page_per_slide_with_its_text(tmp_path):
+    picture = str(tmp_path / "chart.png")
+    Image.new("RGBA", (64, 48), (0, 128, 255, 128)).save(picture)
+    slides = [
+        SlideRecord(title="Quarterly Review", bullets=["Finance", "Café – “Q3”"]),
+        SlideRecord(title="Revenue", bullets=["Up 12%", "Costs (flat)"], image_path=picture),
+        SlideRecord(title="Next Steps", bullets=["Hire", "Ship"], image_path=picture),
+    ]
+    path = str(tmp_path / "deck.pdf")
+    
+    PdfRenderer(workers=2).render(slides, SlideBuilder().themes["professional"], path)
+    
+    pages, objects = _read_pdf(path)
+    assert len(pages) == 3
+    assert pages[0] == "Quarterly Review Finance | Café – “Q3”"
+    assert pages[1] == "Revenue Up 12% Costs (flat)"
+    assert pages[2] == "Next Steps Hire Ship"
+    # The picture is written once for both pages showing it
+    assert _images(objects) == 1
+    assert sorted(os.listdir(tmp_path)) == ["chart.png", "deck.pdf"]
+
+
+def test_text_outside_windows_1252_is_converted_with_libreoffice(tmp_path, monkeypatch):
+    slides = [SlideRecord(title="Überblick"), SlideRecord(title="市场概况", bullets=["Продажи"])]
+    builder = SlideBuilder()
+    
+    with pytest.raises(UnsupportedText):
+        builder.pdf_renderer.render(slides, builder.themes["professional"], str(tmp_path / "deck.pdf"))
+    assert os.listdir(tmp_path) == []
+    
+    converted = []
+    
+    async def convert(pptx_path, pdf_path):
+        converted.append(pdf_path)
+        return pdf_path
+    
+    monkeypatch.setattr(builder, "_convert_with_libreoffice", convert)
+    pdf_path = asyncio.run(builder.export_to_pdf(str(tmp_path / "deck.pptx"), slides))
+    assert converted == [str(tmp_path / "deck.pdf")] == [pdf_path]
+
+
+def test_streamed_pdf_matches_the_streamed_deck(tmp_path):
+    picture = str(tmp_path / "photo.jpg")
+    Image.new("RGB", (80, 60), "green").save(picture)
+    slides = [SlideRecord(title="Large Deck", bullets=["Subtitle"])]
+    slides += [
+        SlideRecord(title=f"Slide {i}", bullets=[f"Point {i}"], image_path=picture)
+        for i in range(1, 7)
+    ]
+    builder = SlideBuilder()
+    
+    async def build():
+        pdf = builder.pdf_stream(str(tmp_path))
+        output_path = await builder.build_deck_streaming(iter(slides), str(tmp_path), chunk_size=3, pdf=pdf)
+        return await builder.export_to_pdf(output_path, pdf=pdf)
+    
+    pdf_path = asyncio.run(build())
+    
+    pages, objects = _read_pdf(pdf_path)
+    assert pages == ["Large Deck Subtitle"] + [f"Slide {i} Point {i}" for i in range(1, 7)]
+    assert _images(objects) == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".partial")]
@@ -0,0 +1,90 @@
+"""
+Re-preview tests: previewing an edited outline with the previous preview's
+handle only expands the slides that changed.
+
+Run with: python -m pytest test_previews.py
+"""
+
+import os
+
+# No API key: the content generator's client is set by the fixture
+os.environ["OPENAI_API_KEY"] = ""
+os.environ.setdefault("PREWARM_ON_STARTUP", "false")
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+from loadtest import SimulatedLLM
+
+OUTLINE = """Roadmap Review
+1. Hiring
+    - Two engineers
+2. Budget
+    - Flat spend
+3. Launch
+    - Beta in May"""
+
+# Launch moved to the front, one bullet of Budget edited
+EDITED = """Roadmap Review
+1. Launch
+    - Beta in May
+2. Hiring
+    - Two engineers
+3. Budget
+    - Spend up 5%"""
+
+# Bullets, speaker notes and an image prompt
+CALLS_PER_SLIDE = 3
+
+
+class _RecordingLLM(SimulatedLLM):
+    """An instant simulated LLM that records the prompt of every call."""
+    
+    def __init__(self):
+        super().__init__(median_seconds=0.0)
+        self.prompts = []
+    
+    async def _create(self, **kwargs):
+        self.prompts.append(kwargs["messages"][-1]["content"])
+        return await super()._create(**kwargs)
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    generator = main.get_content_generator()
+    llm = _RecordingLLM()
+    monkeypatch.setattr(generator, "client", llm)
+    monkeypatch.setattr(generator, "use_mock", False)
+    monkeypatch.setattr(generator, "semantic_cache", None)
+    return llm
+
+
+def _preview(client, text, previous_preview_id=None):
+    response = client.post("/preview", json={"input_text": text, "previous_preview_id": previous_preview_id})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_edited_outline_only_expands_the_changed_slide(llm):
+    with TestClient(main.app) as client:
+        first = _preview(client, OUTLINE)
+        assert first["reused_slides"] == []
+        assert len(llm.prompts) == 4 * CALLS_PER_SLIDE
+        
+        llm.prompts.clear()
+        edited = _preview(client, EDITED, first["preview_id"])
+    
+    assert [slide["title"] for slide in edited["slides"]] == ["Roadmap Review", "Launch", "Hiring", "Budget"]
+    # The title slide and the moved slides are carried over, by content
+    assert edited["reused_slides"] == [0, 1, 2]
+    assert len(llm.prompts) == CALLS_PER_SLIDE
+    assert all('titled "Budget"' in prompt for prompt in llm.prompts)
+    assert edited["preview_id"] != first["preview_id"]
+
+
+def test_unknown_handle_expands_every_slide(llm):
+    with TestClient(main.app) as client:
+        preview = _preview(client, OUTLINE, "no-such-preview")
+    
+    assert preview["reused_slides"] == []
+    assert len(llm.prompts) == 4 * CALLS_PER_SLIDE
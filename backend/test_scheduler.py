@@ -0,0 +1,99 @@
+"""
+Scheduler tests: freed slots go to higher priority classes first and to
+clients in turn, and cancelled waiters never strand a slot.
+
+Run with: python -m pytest test_scheduler.py
+"""
+
+import asyncio
+from pipeline.scheduler import Scheduler
+
+
+async def _queue_behind_holder(scheduler, jobs):
+    """
+    Take the only slot, queue `jobs` ((name, priority, client) tuples) behind
+    it in order, and return the holder's release, the job tasks and the
+    order in which the jobs got the slot.
+    """
+    order = []
+    await scheduler.acquire("generate", "holder")
+    
+    async def job(name, priority, client):
+        async with scheduler.slot(priority, client):
+            order.append(name)
+            await asyncio.sleep(0)
+    
+    tasks = []
+    for name, priority, client in jobs:
+        tasks.append(asyncio.ensure_future(job(name, priority, client)))
+        # Queue each job before the next one
+        await asyncio.sleep(0)
+    return scheduler.release, tasks, order
+
+
+def test_interactive_runs_ahead_of_batch():
+    async def scenario():
+        scheduler = Scheduler(1)
+        release, tasks, order = await _queue_behind_holder(scheduler, [
+            ("batch-1", "batch", "a"),
+            ("generate-1", "generate", "a"),
+            ("batch-2", "batch", "a"),
+            ("interactive-1", "interactive", "b"),
+        ])
+        release()
+        await asyncio.gather(*tasks)
+        return order
+    
+    assert asyncio.run(scenario()) == ["interactive-1", "generate-1", "batch-1", "batch-2"]
+
+
+def test_clients_take_turns_within_a_class():
+    async def scenario():
+        scheduler = Scheduler(1)
+        release, tasks, order = await _queue_behind_holder(scheduler, [
+            ("a1", "batch", "a"), ("a2", "batch", "a"), ("a3", "batch", "a"),
+            ("b1", "batch", "b"), ("b2", "batch", "b"),
+        ])
+        release()
+        await asyncio.gather(*tasks)
+        return order
+    
+    assert asyncio.run(scenario()) == ["a1", "b1", "a2", "b2", "a3"]
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler = Scheduler(1)
+        release, tasks, order = await _queue_behind_holder(scheduler, [
+            ("cancelled", "interactive", "a"),
+            ("next", "batch", "b"),
+        ])
+        tasks[0].cancel()
+        await asyncio.sleep(0)
+        waiting = scheduler.waiting
+        release()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return order, waiting, scheduler.active
+    
+    order, waiting, active = asyncio.run(scenario())
+    assert order == ["next"]
+    assert waiting == 1
+    assert active == 0
+
+
+def test_waiter_cancelled_after_grant_hands_the_slot_on():
+    async def scenario():
+        scheduler = Scheduler(1)
+        release, tasks, order = await _queue_behind_holder(scheduler, [
+            ("granted", "generate", "a"),
+            ("next", "generate", "b"),
+        ])
+        # The slot is granted, but the waiter is cancelled before it resumes
+        release()
+        tasks[0].cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return order, scheduler.active, scheduler.waiting
+    
+    order, active, waiting = asyncio.run(scenario())
+    assert order == ["next"]
+    assert (active, waiting) == (0, 0)
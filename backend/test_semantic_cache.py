@@ -0,0 +1,79 @@
+"""
+Semantic cache tests: rewordings of a cached slide are hits, different
+topics and other tenants' entries are misses.
+
+Run with: python -m pytest test_semantic_cache.py
+"""
+
+import asyncio
+from loadtest import SimulatedLLM
+from models import SlideRecord
+from pipeline.content_generator import ContentGenerator
+from pipeline.semantic_cache import SemanticCache
+from pipeline.tenancy import tenant_context
+
+EXPANSION = (("Elastic resources", "Pay per use"), "Notes", "A cloud diagram")
+
+
+def test_reworded_slide_is_a_hit():
+    cache = SemanticCache()
+    cache.insert("ns", "Cloud Computing Basics", ["IaaS", "PaaS"], EXPANSION)
+    assert cache.lookup("ns", "Basics of Cloud Computing", ["IaaS", "PaaS"]) == EXPANSION
+    assert cache.lookup("ns", "cloud computing basics.", ["IaaS", "PaaS"]) == EXPANSION
+
+
+def test_different_topic_is_a_miss():
+    cache = SemanticCache()
+    cache.insert("ns", "Cloud Computing Basics", [], EXPANSION)
+    cache.insert("ns", "Supervised Learning", [], EXPANSION)
+    assert cache.lookup("ns", "Cloud Security Basics", []) is None
+    assert cache.lookup("ns", "Unsupervised Learning", []) is None
+    # Other namespaces never match, however close the slide
+    assert cache.lookup("other", "Cloud Computing Basics", []) is None
+
+
+class _CountingLLM(SimulatedLLM):
+    """An instant simulated LLM that counts the calls made to it."""
+    
+    def __init__(self):
+        super().__init__(median_seconds=0.0)
+        self.calls = 0
+    
+    async def _create(self, **kwargs):
+        self.calls += 1
+        return await super()._create(**kwargs)
+
+
+def _generator() -> ContentGenerator:
+    generator = ContentGenerator()
+    generator.client = _CountingLLM()
+    generator.use_mock = False
+    generator.semantic_cache = SemanticCache()
+    return generator
+
+
+def _expand(generator: ContentGenerator, tenant, title: str):
+    async def expand():
+        with tenant_context(tenant):
+            return await generator.expand_slides([SlideRecord(title=title, bullets=["IaaS"])], include_speaker_notes=True)
+    return asyncio.run(expand())
+
+
+def test_tenant_reuses_its_own_entries():
+    generator = _generator()
+    _expand(generator, "acme", "Cloud Computing Basics")
+    calls = generator.client.calls
+    assert calls
+    _expand(generator, "acme", "Basics of Cloud Computing")
+    assert generator.client.calls == calls
+
+
+def test_tenants_do_not_share_entries():
+    generator = _generator()
+    _expand(generator, "acme", "Cloud Computing Basics")
+    calls = generator.client.calls
+    assert calls
+    _expand(generator, "globex", "Cloud Computing Basics")
+    assert generator.client.calls == 2 * calls
+    _expand(generator, None, "Cloud Computing Basics")
+    assert generator.client.calls == 3 * calls
@@ -0,0 +1,109 @@
+"""
+Single-flight tests: identical concurrent requests share one execution,
+which outlives any one caller but not all of them.
+
+Run with: python -m pytest test_singleflight.py
+"""
+
+import asyncio
+from singleflight import SingleFlight
+
+
+class _Work:
+    """Counts runs and blocks until released."""
+    
+    def __init__(self, result="deck", error=None):
+        self.runs = 0
+        self.cancelled = False
+        self.release = None
+        self.result = result
+        self.error = error
+    
+    async def __call__(self):
+        self.runs += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+async def _start(flight, work, callers):
+    work.release = asyncio.Event()
+    tasks = [asyncio.ensure_future(flight.do("key", work)) for _ in range(callers)]
+    # Let every caller register before the test acts on them
+    await asyncio.sleep(0)
+    return tasks
+
+
+def test_concurrent_identical_requests_run_once():
+    async def scenario():
+        flight, work = SingleFlight(), _Work()
+        tasks = await _start(flight, work, 5)
+        work.release.set()
+        return work, await asyncio.gather(*tasks), len(flight)
+    
+    work, results, inflight = asyncio.run(scenario())
+    assert work.runs == 1
+    assert results == ["deck"] * 5
+    assert inflight == 0
+
+
+def test_cancelled_waiter_does_not_cancel_the_others():
+    async def scenario():
+        flight, work = SingleFlight(), _Work()
+        tasks = await _start(flight, work, 3)
+        tasks[0].cancel()
+        await asyncio.sleep(0)
+        work.release.set()
+        return work, await asyncio.gather(*tasks, return_exceptions=True)
+    
+    work, results = asyncio.run(scenario())
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert results[1:] == ["deck", "deck"]
+    assert not work.cancelled
+
+
+def test_last_waiter_leaving_cancels_the_work():
+    async def scenario():
+        flight, work = SingleFlight(), _Work()
+        tasks = await _start(flight, work, 2)
+        for task in tasks:
+            task.cancel()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Give the shared task a turn to observe its cancellation
+        await asyncio.sleep(0)
+        return work, len(flight)
+    
+    work, inflight = asyncio.run(scenario())
+    assert work.cancelled
+    assert inflight == 0
+
+
+def test_exception_reaches_every_waiter():
+    async def scenario():
+        flight, work = SingleFlight(), _Work(error=RuntimeError("LLM unavailable"))
+        tasks = await _start(flight, work, 3)
+        work.release.set()
+        return work, await asyncio.gather(*tasks, return_exceptions=True)
+    
+    work, results = asyncio.run(scenario())
+    assert work.runs == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len({id(result) for result in results}) == 1
+
+
+def test_next_request_after_completion_runs_again():
+    async def scenario():
+        flight, work = SingleFlight(), _Work()
+        for _ in range(2):
+            tasks = await _start(flight, work, 2)
+            work.release.set()
+            await asyncio.gather(*tasks)
+        return work
+    
+    assert asyncio.run(scenario()).runs == 2
@@ -0,0 +1,109 @@
+"""
+Start-up tests: importing the server must stay cheap.
+
+Each check runs in a fresh interpreter so modules cached by other tests do
+not hide a regression. Run with: python -m pytest test_startup.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Budget for `import main` in a fresh interpreter (median of several runs)
+IMPORT_TIME_BUDGET_SECONDS = float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", "1.5"))
+
+# Dependencies that must not be imported until a component needs them
+HEAVY_MODULES = ("openai", "pptx", "lxml", "httpx", "PIL", "uvicorn")
+
+# Drives the ASGI app directly; TestClient would import httpx itself
+_ASGI_CALL = """
+import asyncio
+
+async def call(app, path):
+    sent = []
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [], "client": ("127.0.0.1", 1), "server": ("testserver", 80),
+    }
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        sent.append(message)
+    await app(scope, receive, send)
+    return sent[0]["status"]
+"""
+
+
+def _run(code: str) -> dict:
+    """Run code in a fresh interpreter in the backend dir and parse its JSON output."""
+    env = dict(os.environ, OPENAI_API_KEY="", PREWARM_ON_STARTUP="false")
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _loaded_heavy_modules() -> str:
+    return f"[m for m in {HEAVY_MODULES!r} if m in sys.modules]"
+
+
+def test_import_time_within_budget():
+    timings = []
+    for _ in range(3):
+        timings.append(_run(
+            "import json, time\n"
+            "start = time.perf_counter()\n"
+            "import main\n"
+            "print(json.dumps({'seconds': time.perf_counter() - start}))"
+        )["seconds"])
+    median = sorted(timings)[1]
+    assert median < IMPORT_TIME_BUDGET_SECONDS, (
+        f"import main took {median:.3f}s (budget {IMPORT_TIME_BUDGET_SECONDS}s)"
+    )
+
+
+def test_import_defers_heavy_dependencies():
+    loaded = _run(
+        "import json, sys\n"
+        "import main\n"
+        f"print(json.dumps({{'loaded': {_loaded_heavy_modules()}}}))"
+    )["loaded"]
+    assert loaded == []
+
+
+def test_health_checks_do_not_build_pipeline():
+    result = _run(
+        "import json, sys\n"
+        "import main\n"
+        + _ASGI_CALL +
+        "statuses = [asyncio.run(call(main.app, p)) for p in ('/', '/healthz')]\n"
+        f"print(json.dumps({{'statuses': statuses, 'loaded': {_loaded_heavy_modules()}}}))"
+    )
+    assert result["statuses"] == [200, 200]
+    assert result["loaded"] == []
+
+
+def test_readiness_prewarms_pipeline():
+    result = _run(
+        "import json, sys\n"
+        "import main\n"
+        + _ASGI_CALL +
+        "status = asyncio.run(call(main.app, '/readyz'))\n"
+        "print(json.dumps({'status': status, 'components': sorted(main._components),\n"
+        "                  'template': main.get_slide_builder()._template is not None}))"
+    )
+    assert result["status"] == 200
+    assert result["components"] == [
+        "content_generator", "document_summarizer", "image_generator",
+        "outline_parser", "slide_builder"
+    ]
+    assert result["template"]
@@ -0,0 +1,51 @@
+"""
+Deck upgrade tests: degraded slides are regenerated into a new deck
+version, leaving the delivered one untouched.
+
+Run with: python -m pytest test_upgrades.py
+"""
+
+import os
+
+# No API key: slides are expanded with fallback content, without network calls
+os.environ["OPENAI_API_KEY"] = ""
+os.environ.setdefault("PREWARM_ON_STARTUP", "false")
+
+import asyncio
+from dataclasses import replace
+from pptx import Presentation
+import main
+from models import GenerateOptions, SlideRecord
+from upgrades import UpgradeJob
+
+
+def test_upgrade_publishes_v2_and_clears_pending_slides(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "OUTPUT_DIR", str(tmp_path))
+    slides = [
+        SlideRecord(title="Upgrade Deck", bullets=["Subtitle"]),
+        SlideRecord(title="Fell back"),
+        SlideRecord(title="Placeholder", bullets=["Point"]),
+    ]
+    delivered = [
+        replace(slides[0]),
+        SlideRecord(title="Fell back", bullets=["Fallback point"], degraded=["content"]),
+        SlideRecord(
+            title="Placeholder",
+            bullets=["Delivered point"],
+            image_prompt="A bar chart",
+            image_path="https://via.placeholder.com/800x450",
+            degraded=["image"]
+        ),
+    ]
+    snapshot = [replace(slide, bullets=list(slide.bullets), degraded=list(slide.degraded)) for slide in delivered]
+    job = UpgradeJob(job_id="job", file_path=str(tmp_path / "deck.pptx"), pending_slides=[1, 2])
+    options = GenerateOptions(generate_images=True)
+    
+    asyncio.run(main._upgrade_deck(job, slides, delivered, options))
+    
+    assert job.version == 2
+    assert job.pending_slides == []
+    assert job.file_path == str(tmp_path / "deck.v2.pptx")
+    assert len(Presentation(job.file_path).slides) == 3
+    # Delivered records are not modified, including the degraded marks
+    assert delivered == snapshot
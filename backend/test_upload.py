@@ -0,0 +1,85 @@
+"""
+Upload tests: /upload/preview streams .txt/.md files and rejects anything
+else before reading it whole.
+
+Run with: python -m pytest test_upload.py
+"""
+
+import os
+
+# No API key: slides are expanded with fallback content, without network calls
+os.environ["OPENAI_API_KEY"] = ""
+os.environ.setdefault("PREWARM_ON_STARTUP", "false")
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+
+BOUNDARY = "upload-test-boundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def _multipart(filename: str, content: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        "Content-Type: text/plain\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main.upload_reader, "max_bytes", 1024)
+    monkeypatch.setattr(main.upload_reader, "envelope_bytes", 256)
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.mark.parametrize("filename", ["notes.md", "notes.txt"])
+def test_preview_reads_uploaded_outline(client, filename):
+    body = _multipart(filename, b"Team Update\n* Hiring\n* Roadmap\n* Budget")
+    response = client.post("/upload/preview", content=body, headers={"Content-Type": CONTENT_TYPE})
+    assert response.status_code == 200, response.text
+    titles = [slide["title"] for slide in response.json()["slides"]]
+    assert titles[0] == "Team Update"
+    assert titles[1:] == ["Hiring", "Roadmap", "Budget"]
+
+
+def test_content_length_over_cap_is_rejected(client):
+    body = _multipart("notes.md", b"x" * 4096)
+    response = client.post("/upload/preview", content=body, headers={"Content-Type": CONTENT_TYPE})
+    assert response.status_code == 413
+
+
+def test_chunked_body_over_cap_is_rejected(client):
+    body = _multipart("notes.md", b"line of text\n" * 400)
+    
+    def chunks():
+        for start in range(0, len(body), 512):
+            yield body[start:start + 512]
+    
+    # A generator body is sent chunked, without a Content-Length header
+    response = client.post("/upload/preview", content=chunks(), headers={"Content-Type": CONTENT_TYPE})
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize("content_length", ["abc", "-1", "1_000"])
+def test_malformed_content_length_is_rejected(client, content_length):
+    body = _multipart("notes.md", b"Team Update\n* Hiring")
+    response = client.post(
+        "/upload/preview",
+        content=body,
+        headers={"Content-Type": CONTENT_TYPE, "Content-Length": content_length}
+    )
+    assert response.status_code == 400
+
+
+def test_non_multipart_body_is_rejected(client):
+    response = client.post("/upload/preview", content=b"Team Update\n* Hiring", headers={"Content-Type": "text/plain"})
+    assert response.status_code == 415
+
+
+def test_disallowed_extension_is_rejected(client):
+    body = _multipart("slides.pdf", b"%PDF-1.4")
+    response = client.post("/upload/preview", content=body, headers={"Content-Type": CONTENT_TYPE})
+    assert response.status_code == 415
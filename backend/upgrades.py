@@ -0,0 +1,175 @@
+"""
+Deck Upgrades Module
+Background jobs that improve a delivered deck and publish new versions of it.
+"""
+
+import os
+import re
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional, Set
+from models import UpgradeStatus
+from telemetry import DECK_UPGRADES, QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class UpgradeJob:
+    """A background upgrade of one deck and the versions it has published."""
+    
+    job_id: str
+    file_path: str
+    pdf_path: Optional[str] = None
+    pending_slides: List[int] = field(default_factory=list)
+    status: str = "queued"
+    version: int = 1
+    error: Optional[str] = None
+    
+    def publish(self, file_path: str, pdf_path: Optional[str] = None, pending_slides: Optional[List[int]] = None):
+        """
+        Make a newly built deck the latest version.
+        
+        Versions are written to new files, so a client still downloading an
+        older version is never handed a half-written deck.
+        
+        Args:
+            file_path: Path to the new deck
+            pdf_path: Path to its PDF, if exported
+            pending_slides: Slides still awaiting an upgrade (default: none)
+        """
+        self.file_path = file_path
+        self.pdf_path = pdf_path
+        self.pending_slides = pending_slides or []
+        self.version += 1
+    
+    def next_path(self) -> str:
+        """Path for the next deck version, next to the first: name.v2.pptx, name.v3.pptx..."""
+        root, extension = os.path.splitext(self.file_path)
+        root = re.sub(r"\.v\d+$", "", root)
+        return f"{root}.v{self.version + 1}{extension}"
+    
+    def to_api(self) -> UpgradeStatus:
+        """Convert to the validated API model."""
+        return UpgradeStatus(
+            job_id=self.job_id,
+            status=self.status,
+            version=self.version,
+            file_path=self.file_path,
+            pdf_path=self.pdf_path,
+            pending_slides=self.pending_slides,
+            error=self.error
+        )
+
+
+class UpgradeQueue:
+    """
+    Runs deck upgrades in the background, a few at a time.
+    
+    Jobs are kept in memory so clients can poll them; the oldest finished
+    jobs are forgotten once more than `retained` are held.
+    """
+    
+    def __init__(self, concurrency: int = 2, retained: int = 1000):
+        """
+        Initialize an empty queue.
+        
+        Args:
+            concurrency: Upgrades allowed to run at once
+            retained: Jobs remembered for polling
+        """
+        self.concurrency = concurrency
+        self.retained = retained
+        self._jobs: "OrderedDict[str, UpgradeJob]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._depth = QUEUE_DEPTH.labels(queue="deck_upgrades")
+    
+    def __len__(self) -> int:
+        return len(self._tasks)
+    
+    def submit(
+        self,
+        file_path: str,
+        pending_slides: List[int],
+        work: Callable[[UpgradeJob], Awaitable[None]],
+        pdf_path: Optional[str] = None
+    ) -> UpgradeJob:
+        """
+        Queue an upgrade of a delivered deck.
+        
+        The work runs in a copy of the caller's context, so it keeps the
+        request id for logs and traces; it should set its own work class,
+        budget and deadline.
+        
+        Args:
+            file_path: Path to the deck as delivered (version 1)
+            pending_slides: Positions of the slides the upgrade will replace
+            work: Coroutine function performing the upgrade and publishing versions
+            pdf_path: Path to the delivered PDF, if any
+        
+        Returns:
+            The queued job
+        """
+        job = UpgradeJob(
+            job_id=uuid.uuid4().hex,
+            file_path=file_path,
+            pdf_path=pdf_path,
+            pending_slides=list(pending_slides)
+        )
+        self._jobs[job.job_id] = job
+        self._evict()
+        
+        task = asyncio.ensure_future(self._run(job, work))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+    
+    def get(self, job_id: str) -> Optional[UpgradeJob]:
+        """The job with this id, if it is still remembered."""
+        return self._jobs.get(job_id)
+    
+    async def close(self):
+        """Cancel running upgrades, e.g. on shutdown."""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+    
+    async def _run(self, job: UpgradeJob, work: Callable[[UpgradeJob], Awaitable[None]]):
+        """Wait for a slot, then run the upgrade and record its outcome."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        self._depth.inc()
+        try:
+            await self._slots.acquire()
+        finally:
+            self._depth.dec()
+        
+        try:
+            job.status = "running"
+            await work(job)
+            job.status = "done"
+        except asyncio.CancelledError:
+            job.status = "failed"
+            job.error = "Cancelled"
+            raise
+        except Exception as e:
+            logger.warning("Upgrade %s failed: %s", job.job_id[:12], e)
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            self._slots.release()
+            DECK_UPGRADES.labels(status=job.status).inc()
+    
+    def _evict(self):
+        """Forget the oldest finished jobs beyond the retention limit."""
+        excess = len(self._jobs) - self.retained
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].status in ("done", "failed"):
+                del self._jobs[job_id]
+                excess -= 1
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Cache Warm-up Module
+Replays logged request inputs through the pipeline to fill its caches.
+
+With REQUEST_LOG set, the server appends the input of every /preview and
+/generate request to it as JSON lines ({"request_id", "tenant", "title",
+"body"}, the format of requests.jsonl plus the tenant). Replaying the most
+frequent or most recent inputs after a deploy fills the summary, semantic
+and image caches before users ask for those topics again. Decks are not
+built.
+
+Usage:
+    python warmup.py requests.jsonl --top 20
+    python warmup.py requests.jsonl --recent 50 --rate 0.5 --time-budget 300
+
+The command fills the caches that outlive the process (SEMANTIC_CACHE_PATH
+and downloaded images), and does nothing without SEMANTIC_CACHE_ENABLED. Set WARMUP_LOG to have the server replay the log
+in the background at start-up, which also fills its in-memory caches.
+"""
+
+import json
+import time
+import queue
+import asyncio
+import logging
+import argparse
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from pipeline.budget import RequestBudget, budget_context
+from pipeline.deadline import Deadline, DeadlineExceeded, deadline_context
+from pipeline.scheduler import work_class
+from pipeline.tenancy import tenant_context
+from telemetry import current_request_id
+
+logger = logging.getLogger(__name__)
+
+# A logged input: (input text, tenant or None)
+Input = Tuple[str, Optional[str]]
+
+
+class RequestLog:
+    """
+    Appends request inputs as JSON lines to a local file.
+    
+    record() only queues the entry, so logging never blocks the event loop
+    on disk I/O; a daemon writer thread keeps the file open and writes the
+    queued entries in batches.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.SimpleQueue[Optional[dict]]" = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+    
+    def record(self, text: str, tenant: Optional[str] = None):
+        """Log one request's input, with the tenant its replay warms the caches for."""
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="request-log-writer", daemon=True)
+                    self._writer.start()
+        self._queue.put({"request_id": current_request_id(), "tenant": tenant, "body": text})
+    
+    def close(self):
+        """Write out the queued entries and stop the writer thread."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put(None)
+            writer.join()
+    
+    def _write_loop(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                batch = [self._queue.get()]
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                entries = [entry for entry in batch if entry is not None]
+                lines = []
+                for entry in entries:
+                    # Titled by the first non-empty line, as in requests.jsonl
+                    title = next((line.strip() for line in entry["body"].splitlines() if line.strip()), "")
+                    lines.append(json.dumps({
+                        "request_id": entry["request_id"],
+                        "tenant": entry["tenant"],
+                        "title": title[:80],
+                        "body": entry["body"],
+                    }) + "\n")
+                if lines:
+                    f.write("".join(lines))
+                    f.flush()
+                if len(entries) < len(batch):
+                    return
+
+
+def read_inputs(path: str, top: Optional[int] = None, recent: Optional[int] = None) -> List[Input]:
+    """
+    Pick the inputs to replay from a request log.
+    
+    Args:
+        path: JSONL log with the input text in "body" (or "input_text")
+        top: Take the N most frequent inputs, the most recent first among equals
+        recent: Take the N most recently logged distinct inputs
+    
+    Returns:
+        Distinct (input text, tenant) pairs in replay order (every input when
+        neither is set); the tenant is None for anonymous requests
+    """
+    counts: Counter = Counter()
+    last_seen: Dict[Input, int] = {}
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(entry, dict):
+                continue
+            text = (entry.get("body") or entry.get("input_text") or "").strip()
+            if text:
+                key = (text, entry.get("tenant") or None)
+                counts[key] += 1
+                last_seen[key] = number
+    
+    if top is not None:
+        return sorted(counts, key=lambda key: (-counts[key], -last_seen[key]))[:top]
+    newest_first = sorted(last_seen, key=last_seen.get, reverse=True)
+    return newest_first[:recent] if recent is not None else newest_first
+
+
+async def warm_caches(
+    inputs: List[Input],
+    outline_parser,
+    content_generator,
+    image_generator=None,
+    rate: float = 1.0,
+    time_budget: Optional[float] = None,
+    include_speaker_notes: bool = True,
+    summaries: bool = True
+) -> dict:
+    """
+    Replay inputs through the parse, expansion and image stages.
+    
+    Only stages that fill a cache run: expansion needs a semantic cache (an
+    uncached expansion is thrown away, and the next request would get
+    different image prompts), and images need cached expansions and an
+    image generator that caches what it generates. When no stage would
+    fill anything, nothing is replayed.
+    
+    Runs as batch work, so every call waits for slots that previews and
+    deck generation do not want. Each input is replayed for the tenant that
+    sent it, filling that tenant's cache partition. Inputs are started at
+    most `rate` per second, and the replay stops once the time budget is
+    spent.
+    
+    Args:
+        inputs: (input text, tenant) pairs to replay, in order
+        outline_parser: OutlineParser to parse them with
+        content_generator: ContentGenerator filling the semantic cache
+        image_generator: ImageGenerator filling the image cache (None to skip images)
+        rate: Inputs started per second (0 for no limit)
+        time_budget: Seconds the whole replay may take (None for no limit)
+        include_speaker_notes: Expand as requests with speaker notes do (the default)
+        summaries: Whether the parser's document-summary cache outlives the replay
+    
+    Returns:
+        Counts of replayed and failed inputs and slides, and the seconds taken
+    """
+    stats = {"inputs": 0, "failed": 0, "slides": 0, "skipped": len(inputs), "seconds": 0.0}
+    expand = content_generator.semantic_cache is not None and not content_generator.use_mock
+    images = (
+        expand and image_generator is not None
+        and image_generator.use_dalle and image_generator.image_cache
+    )
+    if not (summaries or expand):
+        logger.info("Cache warm-up skipped: no cache to fill")
+        return stats
+    
+    interval = 1 / rate if rate > 0 else 0.0
+    start = time.perf_counter()
+    with work_class("batch", "warmup"), deadline_context(Deadline(time_budget)):
+        for text, tenant in inputs:
+            wait = start + stats["inputs"] * interval - time.perf_counter()
+            if time_budget is not None and time.perf_counter() + max(wait, 0.0) - start >= time_budget:
+                break
+            if wait > 0:
+                await asyncio.sleep(wait)
+            stats["inputs"] += 1
+            stats["skipped"] -= 1
+            try:
+                with budget_context(RequestBudget()), tenant_context(tenant):
+                    slides = await outline_parser.parse(text)
+                    if expand:
+                        slides = await content_generator.expand_slides(slides, include_speaker_notes=include_speaker_notes)
+                    if images:
+                        await image_generator.generate_images(slides)
+                stats["slides"] += len(slides)
+            except DeadlineExceeded:
+                stats["failed"] += 1
+                break
+            except Exception as e:
+                logger.warning("Warm-up input %d failed: %s", stats["inputs"], e)
+                stats["failed"] += 1
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    logger.info("Cache warm-up: %s", stats)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("log", help="JSONL request log (see REQUEST_LOG)")
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument("--top", type=int, help="Replay the N most frequent inputs")
+    selection.add_argument("--recent", type=int, help="Replay the N most recent inputs")
+    parser.add_argument("--rate", type=float, default=1.0, help="Inputs started per second (0 = no limit)")
+    parser.add_argument("--time-budget", type=float, help="Stop after this many seconds")
+    parser.add_argument("--no-images", action="store_true", help="Skip the image stage")
+    args = parser.parse_args()
+    
+    from dotenv import load_dotenv
+    load_dotenv()
+    from telemetry import configure_logging
+    from pipeline.outline_parser import OutlineParser
+    from pipeline.document_summarizer import DocumentSummarizer
+    from pipeline.content_generator import ContentGenerator
+    from pipeline.image_generator import ImageGenerator
+    from pipeline.clients import close_clients
+    from pipeline.semantic_cache import close_semantic_cache
+    configure_logging()
+    
+    inputs = read_inputs(args.log, top=args.top, recent=args.recent)
+    
+    async def run() -> dict:
+        try:
+            return await warm_caches(
+                inputs,
+                OutlineParser(summarizer=DocumentSummarizer()),
+                ContentGenerator(),
+                None if args.no_images else ImageGenerator(),
+                rate=args.rate,
+                time_budget=args.time_budget,
+                # Document summaries are only cached in memory
+                summaries=False
+            )
+        finally:
+            await close_clients()
+    
+    stats = asyncio.run(run())
+    close_semantic_cache()
+    print(
+        f"Warmed {stats['inputs'] - stats['failed']}/{len(inputs)} inputs "
+        f"({stats['slides']} slides, {stats['failed']} failed, {stats['skipped']} not reached) "
+        f"in {stats['seconds']:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,8 @@ export default function InputForm({
   isGenerating 
 }: InputFormProps) {
   const [loading, setLoading] = useState(false)
+  // Handle of the last preview: the backend only re-expands slides edited since
+  const [previewId, setPreviewId] = useState<string | null>(null)
 
   const handlePreview = async () => {
     if (!inputText.trim()) return
@@ -25,9 +27,11 @@ export default function InputForm({
     try {
       const response = await axios.post(`${API_URL}/preview`, {
         input_text: inputText,
-        include_speaker_notes: true
+        include_speaker_notes: true,
+        previous_preview_id: previewId
       })
       setPreviewData(response.data)
+      setPreviewId(response.data.preview_id ?? null)
     } catch (error) {
       console.error('Preview error:', error)
       alert('Failed to generate preview. Please check your input and try again.')